@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def analysis_cache_key(image_bytes, object_name, object_data):
+    """
+    Klucz wyniku analizy: skrót bajtów klatki + nazwa obiektu, jego bbox i kolor.
+    Zmiana klatki albo atrybutów obiektu daje nowy klucz.
+    """
+    digest = hashlib.sha256(image_bytes)
+    attributes = {
+        "object": object_name,
+        "name": object_data.get("name"),
+        "bbox": object_data.get("bbox"),
+        "color": object_data.get("color"),
+    }
+    digest.update(json.dumps(attributes, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Trwały cache wyników Gemini (SQLite) z wygasaniem (TTL) i usuwaniem najdawniej używanych (LRU).
+
+    `get_or_compute` łączy równoczesne chybienia dla tego samego klucza - liczy tylko pierwszy
+    wątek, pozostałe czekają na jego wynik.
+    """
+
+    def __init__(self, path="./analysis_cache.db", max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._inflight = {}  # klucz -> (Event, wynik)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL, accessed_at REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False), now, now))
+            self._evict()
+
+    def _evict(self):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def get_or_compute(self, key, compute, should_cache=lambda value: True):
+        """
+        Zwraca (wynik, czy_z_cache). `compute` jest wołane najwyżej raz na klucz naraz.
+        Wyniki, dla których `should_cache` zwraca False (np. błędy), nie trafiają do cache.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = (threading.Event(), {})
+                self._inflight[key] = inflight
+
+        event, holder = inflight
+        if not leader:
+            event.wait()
+            if "error" in holder:
+                raise holder["error"]
+            return holder["value"], True
+
+        try:
+            value = compute()
+            holder["value"] = value
+            if should_cache(value):
+                self.set(key, value)
+            return value, False
+        except Exception as e:
+            holder["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """
+    Wspólna instancja cache; ścieżka, limit wpisów i TTL z ANALYSIS_CACHE_PATH / _MAX_ENTRIES / _TTL.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache(
+                os.getenv("ANALYSIS_CACHE_PATH", "./analysis_cache.db"),
+                max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600))),
+            )
+        return _cache
@@ -1,150 +1,305 @@
+import time
+_import_started = time.perf_counter()  # Początek importu - do raportu czasu startu
+
 from flask_cors import CORS
-from ultralytics import YOLO
-from PIL import Image
-import io
 import os
 from flask import Flask, request, jsonify, send_file
 import cv2
 from collections import defaultdict
 from datetime import datetime
-import numpy as np
 import json
 import logging
 from data_routes import data_bp
 from ignore_routes import ignore_bp
+from class_filter import get_class_filter, get_class_names
 from vision_routes import vision_bp  # Importuj blueprint vision_bp
-import time
-
-# Konfiguracja logowania
-logging.basicConfig(level=logging.DEBUG)
+from job_routes import jobs_bp, submit_video_job
+from video_pipeline import VideoPipeline
+from video_jobs import JobManager
+from frame_store import get_frame_store
+from detection_store import get_detection_store
+from color_utils import get_dominant_colors, boxes_from_detections, colors_to_hex
+from inference_server import PooledModel, InferenceTimeout
+from detector_backends import BackendLimitReached, DetectorRegistry, UnknownBackend
+from health_routes import health_bp, StartupReport, start_warmup
+from thumbnail_routes import thumbnail_bp
+from derived_cache import get_derived_cache
+from frame_dedup import create_deduplicator
+from preprocessing import Preprocessor, PreprocessingError, pipeline_from_env
+import metrics
+from metrics_routes import init_metrics
+from profiling import get_profiler
+from profiling_routes import init_profiling
+
+# Konfiguracja logowania (LOG_LEVEL, np. INFO w produkcji - komunikaty poniżej progu nic nie kosztują)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "DEBUG"))
 
 app = Flask(__name__)
 
-try:
-    logging.debug("Ładowanie modelu YOLO...")
-    model = YOLO("./yolo/yolo11l.pt")  # Zmień plik na właściwy plik modelu YOLO
-    logging.debug("Model YOLO załadowany pomyślnie!")
-except Exception as e:
-    logging.error(f"Błąd ładowania modelu YOLO: {str(e)}")
-    raise
+# Procesy inferencji (spawn) importują skrypt startowy ponownie jako __mp_main__ (multiprocessing.parent_process()
+# jest wtedy jeszcze None). Zasoby serwera - pule detektorów, indeks klatek, dziennik wykryć, kolejkę zadań,
+# rozgrzewkę - tworzy tylko proces serwera; w procesach potomnych zostają same definicje funkcji.
+SERVER_PROCESS = __name__ != "__mp_main__"
+
+COLOR_MODE = os.getenv("COLOR_MODE", "mean")  # "mean" albo "mode" (odporny kolor dominujący)
+
+# Pule procesów z modelami (inference_server.py) zamiast jednego globalnego YOLO współdzielonego
+# przez wątki Flaska; INFERENCE_WORKERS=0 przywraca model w procesie serwera.
+# Backend (model .pt, ONNX, OpenVINO, wariant n/s) wybierany per endpoint albo per żądanie
+# (?backend= lub nagłówek X-Detector-Backend, tylko backendy dozwolone dla endpointu) - zob. detector_backends.py.
+# Modele ładują się przy pierwszym żądaniu albo w rozgrzewce w tle (MODEL_WARMUP=1).
+detectors = DetectorRegistry.from_env() if SERVER_PROCESS else None
 
 app.register_blueprint(data_bp)
 app.register_blueprint(ignore_bp)
 app.register_blueprint(vision_bp)  # Zarejestruj blueprint vision_bp
+app.register_blueprint(jobs_bp)
+app.register_blueprint(health_bp)
+app.register_blueprint(thumbnail_bp)
+# /metrics (format Prometheusa), czasy żądań i opcjonalny nagłówek Server-Timing
+init_metrics(app)
+init_profiling(app)  # Profilowanie próbkujące na żądanie (POST /profiling, nagłówek X-Profile: 1)
+
+UPLOADS = metrics.counter("upload_frames_total", "Klatki przesłane do /upload_frames", ("result",))
+DETECTIONS = metrics.counter("detections_total", "Zapisane wykrycia", ("source",))
+INFERENCE_TIMEOUTS = metrics.counter("inference_timeouts_total", "Przekroczenia czasu inferencji")
 
 @app.route('/')
 def home():
     return "Flask server is running!"
 
-def get_dominant_color(image, bbox):
-    if isinstance(image, Image.Image):  
-        image = np.array(image)  # Konwersja PIL → numpy
-
-    xmin, ymin, xmax, ymax = bbox['xmin'], bbox['ymin'], bbox['xmax'], bbox['ymax']
-    region = image[ymin:ymax, xmin:xmax]
-
-    if region.size == 0:
-        return "#000000"
-
-    region = region.reshape(-1, 3)
-    mean_color = np.mean(region, axis=0).astype(int)
-    r, g, b = mean_color[2], mean_color[1], mean_color[0]
-    return f"#{r:02x}{g:02x}{b:02x}"
-def get_next_frame_number(directory="wyniki"):
-    # Pobierz listę wszystkich plików frame_*.jpg
-    frame_files = [f for f in os.listdir(directory) if f.startswith("frame_") and f.endswith(".jpg")]
-    
-    if not frame_files:
-        return 1  # Jeśli folder jest pusty, rozpoczynamy od 1
-    
-    # Znajdź najwyższy numer frame w folderze
-    max_frame_number = max([int(f.split("_")[1].split(".")[0]) for f in frame_files])
-    return max_frame_number + 1  # Zwiększ numer o 1
-
-# W kodzie zapisz nową klatkę:
-frame_count = get_next_frame_number("wyniki")
+# Wspólny indeks klatek - numery nadaje atomowy licznik zamiast skanowania katalogu
+frame_store = get_frame_store("wyniki") if SERVER_PROCESS else None
+# Dziennik wykryć (rekordy binarne) zamiast wyniki/general_detections.txt
+detection_store = get_detection_store("wyniki/detections") if SERVER_PROCESS else None
+# Ignorowane klasy (ignored_classes.json) w pamięci - lista dozwolonych trafia do modelu jako `classes=`;
+# pliki filtr czyta dopiero przy pierwszym żądaniu
+class_filter = get_class_filter() if SERVER_PROCESS else None
+
+
+
+def describe_video_detections(frame, detections):
+    """
+    Buduje wpisy logu wykryć dla jednej klatki wideo.
+    """
+    detection_list = []
+    with metrics.timed("colors"):
+        colors = colors_to_hex(get_dominant_colors(frame, boxes_from_detections(detections), COLOR_MODE))
+    DETECTIONS.inc(len(colors), source="video")
+
+    for detection, color in zip(detections, colors):
+        xmin, ymin, xmax, ymax, confidence, class_id = map(int, detection[:6])
+        bbox = {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
+        center_x = (xmin + xmax) // 2
+        center_y = (ymin + ymax) // 2
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        name = f"class_{class_id}"
+
+        detection_entry = {
+            "class": class_id,
+            "name": name,
+            "bbox": bbox,
+            "center": {
+                "x": center_x,
+                "y": center_y
+            },
+            "color": color,
+            "timestamp": timestamp
+        }
+        detection_list.append(detection_entry)
+
+    return detection_list
+
+
+def open_video(video_url):
+    if video_url.startswith('file://'):
+        video_url = video_url[7:]
+    return cv2.VideoCapture(video_url)
+
+
+def build_video_pipeline(video_model, data, **kwargs):
+    # Dekodowanie, predykcja w paczkach i zapis działają równolegle (video_pipeline.py)
+    # Klasy filtruje model: ignorowane z profilu i z żądania ("ignored_classes") nie są nawet wykrywane.
+    # Globalna lista /upload_frames nie dotyczy wideo - bez profilu wykrywane są wszystkie klasy.
+    classes = class_filter.allowed(data.get("profile"), data.get("ignored_classes"), use_global=False)
+    return VideoPipeline(
+        video_model,
+        describe_video_detections,
+        detection_store,
+        batch_size=data["batch_size"],  # Sprawdzone i przycięte w validate_video_params
+        queue_size=data["queue_size"],
+        writer_threads=data["writer_threads"],
+        frame_stride=data["frame_stride"],
+        target_fps=data.get("target_fps"),
+        predict_kwargs={"classes": classes} if classes is not None else None,
+        frame_store=frame_store,
+        **kwargs
+    )
+
+
+def run_video_job(job, registry):
+    """
+    Wykonuje zadanie z kolejki `JobManager`. Zadania mogą działać równolegle, więc dopisują
+    do wspólnego dziennika wykryć zamiast go czyścić.
+    """
+    job_model = PooledModel(registry.get(registry.resolve("video", job.params.get("backend"))))
+    cap = open_video(job.params["video_url"])
+    if not cap.isOpened():
+        raise RuntimeError("Failed to open video stream")
 
+    pipeline = build_video_pipeline(
+        job_model, job.params,
+        progress_callback=job.update_progress,
+        cancel_event=job.cancel_event,
+    )
+    try:
+        with get_profiler().video_run(f"video_job_{job.id}", pipeline.thread_prefix,
+                                      forced=job.params.get("profile_run", False),
+                                      meta={"kind": "video_job", "video_url": job.params["video_url"]}) as profile:
+            stats = pipeline.run(cap)
+        if profile.get("profile_id"):
+            stats["profile_id"] = profile["profile_id"]
+        return stats
+    finally:
+        cap.release()
+
+
+if SERVER_PROCESS:
+    app.extensions["video_jobs"] = JobManager(
+        run_video_job,
+        lambda: detectors,  # Zadania korzystają z tych samych pul procesów co handlery HTTP
+        workers=int(os.getenv("VIDEO_JOB_WORKERS", "1")),
+        max_queued=int(os.getenv("VIDEO_JOB_QUEUE_SIZE", "4")),
+    )
+
+
+# Parametry potoku wideo z żądania: (domyślna, maksymalna wartość); większe wartości przycinamy
+VIDEO_PARAM_LIMITS = {
+    "batch_size": (4, int(os.getenv("VIDEO_MAX_BATCH_SIZE", "16"))),
+    "queue_size": (32, int(os.getenv("VIDEO_MAX_QUEUE_SIZE", "128"))),
+    "writer_threads": (2, int(os.getenv("VIDEO_MAX_WRITER_THREADS", "8"))),
+    "frame_stride": (1, None),
+}
+
+
+class InvalidVideoParams(ValueError):
+    pass
+
+
+def validate_video_params(data):
+    """
+    Sprawdza parametry potoku z żądania (dodatnie liczby całkowite, target_fps > 0) i przycina je
+    do limitów serwera. Niepoprawne wartości -> InvalidVideoParams, czyli 400.
+    """
+    for key, (default, maximum) in VIDEO_PARAM_LIMITS.items():
+        value = data.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise InvalidVideoParams(f"'{key}' must be a positive integer")
+        data[key] = min(value, maximum) if maximum else value
+    target_fps = data.get("target_fps")
+    if target_fps is not None and (isinstance(target_fps, bool) or not isinstance(target_fps, (int, float))
+                                   or target_fps <= 0):
+        raise InvalidVideoParams("'target_fps' must be a positive number")
+    return data
+
+
+def prepare_video_request(data):
+    """
+    Uzupełnia parametry wideo o ustawienia z żądania - wspólne dla /detect_video i /jobs/detect_video.
+    Backend wybrany parametrem/nagłówkiem przechodzi do zadania razem z resztą parametrów
+    (nieznany backend -> UnknownBackend, czyli 400).
+    """
+    validate_video_params(data)
+    data["backend"] = detectors.resolve_request("video", request, data)
+    data["profile"] = class_filter.profile_for_request(request, data)
+    data["profile_run"] = get_profiler().requested(request)  # Profil przebiegu na życzenie (X-Profile: 1)
+    return data
+
+
+app.extensions["prepare_video_request"] = prepare_video_request  # Używane przez job_routes
 
 
 @app.route('/detect_video', methods=['POST'])
 def detect_video():
     data = request.get_json()
     video_url = data.get("video_url")
-    ignored_classes = data.get("ignored_classes", [])
 
     if not video_url:
         return jsonify({"error": "No video URL provided"}), 400
 
-    if video_url.startswith('file://'):
-        video_url = video_url[7:]
+    prepare_video_request(data)
+
+    if data.get("async"):
+        return submit_video_job(data)
 
-    cap = cv2.VideoCapture(video_url)
+    cap = open_video(video_url)
     if not cap.isOpened():
         logging.error(f"Nie udało się otworzyć wideo: {video_url}")
         return jsonify({"error": "Failed to open video stream"}), 400
 
-    frame_count = 0
+    # Bez czyszczenia dziennika wykryć - dopisują do niego równolegle zadania w tle i /upload_frames
+    pipeline = build_video_pipeline(PooledModel(detectors.get(data["backend"])), data)
+
+    try:
+        with get_profiler().video_run("detect_video", pipeline.thread_prefix, forced=data["profile_run"],
+                                      meta={"kind": "detect_video", "video_url": video_url}) as profile:
+            stats = pipeline.run(cap)
+    finally:
+        cap.release()
+    if profile.get("profile_id"):
+        stats["profile_id"] = profile["profile_id"]
 
-    if not os.path.exists("wyniki"):
-        os.makedirs("wyniki")
+    logging.info("Wideo przetworzone: %s", stats)
+    return jsonify({"status": "Processing complete", "stats": stats}), 200
 
-    with open("wyniki/general_detections.txt", "w", encoding="utf-8") as general_file:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
 
-            img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img_pil = Image.fromarray(img_rgb)
+@app.errorhandler(UnknownBackend)
+def unknown_backend(e):
+    return jsonify({"error": str(e)}), 400
 
-            results = model.predict(img_pil, verbose=False)  # Wykonanie predykcji
-            detections = results[0].boxes.data.cpu().numpy()  # Wyniki jako numpy
 
-            if ignored_classes:
-                detections = [d for d in detections if int(d[5]) not in ignored_classes]
+@app.errorhandler(InvalidVideoParams)
+def invalid_video_params(e):
+    return jsonify({"error": str(e)}), 400
 
-            if len(detections) > 0:
-                detection_list = []
 
-                for detection in detections:
-                    xmin, ymin, xmax, ymax, confidence, class_id = map(int, detection[:6])
-                    bbox = {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
-                    center_x = (xmin + xmax) // 2
-                    center_y = (ymin + ymax) // 2
-                    color = get_dominant_color(frame, bbox)
+@app.errorhandler(BackendLimitReached)
+def backend_limit_reached(e):
+    return jsonify({"error": str(e)}), 503
 
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    name = f"class_{class_id}"
 
-                    detection_entry = {
-                        "class": class_id,
-                        "name": name,
-                        "bbox": bbox,
-                        "center": {
-                            "x": center_x,
-                            "y": center_y
-                        },
-                        "color": color,
-                        "timestamp": timestamp
-                    }
-                    detection_list.append(detection_entry)
+# Pomijanie prawie identycznych klatek z telefonu (frame_dedup.py, próg DEDUP_THRESHOLD)
+frame_dedup = create_deduplicator()
 
-                general_file.write(f"Frame {frame_count}: {json.dumps(detection_list, ensure_ascii=False)}\n")
-                general_file.flush()
-                img_name = f"wyniki/frame_{frame_count}.jpg"
-                cv2.imwrite(img_name, frame)
 
-            frame_count += 1
+@app.route('/upload_frames/stats', methods=['GET'])
+def upload_frame_stats():
+    return jsonify(frame_dedup.snapshot())
 
-    cap.release()
-    return jsonify({"status": "Processing complete"}), 200
 
+# Potok przygotowania klatek z telefonu - lista etapów w UPLOAD_PREPROCESS (JSON), np.
+# [{"stage": "decode", "reduce": 2}, {"stage": "enhance", "method": "clahe"}]
+upload_preprocessor = pipeline_from_env("UPLOAD_PREPROCESS", [{"stage": "decode"}])
+# /upload_frames_test zapisuje obraz zmieszany z krawędziami - ten sam potok z etapem "edges"
+edges_preprocessor = Preprocessor([{"stage": "decode"}, {"stage": "enhance", "method": "edges", "invert": False}])
 
 
-with open("class_names.json", "r", encoding="utf-8") as f:
-    CLASS_NAMES = json.load(f)
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
 
 
+def upload_response(body, timings):
+    """
+    Odpowiedź /upload_frames; czasy etapów (ms) trafiają do histogramów /metrics i Server-Timing,
+    do logu na poziomie DEBUG, a do odpowiedzi z ?timings=1.
+    """
+    for stage, ms in timings.items():
+        metrics.observe_stage(stage, ms / 1000)
+    logging.debug("Czasy etapów /upload_frames: %s", timings)
+    if request.args.get("timings"):
+        body["timings"] = timings
+    return jsonify(body), 200
 
 
 @app.route('/upload_frames', methods=['POST'])
@@ -154,50 +309,59 @@ def upload_frame():
         return jsonify({"error": "No data received"}), 400
 
     img_bytes = request.data  # Otrzymane surowe dane
+    timings = {}
     try:
-        img = Image.open(io.BytesIO(img_bytes))
-        img_rgb = img.convert("RGB")
-        img_np = np.array(img_rgb)
-
-        # Kopia oryginalnego obrazu przed przekształceniami
-        original_np = img_np.copy()
-
-        # ===== Wykrywanie krawędzi =====
-        gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        edges_bgr = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        edges_bgr = cv2.bitwise_not(edges_bgr)  # Odwrócenie efektu wykrywania krawędzi
-        img_np = cv2.addWeighted(img_np, 0.8, edges_bgr, 0.2, 0)
+        # ===== Przygotowanie klatki (preprocessing.py) =====
+        # Dekodowanie prosto do BGR - bez PIL, kopii i konwersji kolorów
+        frame = upload_preprocessor.run(img_bytes)
+        timings.update(frame.timings)
+
+        # ===== Pomijanie duplikatów =====
+        # Klatka prawie taka sama jak poprzednia od tego klienta - bez inferencji i zapisu na dysk
+        started = time.perf_counter()
+        backend = detectors.resolve_request("upload", request)
+        profile = class_filter.profile_for_request(request)
+        # Wykrycia zależą od backendu i filtra klas - zmiana filtra unieważnia zapamiętane wykrycia
+        client_key = (f"{request.headers.get('X-Client-Id') or request.remote_addr}:{backend}:"
+                      f"{profile or ''}:{class_filter.version}")
+        signature, previous_detections = frame_dedup.check(client_key, frame.image)
+        timings["dedup"] = elapsed_ms(started)
+        if previous_detections is not None:
+            UPLOADS.inc(result="duplicate")
+            return upload_response({"detections": previous_detections, "duplicate": True}, timings)
 
         # ===== Predykcja =====
-        results = model.predict(
-            img_rgb, 
-            verbose=False,
+        started = time.perf_counter()
+        detections = detectors.get(backend).predict(
+            frame.model_input,
             conf=0.5,
             iou=0.45,
-            classes=[1,15,16,24,25,26,28,39,40,41,63,64,65,67,73,76,77,78,80,81]
-        )  
-
-        detections = results[0].boxes.data.cpu().numpy()
-
-        # Tworzenie katalogu "wyniki" jeśli nie istnieje
-        if not os.path.exists("wyniki"):
-            os.makedirs("wyniki")
-
-        frame_count = len([name for name in os.listdir("wyniki") if name.endswith(".jpg")]) + 1
+            classes=class_filter.allowed(profile)
+        )
+        timings["inference"] = elapsed_ms(started)
 
         # ===== Przetwarzanie wykryć =====
+        started = time.perf_counter()
         detection_list = []
         if len(detections) > 0:
-            for detection in detections:
+            # Współrzędne względem zdekodowanej (zapisywanej) klatki
+            detections = frame.boxes_in_image(detections)
+
+            # Kolory wszystkich pudełek naraz, bez konwersji całej klatki dla każdego pudełka
+            # uint8 BGR -> hex tylko dla odpowiedzi; dziennik dostaje tablicę RGB bez ponownego parsowania
+            colors_started = time.perf_counter()
+            dominant = get_dominant_colors(frame.image, boxes_from_detections(detections), COLOR_MODE)
+            colors = colors_to_hex(dominant)
+            timings["colors"] = elapsed_ms(colors_started)
+
+            for detection, color in zip(detections, colors):
                 xmin, ymin, xmax, ymax, confidence, class_id = map(int, detection[:6])
                 bbox = {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
                 center_x = (xmin + xmax) // 2
                 center_y = (ymin + ymax) // 2
-                color = get_dominant_color(img_rgb, bbox)  
 
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                name = CLASS_NAMES.get(str(class_id), f"class_{class_id}")
+                name = get_class_names().get(str(class_id), f"class_{class_id}")
 
                 detection_entry = {
                     "class": class_id,
@@ -210,20 +374,42 @@ def upload_frame():
                 }
                 detection_list.append(detection_entry)
 
+            timings["postprocess"] = elapsed_ms(started)
+
             # ===== Zapisywanie wykryć do pliku =====
-            frame_count = get_next_frame_number("./wyniki/")
-            img_name = f"wyniki/frame_{frame_count}.jpg"
-            
-            # Zapisujemy ORYGINALNE zdjęcie zamiast przekształconego
-            cv2.imwrite(img_name, cv2.cvtColor(original_np, cv2.COLOR_RGB2BGR))
-            logging.info(f"✅ Zapisano oryginalny obraz jako: {img_name}")
+            started = time.perf_counter()
+            frame_count = frame_store.next_frame_id()
+
+            # Zapisujemy ORYGINALNE zdjęcie zamiast przekształconego - przesłane bajty JPEG bez
+            # ponownego kodowania, jeśli potok nie zmienił obrazu; zapis w tle (wątek I/O magazynu)
+            if frame.modified:
+                img_name = frame_store.save_async(frame_count, image_bgr=frame.image)
+            else:
+                img_name = frame_store.save_async(frame_count, data=img_bytes)
+            logging.info("✅ Zapisano oryginalny obraz jako: %s", img_name)
+
+            detection_store.append(frame_count, detection_list, colors=dominant[:, ::-1])
+            logging.info("✅ Wykrycia zapisane do dziennika wykryć")
+            timings["save"] = elapsed_ms(started)
+            DETECTIONS.inc(len(detection_list), source="upload")
+
+        UPLOADS.inc(result="processed")
+        frame_dedup.remember(client_key, signature, detection_list)
+        return upload_response({"detections": detection_list}, timings)
 
-            with open("wyniki/general_detections.txt", "a", encoding="utf-8") as f:
-                f.write(f"Frame {frame_count}: {json.dumps(detection_list, ensure_ascii=False)}\n")
-            logging.info("✅ Wykrycia zapisane do general_detections.txt")
+    except PreprocessingError as e:
+        return jsonify({"error": str(e)}), 400
 
-        return jsonify({"detections": detection_list}), 200
+    except InferenceTimeout as e:
+        INFERENCE_TIMEOUTS.inc()
+        logging.error("Inference timeout: %s", e)
+        return jsonify({"error": str(e)}), 503
 
+    except UnknownBackend as e:
+        return jsonify({"error": str(e)}), 400
+
+    except BackendLimitReached as e:
+        return jsonify({"error": str(e)}), 503
 
     except Exception as e:
         logging.error(f"Error processing frame: {str(e)}")
@@ -236,22 +422,19 @@ def upload_frames():
         return jsonify({"error": "No image provided"}), 400
 
     file = request.files['image']
-    image = Image.open(file.stream).convert('RGB')
-    open_cv_image = np.array(image)  # Convert PIL image to numpy array
-    open_cv_image = open_cv_image[:, :, ::-1].copy()  # Convert RGB to BGR
-
-    # Convert to grayscale for edge detection
-    gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 100, 200)  # Perform edge detection
-
-    # Convert edges to BGR so it can be merged with the original image
-    edges_bgr = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-
-    # Blend edges with the original image
-    result = cv2.addWeighted(open_cv_image, 0.8, edges_bgr, 0.2, 0)
+    try:
+        # Decode and blend the image with its edges (preprocessing.py, "edges" stage)
+        result = edges_preprocessor.run(file.read()).model_input
+    except PreprocessingError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Simulate model processing (if needed, replace this with actual model call)
-    results = model(result)  # Assuming 'model' is defined somewhere
+    try:
+        detections = detectors.for_request("upload", request).predict(
+            result, classes=class_filter.allowed(class_filter.profile_for_request(request)))
+    except InferenceTimeout as e:
+        INFERENCE_TIMEOUTS.inc()
+        return jsonify({"error": str(e)}), 503
     
     try:
         filename = f"wyniki/image_{int(time.time())}.jpg"
@@ -267,6 +450,27 @@ def upload_frames():
 
 
 
+if SERVER_PROCESS:
+    startup_report = StartupReport(_import_started)
+    startup_report.record("import", time.perf_counter() - _import_started)
+    app.extensions["startup"] = startup_report
+    app.extensions["detector"] = detectors
+
+    # Głębokości kolejek liczone przy odczycie /metrics
+    metrics.gauge_callback("inference_queue_depth", "Obrazy czekające na pulę inferencji", detectors.queue_depth)
+    metrics.gauge_callback("frame_write_queue_depth", "Klatki czekające na zapis na dysk",
+                           frame_store.write_queue_depth)
+    metrics.gauge_callback("video_job_queue_depth", "Zadania wideo w kolejce",
+                           app.extensions["video_jobs"].queue_depth)
+    metrics.gauge_callback("derived_cache_bytes", "Rozmiar cache miniatur i wycinków",
+                           lambda: get_derived_cache("wyniki").snapshot()["bytes"])
+
+    if os.getenv("MODEL_WARMUP", "1") != "0":
+        start_warmup(detectors, startup_report)
+    else:
+        startup_report.finish("ready")
+
+
 if __name__ == '__main__':
     CORS(app)
     app.run(host='0.0.0.0', debug=True)
@@ -0,0 +1,237 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from analysis_cache import analysis_cache_key
+from computer_vision import (generate_group_prompt, generate_prompt, get_model,
+                             make_generation_config, split_answer)
+from frame_store import get_frame_store
+from metrics import timed
+
+
+def parse_group_answers(text, object_ids):
+    """
+    Odpowiedzi na prompt grupowy: linie `id: odpowiedź` (opcjonalnie z punktorem - lub *).
+    Linię dzielimy na pierwszym dwukropku i porównujemy lewą stronę ze znanymi id,
+    bo id zawierają nazwy klas ze spacjami (np. "cell phone_1").
+    """
+    object_ids = set(object_ids)
+    answers = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        object_id, answer = line.split(":", 1)
+        object_id = object_id.strip().lstrip("-*").strip().strip("*`").strip()
+        answer = answer.strip()
+        if object_id in object_ids and answer:
+            answers[object_id] = answer
+    return answers
+
+
+class TokenBucket:
+    """
+    Ogranicznik tempa zapytań: `rate` żetonów na sekundę, najwyżej `capacity` naraz.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AnalysisResultsStore:
+    """
+    Wyniki analizy obiektów (SQLite) z odciskiem klatki i atrybutów -
+    ponowne uruchomienie analizuje tylko obiekty, których odcisk się zmienił.
+    """
+
+    def __init__(self, path="./analysis_results.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                           "object_name TEXT PRIMARY KEY, fingerprint TEXT, result TEXT, updated_at REAL)")
+
+    def fingerprint(self, object_name):
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM results WHERE object_name = ?",
+                                     (object_name,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, object_name):
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE object_name = ?",
+                                     (object_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, object_name, fingerprint, result):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (object_name, fingerprint, json.dumps(result, ensure_ascii=False), time.time()))
+
+
+class BatchAnalyzer:
+    """
+    Równoległa analiza wielu zgubionych obiektów przez model Gemini (lub dowolny backend
+    z metodą `generate_content`, np. `FakeVisionModel`).
+
+    - najwyżej `max_in_flight` zapytań naraz i `requests_per_second` w średnim tempie,
+    - ponawianie z wykładniczym opóźnieniem przy błędach,
+    - obiekty z tej samej klatki trafiają do jednego zapytania (do `max_group_size`),
+    - wyniki są zapisywane od razu po otrzymaniu, a niezmienione obiekty są pomijane.
+    """
+
+    def __init__(self, model=None, max_in_flight=4, requests_per_second=2.0, max_retries=3,
+                 backoff_seconds=1.0, max_group_size=8, results_store=None, image_dir="./wyniki"):
+        self.model = model
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.bucket = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_group_size = max(1, int(max_group_size))
+        self.results_store = results_store or AnalysisResultsStore()
+        self.image_dir = image_dir
+        self.stats = {"requests": 0, "retries": 0, "skipped": 0, "analyzed": 0, "errors": 0}
+        self._stats_lock = threading.Lock()  # `_call` liczy zapytania z wątków puli
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _frame_path(self, frame_number):
+        record = get_frame_store(self.image_dir).get(frame_number)
+        return record["path"] if record else f"{self.image_dir}/frame_{frame_number}.jpg"
+
+    def _call(self, image_bytes, prompt, max_output_tokens):
+        model = self.model or get_model()
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                with timed("gemini"):
+                    response = model.generate_content(
+                        [{"mime_type": "image/jpeg", "data": image_bytes}, prompt],
+                        generation_config=make_generation_config(max_output_tokens),
+                    )
+                return response.text or ""
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+                logging.warning(f"Zapytanie do modelu nie powiodło się ({e}), ponawiam za {delay:.1f}s")
+                time.sleep(delay)
+
+    def _analyze_single(self, image_bytes, object_name, data):
+        prompt = generate_prompt(f"{object_name}: {json.dumps(data)}")
+        answer, summary = split_answer(self._call(image_bytes, prompt, 30) or "Brak odpowiedzi na prompt")
+        return {"description": "", "prompt": prompt, "answer": answer, "summary": summary}
+
+    def _analyze_group(self, image_bytes, group):
+        """
+        Zwraca listę (nazwa_obiektu, wynik) dla obiektów jednej klatki.
+        """
+        if len(group) == 1:
+            object_name, data = group[0]
+            return [(object_name, self._analyze_single(image_bytes, object_name, data))]
+
+        prompt = generate_group_prompt(group)
+        text = self._call(image_bytes, prompt, 30 * len(group) + 10)
+
+        answers = parse_group_answers(text, [object_name for object_name, _ in group])
+
+        results = []
+        for object_name, data in group:
+            if object_name in answers:
+                answer, summary = split_answer(answers[object_name])
+                results.append((object_name, {"description": "", "prompt": prompt,
+                                              "answer": answer, "summary": summary}))
+            else:
+                # Model pominął obiekt - pytamy o niego osobno
+                results.append((object_name, self._analyze_single(image_bytes, object_name, data)))
+        return results
+
+    def _run_group(self, image_bytes, group):
+        try:
+            return self._analyze_group(image_bytes, group)
+        except Exception as e:
+            return [(object_name, {"error": str(e)}) for object_name, _ in group]
+
+    def analyze(self, objects, force=False):
+        """
+        Analizuje obiekty `{nazwa: dane}` (format zgubione.txt) i zwraca `{nazwa: wynik}`.
+        Obiekty z niezmienionym odciskiem zwracane są z magazynu wyników bez zapytań.
+        """
+        results = {}
+        fingerprints = {}
+        groups = {}
+
+        frame_bytes = {}
+        for object_name, data in objects.items():
+            frame_number = data.get("frame")
+            if frame_number is None:
+                # Bez numeru klatki nie ma obrazu - nie szukamy pliku frame_None.jpg
+                results[object_name] = {"error": "Object has no frame"}
+                self._count("errors")
+                continue
+            if frame_number not in frame_bytes:
+                try:
+                    with open(self._frame_path(frame_number), "rb") as image_file:
+                        frame_bytes[frame_number] = image_file.read()
+                except Exception as e:
+                    frame_bytes[frame_number] = e
+
+            image_bytes = frame_bytes[frame_number]
+            if isinstance(image_bytes, Exception):
+                results[object_name] = {"error": str(image_bytes)}
+                self._count("errors")
+                continue
+
+            fingerprint = analysis_cache_key(image_bytes, object_name, data)
+            fingerprints[object_name] = fingerprint
+            if not force and self.results_store.fingerprint(object_name) == fingerprint:
+                stored = self.results_store.get(object_name)
+                if stored is not None:
+                    results[object_name] = stored
+                    self._count("skipped")
+                    continue
+
+            groups.setdefault(frame_number, []).append((object_name, data))
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = []
+            for frame_number, group in groups.items():
+                for start in range(0, len(group), self.max_group_size):
+                    futures.append(executor.submit(self._run_group, frame_bytes[frame_number],
+                                                   group[start:start + self.max_group_size]))
+
+            for future in as_completed(futures):
+                for object_name, result in future.result():
+                    results[object_name] = result
+                    if "error" in result:
+                        self._count("errors")
+                    else:
+                        self._count("analyzed")
+                        self.results_store.save(object_name, fingerprints[object_name], result)
+
+        return results
@@ -0,0 +1,83 @@
+"""
+Porównanie: dawne `process_lost_objects` (obiekt po obiekcie, dwa zapytania na obiekt)
+vs `BatchAnalyzer` na lokalnym FakeVisionModel z zadanym opóźnieniem.
+
+Uruchomienie (z katalogu back/main):
+    python -m benchmarks.bench_batch_analyzer --objects 40 --per-frame 4 --latency 0.2
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import cv2
+
+from batch_analyzer import AnalysisResultsStore, BatchAnalyzer
+from benchmarks.fixtures import make_frame
+from computer_vision import FakeVisionModel, analyze_image, set_model
+
+
+def fake_answer(contents):
+    # Odpowiada na prompt grupowy linią na każdy obiekt `- id: ...`
+    prompt = contents[-1]
+    ids = re.findall(r"^- ([^:\n]+):", prompt, flags=re.MULTILINE)
+    if not ids:
+        return "The object is next to the desk.&It is next to the desk."
+    return "\n".join(f"{object_id}: It is next to the desk. & Next to the desk." for object_id in ids)
+
+
+def make_objects(image_dir, count, per_frame):
+    objects = {}
+    for i in range(count):
+        frame_number = i // per_frame + 1
+        path = os.path.join(image_dir, f"frame_{frame_number}.jpg")
+        if not os.path.exists(path):
+            cv2.imwrite(path, make_frame(320, 240, seed=frame_number))
+        objects[f"cup_{i + 1}"] = {"name": "cup", "color": f"#{i:06x}", "frame": frame_number,
+                                   "bbox": {"xmin": i, "ymin": i, "xmax": i + 20, "ymax": i + 20}}
+    return objects
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=40)
+    parser.add_argument("--per-frame", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Opóźnienie jednego zapytania [s]")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_dir = os.path.join(tmp, "wyniki")
+        os.makedirs(image_dir)
+        objects = make_objects(image_dir, args.objects, args.per_frame)
+
+        model = FakeVisionModel(latency=args.latency, answer=fake_answer)
+        set_model(model)
+
+        started = time.perf_counter()
+        for key, value in objects.items():
+            analyze_image(os.path.join(image_dir, f"frame_{value['frame']}.jpg"), f"{key}: {json.dumps(value)}")
+        sequential = {"seconds": time.perf_counter() - started, "requests": model.calls}
+
+        analyzer = BatchAnalyzer(model=model, max_in_flight=args.max_in_flight, requests_per_second=args.rps,
+                                 results_store=AnalysisResultsStore(os.path.join(tmp, "results.db")),
+                                 image_dir=image_dir)
+        started = time.perf_counter()
+        analyzer.analyze(objects)
+        batch = {"seconds": time.perf_counter() - started, **analyzer.stats}
+
+        started = time.perf_counter()
+        analyzer.analyze(objects)
+        rerun = {"seconds": time.perf_counter() - started, "skipped": analyzer.stats["skipped"]}
+
+    report = {"sequential": sequential, "batch": batch, "rerun_unchanged": rerun,
+              "speedup": sequential["seconds"] / batch["seconds"] if batch["seconds"] else None}
+    print(json.dumps(report, indent=4))
+    return report
+
+
+if __name__ == "__main__":
+    main()
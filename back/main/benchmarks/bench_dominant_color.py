@@ -0,0 +1,93 @@
+"""
+Mikro-benchmark kolorów pudełek: dotychczasowa ścieżka (get_dominant_color na obrazie PIL,
+pełna konwersja klatki dla każdego pudełka) vs `get_dominant_colors` dla 5, 50 i 500 pudełek.
+
+Uruchomienie (z katalogu back/main):
+    python -m benchmarks.bench_dominant_color
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.fixtures import make_frame
+from color_utils import colors_to_hex, get_dominant_colors
+
+
+def legacy_get_dominant_color(image, bbox):
+    # Kopia dawnej implementacji z app.py
+    if isinstance(image, Image.Image):
+        image = np.array(image)
+
+    xmin, ymin, xmax, ymax = bbox['xmin'], bbox['ymin'], bbox['xmax'], bbox['ymax']
+    region = image[ymin:ymax, xmin:xmax]
+
+    if region.size == 0:
+        return "#000000"
+
+    region = region.reshape(-1, 3)
+    mean_color = np.mean(region, axis=0).astype(int)
+    r, g, b = mean_color[2], mean_color[1], mean_color[0]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def make_boxes(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.integers(0, width - 40, size=count)
+    y1 = rng.integers(0, height - 40, size=count)
+    x2 = np.minimum(x1 + rng.integers(20, width // 3, size=count), width)
+    y2 = np.minimum(y1 + rng.integers(20, height // 3, size=count), height)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(box_counts=(5, 50, 500), width=1280, height=720, repeat=5):
+    frame = make_frame(width, height)
+    pil_frame = Image.fromarray(frame)
+    report = {}
+
+    for count in box_counts:
+        boxes = make_boxes(count, width, height)
+        bboxes = [{"xmin": int(b[0]), "ymin": int(b[1]), "xmax": int(b[2]), "ymax": int(b[3])} for b in boxes]
+
+        legacy = [legacy_get_dominant_color(pil_frame, bbox) for bbox in bboxes]
+        batched = colors_to_hex(get_dominant_colors(frame, boxes))
+        assert legacy == batched, "Batch colors differ from the legacy implementation"
+
+        legacy_time = best_of(lambda: [legacy_get_dominant_color(pil_frame, bbox) for bbox in bboxes], repeat)
+        batch_time = best_of(lambda: colors_to_hex(get_dominant_colors(frame, boxes)), repeat)
+        mode_time = best_of(lambda: get_dominant_colors(frame, boxes, mode="mode"), repeat)
+
+        report[count] = {
+            "legacy_ms": legacy_time * 1000,
+            "batch_mean_ms": batch_time * 1000,
+            "batch_mode_ms": mode_time * 1000,
+            "speedup": legacy_time / batch_time if batch_time else None,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = run(width=args.width, height=args.height, repeat=args.repeat)
+    print(json.dumps(report, indent=4))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Porównanie trackerów na syntetycznym strumieniu wykryć: `ObjectTracker` (klasa + kolor)
+vs `SortTracker` (algorytm węgierski / zachłanny, z filtrem Kalmana i bez).
+
+Obiekty poruszają się ze stałą prędkością i odbijają od krawędzi, część ma tę samą klasę
+i prawie ten sam kolor, a wykrycia czasem znikają. Raportujemy klatki/s, przełączenia ID
+(wykrycie tego samego obiektu przypisane do innej nazwy niż poprzednio), udział wykryć, które mają
+własny obiekt w wyniku (wykrycia sklejone z innym obiektem go nie mają) i liczbę trzymanych obiektów.
+
+Uruchomienie (z katalogu back/main):
+    python -m benchmarks.bench_tracker --objects 20 --frames 2000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from lost_objects_tracker import ObjectTracker
+from sort_tracker import SortTracker
+
+
+def make_stream(objects=20, frames=2000, width=1280, height=720, miss_rate=0.1, lifetime=400, seed=0):
+    """
+    Lista klatek: każda to lista par (id_obiektu, wykrycie w formacie trackera).
+    Co `lifetime` klatek obiekt jest zastępowany nowym w innym miejscu.
+    """
+    rng = np.random.default_rng(seed)
+    classes = ["cup", "bottle", "book"]
+    palette = rng.integers(0, 256, size=(max(1, objects // 3), 3))  # Wspólne kolory - obiekty "bliźniacze"
+
+    def spawn(identifier):
+        size = rng.uniform(40, 120, size=2)
+        return {"id": identifier, "class": classes[identifier % len(classes)],
+                "color": palette[identifier % len(palette)].astype(float),
+                "position": rng.uniform([0, 0], [width - size[0], height - size[1]]),
+                "velocity": rng.uniform(-6, 6, size=2), "size": size, "born": 0}
+
+    alive = [spawn(i) for i in range(objects)]
+    next_id = objects
+    stream = []
+    for frame in range(frames):
+        detections = []
+        for index, obj in enumerate(alive):
+            if frame - obj["born"] >= lifetime and rng.random() < 0.01:
+                obj = alive[index] = spawn(next_id)
+                obj["born"] = frame
+                next_id += 1
+
+            obj["position"] += obj["velocity"]
+            for axis, limit in enumerate((width, height)):
+                if not 0 <= obj["position"][axis] <= limit - obj["size"][axis]:
+                    obj["velocity"][axis] *= -1
+                    obj["position"][axis] = np.clip(obj["position"][axis], 0, limit - obj["size"][axis])
+            if rng.random() < miss_rate:
+                continue
+
+            x1, y1 = obj["position"] + rng.normal(0, 2, size=2)
+            x2, y2 = obj["position"] + obj["size"] + rng.normal(0, 2, size=2)
+            r, g, b = np.clip(obj["color"] + rng.normal(0, 6, size=3), 0, 255).astype(int)
+            detections.append((obj["id"], {
+                "name": obj["class"], "confidence": 0.9, "color": f"#{r:02x}{g:02x}{b:02x}",
+                "bbox": {"xmin": int(x1), "ymin": int(y1), "xmax": int(x2), "ymax": int(y2)},
+            }))
+        stream.append(detections)
+    return stream
+
+
+def evaluate(tracker, stream):
+    last_name = {}
+    switches = assigned = total = 0
+    elapsed = 0.0
+    for frame, detections in enumerate(stream):
+        frame_data = [dict(detection) for _, detection in detections]
+        started = time.perf_counter()
+        tracker.process_frame(frame_data, frame)
+        elapsed += time.perf_counter() - started
+
+        # Nazwa przypisana wykryciu = obiekt trackera, którego bieżący słownik to to wykrycie
+        names = {id(obj): name for name, obj in tracker.objects.items() if obj.get('frame') == frame}
+        for (identifier, _), obj in zip(detections, frame_data):
+            total += 1
+            name = names.get(id(obj))
+            if name is None:
+                continue
+            assigned += 1
+            if identifier in last_name and last_name[identifier] != name:
+                switches += 1
+            last_name[identifier] = name
+
+    return {"frames_per_second": round(len(stream) / elapsed, 1) if elapsed else None,
+            "id_switches": switches,
+            "assigned_ratio": round(assigned / total, 4) if total else 0.0,
+            "objects_held": len(tracker.objects), "ground_truth_objects": len(last_name)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--miss-rate", type=float, default=0.1)
+    parser.add_argument("--threshold", type=float, default=100, help="delta_color_threshold")
+    parser.add_argument("--color-space", default="rgb", choices=["rgb", "lab", "de2000"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stream = make_stream(args.objects, args.frames, miss_rate=args.miss_rate, seed=args.seed)
+    trackers = {
+        "color": lambda: ObjectTracker(args.threshold, args.color_space),
+        "sort_hungarian_kalman": lambda: SortTracker(args.threshold, color_space=args.color_space),
+        "sort_hungarian_static": lambda: SortTracker(args.threshold, use_kalman=False, color_space=args.color_space),
+        "sort_greedy_kalman": lambda: SortTracker(args.threshold, matcher="greedy", color_space=args.color_space),
+    }
+    report = {name: evaluate(factory(), stream) for name, factory in trackers.items()}
+    print(json.dumps(report, indent=4))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Porównanie FPS: szeregowa pętla `detect_video` vs `VideoPipeline`.
+
+Uruchomienie (z katalogu back/main):
+    python -m benchmarks.bench_video_pipeline --video sample.mp4 --weights ./yolo/yolo11l.pt
+Bez `--weights` używany jest StubModel, bez `--video` generowane jest syntetyczne wideo.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.fixtures import StubModel, make_video
+from detection_store import DetectionStore
+from video_pipeline import VideoPipeline
+
+
+def describe(frame, detections):
+    return [{"class": int(d[5]), "bbox": dict(zip(("xmin", "ymin", "xmax", "ymax"), map(int, d[:4])))}
+            for d in detections]
+
+
+def run_serial(model, video, output_dir):
+    """
+    Stara pętla z `detect_video`: dekodowanie, predykcja i zapis jedna klatka po drugiej.
+    """
+    cap = cv2.VideoCapture(video)
+    frames = 0
+    started = time.perf_counter()
+    with open(os.path.join(output_dir, "general_detections.txt"), "w", encoding="utf-8") as log:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            detections = model.predict(frame, verbose=False)[0].boxes.data.cpu().numpy()
+            if len(detections) > 0:
+                log.write(f"Frame {frames}: {json.dumps(describe(frame, detections))}\n")
+                log.flush()
+                cv2.imwrite(os.path.join(output_dir, f"frame_{frames}.jpg"), frame)
+            frames += 1
+    cap.release()
+    elapsed = time.perf_counter() - started
+    return {"frames_processed": frames, "elapsed": elapsed, "fps": frames / elapsed if elapsed else 0.0}
+
+
+def run_pipeline(model, video, output_dir, **options):
+    cap = cv2.VideoCapture(video)
+    store = DetectionStore(os.path.join(output_dir, "detections"))
+    pipeline = VideoPipeline(model, describe, store, output_dir=output_dir, reset_store=True, **options)
+    try:
+        return pipeline.run(cap)
+    finally:
+        cap.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Plik wideo (domyślnie syntetyczne)")
+    parser.add_argument("--frames", type=int, default=120, help="Długość syntetycznego wideo")
+    parser.add_argument("--weights", help="Wagi YOLO; bez nich StubModel")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--writer-threads", type=int, default=2)
+    parser.add_argument("--frame-stride", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.weights:
+        from ultralytics import YOLO
+        model = YOLO(args.weights)
+    else:
+        model = StubModel()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_video(os.path.join(tmp, "sample.avi"), frames=args.frames)
+        serial = run_serial(model, video, tmp)
+        pipelined = run_pipeline(model, video, tmp, batch_size=args.batch_size,
+                                 writer_threads=args.writer_threads, frame_stride=args.frame_stride)
+
+    report = {"serial": serial, "pipeline": pipelined,
+              "speedup": pipelined["fps"] / serial["fps"] if serial["fps"] else None}
+    print(json.dumps(report, indent=4))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Syntetyczne dane do benchmarków - działają offline, bez wag modelu.
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(data)
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+class StubModel:
+    """
+    Udaje ultralytics YOLO: `predict` zwraca stałe wykrycia i kosztuje `ms_per_call + ms_per_image`.
+    """
+
+    def __init__(self, ms_per_call=5.0, ms_per_image=20.0, detections_per_image=3, seed=0):
+        self.ms_per_call = ms_per_call
+        self.ms_per_image = ms_per_image
+        self.detections_per_image = detections_per_image
+        self.rng = np.random.default_rng(seed)
+
+    def _detections(self, image):
+        height, width = image.shape[:2]
+        boxes = []
+        for _ in range(self.detections_per_image):
+            x1, y1 = self.rng.integers(0, width // 2), self.rng.integers(0, height // 2)
+            w, h = self.rng.integers(10, width // 2), self.rng.integers(10, height // 2)
+            boxes.append([x1, y1, x1 + w, y1 + h, 0.9, self.rng.integers(0, 80)])
+        return np.array(boxes, dtype=np.float32).reshape(-1, 6)
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        time.sleep((self.ms_per_call + self.ms_per_image * len(images)) / 1000.0)
+        return [_Result(self._detections(np.asarray(image))) for image in images]
+
+    __call__ = predict
+
+
+def make_frame(width=640, height=480, seed=0):
+    """
+    Losowa klatka BGR z kilkoma prostokątami, żeby JPEG miał realistyczny rozmiar.
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    for _ in range(8):
+        x1, y1 = int(rng.integers(0, width - 20)), int(rng.integers(0, height - 20))
+        x2, y2 = x1 + int(rng.integers(10, width // 3)), y1 + int(rng.integers(10, height // 3))
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+    return frame
+
+
+def make_video(path, frames=120, width=640, height=480, fps=30):
+    """
+    Zapisuje krótkie syntetyczne wideo MJPG i zwraca jego ścieżkę.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for i in range(frames):
+        writer.write(make_frame(width, height, seed=i))
+    writer.release()
+    return path
@@ -0,0 +1,420 @@
+"""
+Zestaw benchmarków ścieżek krytycznych backendu - w całości offline: syntetyczne klatki
+i strumienie wykryć, StubModel zamiast wag YOLO, katalog roboczy tymczasowy.
+
+Przypadki:
+- upload_frames   - /upload_frames od początku do końca przy N równoległych klientach
+- dominant_color  - `get_dominant_color` pudełko po pudełku vs `get_dominant_colors`
+- tracker         - `ObjectTracker.process_frame` (i SortTracker) w zależności od liczby obiektów
+- monitor_cycle   - cykl `monitor_file` (`monitor_cycle`) w zależności od rozmiaru dziennika wykryć
+- retention       - dawne `clean_unused_images` vs `RetentionEngine.collect` w zależności od liczby klatek
+- get_all         - ścieżka odczytu /get-all (pierwszy odczyt, odczyt z pamięci, 304)
+
+Wynik trafia do JSON-a. Z `--baseline` porównujemy metryki z poprzednim przebiegiem:
+`*_ms` - mniej znaczy lepiej, `*_per_s` - więcej znaczy lepiej; pogorszenie ponad `--tolerance`
+jest zgłaszane jako regresja (kod wyjścia 1).
+
+Uruchomienie (z katalogu back/main):
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --baseline bench.json --output bench_new.json --tolerance 0.2
+    python -m benchmarks.suite --only tracker,get_all --quick
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_dominant_color import make_boxes
+from benchmarks.bench_tracker import make_stream
+from benchmarks.fixtures import StubModel, make_frame
+
+MAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {}
+
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+def best_ms(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 3)
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 3) if values else None
+
+
+def load_app():
+    """
+    Importuje app.py w bieżącym (tymczasowym) katalogu i podmienia modele na StubModel.
+    """
+    import app as appmod
+    from inference_server import LocalDetector
+
+    appmod.detectors.detector_factory = lambda path: LocalDetector(
+        path, lambda p: StubModel(ms_per_call=2.0, ms_per_image=8.0, detections_per_image=5))
+    return appmod
+
+
+# ===== Przypadki =====
+
+@case("upload_frames")
+def bench_upload_frames(quick):
+    appmod = load_app()
+    frames = []
+    for seed in range(16):
+        ok, jpg = cv2.imencode(".jpg", make_frame(640, 480, seed=seed))
+        frames.append(jpg.tobytes())
+
+    per_client = 5 if quick else 25
+    results = {}
+    for clients in ((1, 4) if quick else (1, 4, 8)):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def client(index):
+            test_client = appmod.app.test_client()
+            headers = {"X-Client-Id": f"bench-{index}"}
+            for i in range(per_client):
+                started = time.perf_counter()
+                response = test_client.post("/upload_frames", data=frames[(index + i) % len(frames)],
+                                            content_type="image/jpeg", headers=headers)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        results[f"clients_{clients}"] = {
+            "requests": len(latencies), "errors": len(errors),
+            "frames_per_s": round(len(latencies) / wall, 1),
+            "p50_ms": percentile_ms(latencies, 50), "p95_ms": percentile_ms(latencies, 95),
+        }
+    appmod.frame_store.flush()
+    return results
+
+
+@case("dominant_color")
+def bench_dominant_color(quick):
+    from color_utils import get_dominant_color, get_dominant_colors
+
+    frame = make_frame(1280, 720)
+    results = {}
+    for count in ((5, 50) if quick else (5, 50, 500)):
+        boxes = make_boxes(count, 1280, 720)
+        bboxes = [dict(zip(("xmin", "ymin", "xmax", "ymax"), map(int, box))) for box in boxes]
+        results[f"boxes_{count}"] = {
+            "per_box_ms": best_ms(lambda: [get_dominant_color(frame, bbox) for bbox in bboxes]),
+            "batch_ms": best_ms(lambda: get_dominant_colors(frame, boxes)),
+        }
+    return results
+
+
+@case("tracker")
+def bench_tracker(quick):
+    from lost_objects_tracker import ObjectTracker
+    from sort_tracker import SortTracker
+
+    frames = 100 if quick else 300
+    results = {}
+    for objects in ((10, 100) if quick else (10, 100, 500)):
+        stream = [[dict(detection) for _, detection in detections]
+                  for detections in make_stream(objects, frames, miss_rate=0.1)]
+        for label, factory in (("color", lambda: ObjectTracker(100)), ("sort", lambda: SortTracker(100))):
+            tracker = factory()
+            started = time.perf_counter()
+            for frame, detections in enumerate(stream):
+                tracker.process_frame([dict(d) for d in detections], frame)
+            elapsed = time.perf_counter() - started
+            results[f"{label}_objects_{objects}"] = {
+                "per_frame_ms": round(elapsed / frames * 1000, 3),
+                "frames_per_s": round(frames / elapsed, 1),
+            }
+    return results
+
+
+def write_detection_log(store, frames, per_frame=3, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    for frame in range(start, start + frames):
+        detections = []
+        for i in range(per_frame):
+            x, y = int(rng.integers(0, 600)), int(rng.integers(0, 440))
+            r, g, b = rng.integers(0, 256, size=3)
+            detections.append({"class": int(rng.integers(0, 80)), "confidence": 0.9,
+                               "bbox": {"xmin": x, "ymin": y, "xmax": x + 40, "ymax": y + 40},
+                               "color": f"#{r:02x}{g:02x}{b:02x}"})
+        store.append(frame, detections, timestamp=0)
+
+
+@case("monitor_cycle")
+def bench_monitor_cycle(quick):
+    from detection_store import DetectionStore
+    from frame_store import FrameStore
+    from lost_objects_tracker import ObjectTracker, StoreTailer, load_class_names, monitor_cycle
+    from retention import RetentionEngine
+    from state_publisher import StatePublisher
+
+    class_names = load_class_names()
+    results = {}
+    for log_frames in ((500, 2000) if quick else (1000, 10000)):
+        work = tempfile.mkdtemp(prefix="monitor_", dir=".")
+        store = DetectionStore(os.path.join(work, "detections"))
+        write_detection_log(store, log_frames)
+
+        tailer = StoreTailer(store, class_names)
+        tracker = ObjectTracker(100)
+        retention = RetentionEngine(FrameStore(os.path.join(work, "frames")), background=False)
+        publisher = StatePublisher(os.path.join(work, "zgubione.txt"))
+
+        started = time.perf_counter()
+        monitor_cycle(tailer, tracker, retention, publisher)
+        cold = time.perf_counter() - started
+
+        # Cykl w stanie ustalonym: 10 nowych klatek na końcu dużego dziennika
+        incremental = []
+        for step in range(5):
+            write_detection_log(store, 10, start=log_frames + step * 10, seed=step + 1)
+            started = time.perf_counter()
+            monitor_cycle(tailer, tracker, retention, publisher)
+            incremental.append(time.perf_counter() - started)
+
+        results[f"log_frames_{log_frames}"] = {
+            "cold_ms": round(cold * 1000, 3),
+            "cold_frames_per_s": round(log_frames / cold, 1),
+            "incremental_ms": round(min(incremental) * 1000, 3),
+            "objects": len(tracker.objects),
+        }
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def legacy_clean_unused_images(used_frames, object_tracker, frame_store):
+    # Kopia dawnego `clean_unused_images` (bez logów) - przegląd wszystkich starszych klatek w każdym cyklu
+    max_used_frame = max(used_frames)
+    safe_threshold = max_used_frame - 10
+    for frame_number in frame_store.frame_ids(below=safe_threshold):
+        has_objects = any(obj["frame"] == frame_number for obj in object_tracker.objects.values())
+        if frame_number not in used_frames and not has_objects:
+            frame_store.remove(frame_number)
+
+
+def make_retention_fixture(directory, frames, seed=0):
+    """
+    FrameStore z `frames` małymi plikami i tracker, którego obiekty wskazują co 10. klatkę.
+    """
+    from frame_store import FrameStore
+    from lost_objects_tracker import ObjectTracker
+
+    store = FrameStore(directory)
+    for frame in range(frames):
+        path = store.path_for(frame)
+        with open(path, "wb") as f:
+            f.write(b"\xff\xd8\xff\xd9")
+        store.register(frame, path, size=4)
+
+    rng = np.random.default_rng(seed)
+    tracker = ObjectTracker(10)
+    for frame in range(frames):
+        detections = []
+        if frame % 10 == 0:
+            r, g, b = rng.integers(0, 256, size=3)
+            detections.append({"name": f"item_{frame}", "color": f"#{r:02x}{g:02x}{b:02x}"})
+        tracker.process_frame(detections, frame)
+    return store, tracker
+
+
+@case("retention")
+def bench_retention(quick):
+    from retention import RetentionEngine
+
+    def timed_pair(fn):
+        # Pierwszy cykl (usuwa zaległe klatki) i kolejny bez nowych klatek
+        started = time.perf_counter()
+        fn()
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        fn()
+        return first, time.perf_counter() - started
+
+    repeat = 2 if quick else 3  # Pierwszy cykl zmienia stan - każdy pomiar na świeżych danych
+    results = {}
+    for frames in ((500, 2000) if quick else (1000, 10000)):
+        legacy, engine_runs = [], []
+        for attempt in range(repeat):
+            work = tempfile.mkdtemp(prefix="retention_", dir=".")
+            store, tracker = make_retention_fixture(os.path.join(work, "legacy"), frames)
+            used_frames = {obj["frame"] for obj in tracker.objects.values()}
+            legacy.append(timed_pair(lambda: legacy_clean_unused_images(used_frames, tracker, store)))
+
+            store, tracker = make_retention_fixture(os.path.join(work, "engine"), frames)
+            engine = RetentionEngine(store, background=False)
+            engine_runs.append(timed_pair(lambda: engine.collect(tracker)))
+            shutil.rmtree(work, ignore_errors=True)
+
+        results[f"frames_{frames}"] = {
+            "legacy_first_ms": round(min(run[0] for run in legacy) * 1000, 3),
+            "legacy_steady_ms": round(min(run[1] for run in legacy) * 1000, 3),
+            "collect_first_ms": round(min(run[0] for run in engine_runs) * 1000, 3),
+            "collect_steady_ms": round(min(run[1] for run in engine_runs) * 1000, 3),
+            "deleted": engine.stats["deleted"],
+        }
+    return results
+
+
+@case("get_all")
+def bench_get_all(quick):
+    appmod = load_app()
+    client = appmod.app.test_client()
+    rng = np.random.default_rng(0)
+    results = {}
+    for objects in ((100, 1000) if quick else (100, 1000, 10000)):
+        with open("zgubione.txt", "w", encoding="utf-8") as f:
+            for i in range(objects):
+                x, y = (int(v) for v in rng.integers(0, 600, size=2))
+                f.write(f"cup_{i}: " + json.dumps({
+                    "name": "cup", "color": "#a0b0c0", "frame": i, "confidence": 0.9,
+                    "bbox": {"xmin": x, "ymin": y, "xmax": x + 40, "ymax": y + 40}}) + "\n")
+
+        started = time.perf_counter()
+        response = client.get("/get-all")
+        first = time.perf_counter() - started
+        etag = response.headers.get("ETag")
+        results[f"objects_{objects}"] = {
+            "first_ms": round(first * 1000, 3),
+            "warm_ms": best_ms(lambda: client.get("/get-all")),
+            "not_modified_ms": best_ms(lambda: client.get("/get-all", headers={"If-None-Match": etag})),
+            "bytes": len(response.data),
+        }
+    return results
+
+
+# ===== Wyniki i porównanie =====
+
+def metadata(quick):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=MAIN_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__,
+            "quick": quick}
+
+
+def compare(baseline, current, tolerance, min_delta_ms=0.5):
+    """
+    Lista regresji: metryki `*_ms` wyższe albo `*_per_s` niższe od bazowych o więcej niż `tolerance`.
+    Pomijamy kopie dawnych implementacji (`legacy_*`) i różnice czasu poniżej `min_delta_ms` (szum).
+    """
+    regressions = []
+    for case_name, variants in current.get("results", {}).items():
+        for variant, values in variants.items():
+            previous = baseline.get("results", {}).get(case_name, {}).get(variant, {})
+            for metric, value in values.items():
+                old = previous.get(metric)
+                if metric.startswith("legacy_") or not isinstance(value, (int, float)) \
+                        or not isinstance(old, (int, float)) or old <= 0:
+                    continue
+                if metric.endswith("_ms"):
+                    if value - old < min_delta_ms:
+                        continue
+                    change = value / old - 1
+                elif metric.endswith("_per_s"):
+                    change = old / value - 1 if value > 0 else float("inf")
+                else:
+                    continue
+                if change > tolerance:
+                    regressions.append({"case": case_name, "variant": variant, "metric": metric,
+                                        "baseline": old, "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def run(names, quick):
+    """
+    Uruchamia przypadki w tymczasowym katalogu roboczym (app.py i tracker używają ścieżek względnych).
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    shutil.copy(os.path.join(MAIN_DIR, "class_names.json"), workdir)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = {}
+        for name in names:
+            print(f"[LOG] Benchmark {name}...", file=sys.stderr)
+            results[name] = CASES[name](quick)
+        return results
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"Przypadki po przecinku: {','.join(CASES)}")
+    parser.add_argument("--quick", action="store_true", help="Mniejsze rozmiary (szybki przebieg)")
+    parser.add_argument("--output", help="Plik JSON z wynikami")
+    parser.add_argument("--baseline", help="Poprzedni plik JSON do porównania")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dopuszczalne pogorszenie (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Pomijane różnice czasu [ms]")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"Nieznane przypadki: {', '.join(unknown)}")
+
+    # Przed importem app.py: model w procesie, bez rozgrzewania, bez pomijania duplikatów i logów DEBUG
+    for variable, value in (("INFERENCE_WORKERS", "0"), ("MODEL_WARMUP", "0"),
+                            ("DEDUP_THRESHOLD", "0"), ("LOG_LEVEL", "WARNING")):
+        os.environ.setdefault(variable, value)
+    if MAIN_DIR not in sys.path:
+        sys.path.insert(0, MAIN_DIR)
+
+    report = {"meta": metadata(args.quick), "results": run(names, args.quick)}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["baseline"] = {"file": args.baseline, "tolerance": args.tolerance}
+            report["regressions"] = compare(json.load(f), report, args.tolerance, args.min_delta_ms)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    for regression in report.get("regressions", []):
+        print(f"[WARNING] Regresja {regression['case']}/{regression['variant']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']} (+{regression['change']:.0%})", file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+PROFILE_HEADER = "X-Filter-Profile"
+PROFILE_PARAM = "profile"
+CLIENT_HEADER = "X-Client-Id"
+
+# Klasy wykrywane przez /upload_frames przed wprowadzeniem filtra - domyślny stan bez ignored_classes.json
+DEFAULT_ALLOWED = [1, 15, 16, 24, 25, 26, 28, 39, 40, 41, 63, 64, 65, 67, 73, 76, 77, 78]
+
+
+def get_class_names(path="class_names.json"):
+    """
+    Słownik {"id": "nazwa"} z class_names.json - wczytywany przy pierwszym użyciu i trzymany w pamięci.
+    Wspólny dla app.py, filtra klas i lost_objects_tracker; wynik jest współdzielony, więc go nie modyfikujemy.
+    """
+    return _read_class_names(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _read_class_names(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ClassFilter:
+    """
+    Wspólny filtr klas dla wszystkich ścieżek inferencji.
+
+    Plik `ignored_classes.json` ({"ignored_classes": [id, ...], "profiles": {"nazwa": [id, ...]}})
+    jest wczytywany raz i trzymany w pamięci; zmiany przez `update` zapisujemy atomowo i od razu
+    stosujemy w procesie, a zmianę pliku z zewnątrz (inny proces) wykrywamy po mtime co `check_interval` s.
+    Z listy ignorowanych wyliczamy posortowaną listę dozwolonych klas, którą przekazujemy modelowi
+    jako `classes=` - odrzucone klasy nie przechodzą przez post-processing i NMS.
+
+    Profil (np. preset z aplikacji) zastępuje globalną listę ignorowanych. Wybiera go nagłówek
+    X-Filter-Profile albo ?profile=, a bez nich profil o nazwie równej X-Client-Id, jeśli istnieje.
+
+    Pliki są czytane dopiero przy pierwszym użyciu, więc utworzenie filtra przy imporcie nic nie kosztuje.
+    """
+
+    def __init__(self, path="./ignored_classes.json", class_names_path="class_names.json", check_interval=2.0):
+        self.path = path
+        self.class_names_path = class_names_path
+        self.check_interval = check_interval
+        self._class_ids = None
+        self._lock = threading.Lock()
+        self._data = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._allowed = {}  # (profil, dodatkowe ignorowane, lista globalna) -> lista dozwolonych albo None
+        self.version = 0  # Rośnie przy każdej zmianie - np. do kluczy cache wyników
+
+    @property
+    def class_ids(self):
+        if self._class_ids is None:
+            self._class_ids = sorted(int(class_id) for class_id in get_class_names(self.class_names_path))
+        return self._class_ids
+
+    def _load(self):
+        # Wołane pod self._lock
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime and self._data:
+            return
+        if mtime is None:
+            data = {"ignored_classes": [c for c in self.class_ids if c not in DEFAULT_ALLOWED]}
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        self._set(data, mtime)
+
+    def _set(self, data, mtime):
+        data.setdefault("ignored_classes", [])
+        data.setdefault("profiles", {})
+        self._data = data
+        self._mtime = mtime
+        self._allowed = {}
+        self.version += 1
+
+    def _refresh(self):
+        if not self._data:
+            self._load()  # Pierwsze użycie - błąd odczytu trafia do wywołującego
+            self._checked = time.monotonic()
+            return
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            try:
+                self._load()
+            except (OSError, ValueError) as e:
+                logging.error("Failed to reload %s: %s", self.path, e)
+
+    def data(self):
+        with self._lock:
+            self._refresh()
+            return json.loads(json.dumps(self._data))
+
+    def profiles(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._data["profiles"])
+
+    def allowed(self, profile=None, extra_ignored=None, use_global=True):
+        """
+        Posortowana lista dozwolonych klas dla `classes=` albo None, gdy dozwolone są wszystkie.
+        :param profile: Nazwa profilu; nieznany profil oznacza listę globalną.
+        :param extra_ignored: Klasy dodatkowo ignorowane w tym wywołaniu (np. z żądania /detect_video).
+        :param use_global: Czy bez profilu stosować globalną listę ignorowanych (False - tylko `extra_ignored`).
+        """
+        key = (profile, frozenset(int(c) for c in extra_ignored or ()), use_global)
+        with self._lock:
+            self._refresh()
+            if key not in self._allowed:
+                default = self._data["ignored_classes"] if use_global else ()
+                ignored = self._data["profiles"].get(profile, default)
+                ignored = {int(c) for c in ignored} | key[1]
+                allowed = [c for c in self.class_ids if c not in ignored]
+                self._allowed[key] = None if len(allowed) == len(self.class_ids) else allowed
+            return self._allowed[key]
+
+    def profile_for_request(self, request, body=None):
+        """
+        Profil z nagłówka, parametru lub treści żądania, a domyślnie profil klienta (X-Client-Id).
+        """
+        profile = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_PARAM)
+        if not profile and isinstance(body, dict):
+            profile = body.get(PROFILE_PARAM)
+        if profile:
+            return profile
+        client = request.headers.get(CLIENT_HEADER)
+        if client and client in self.profiles():
+            return client
+        return None
+
+    def update(self, add=(), remove=(), profile=None, delete_profile=False):
+        """
+        Zmienia listę ignorowanych (globalną albo profilu) i zapisuje plik atomowo (tmp + os.replace).
+        Całość pod blokadą, więc równoległe edycje się nie nadpisują.
+        """
+        with self._lock:
+            self._load()
+            data = json.loads(json.dumps(self._data))
+            if delete_profile:
+                data["profiles"].pop(profile, None)
+            else:
+                if profile is None:
+                    current = data["ignored_classes"]
+                else:
+                    # Nowy profil startuje od listy globalnej
+                    current = data["profiles"].get(profile, data["ignored_classes"])
+                ignored = ({int(c) for c in current} | {int(c) for c in add}) - {int(c) for c in remove}
+                if profile is None:
+                    data["ignored_classes"] = sorted(ignored)
+                else:
+                    data["profiles"][profile] = sorted(ignored)
+
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._set(data, os.stat(self.path).st_mtime_ns)
+            return data
+
+
+_filters = {}
+_filters_lock = threading.Lock()
+
+
+def get_class_filter(path="./ignored_classes.json"):
+    """
+    Wspólna instancja filtra dla pliku (app.py, ignore_routes).
+    """
+    key = os.path.abspath(path)
+    with _filters_lock:
+        if key not in _filters:
+            _filters[key] = ClassFilter(path)
+        return _filters[key]
@@ -0,0 +1,227 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def boxes_from_detections(detections):
+    """
+    Zamienia wykrycia YOLO (Nx6: xmin, ymin, xmax, ymax, conf, class) na tablicę pudełek Nx4 int.
+    """
+    detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+    return detections[:, :4].astype(np.int64)
+
+
+def _clip_boxes(boxes, height, width):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    xmin = np.clip(boxes[:, 0], 0, width)
+    ymin = np.clip(boxes[:, 1], 0, height)
+    xmax = np.clip(boxes[:, 2], 0, width)
+    ymax = np.clip(boxes[:, 3], 0, height)
+    return xmin, ymin, xmax, ymax
+
+
+def _box_sums_direct(image, xmin, ymin, xmax, ymax):
+    # Suma po widokach tablicy (ROI) - bez kopiowania regionów
+    channels = image.shape[2]
+    sums = np.zeros((len(xmin), channels), dtype=np.int64)
+    for i in range(len(xmin)):
+        if xmax[i] > xmin[i] and ymax[i] > ymin[i]:
+            sums[i] = cv2.sumElems(image[ymin[i]:ymax[i], xmin[i]:xmax[i]])[:channels]
+    return sums
+
+
+def _box_sums_integral(image, xmin, ymin, xmax, ymax):
+    # Obraz całkowy: jedno przejście po klatce, potem O(1) na pudełko (float64 - sumy dokładne)
+    integral = cv2.integral(np.ascontiguousarray(image), sdepth=cv2.CV_64F)
+    sums = (integral[ymax, xmax] - integral[ymin, xmax]
+            - integral[ymax, xmin] + integral[ymin, xmin])
+    return sums.astype(np.int64)
+
+
+def _mode_colors(image, xmin, ymin, xmax, ymax, samples=32):
+    """
+    Odporny kolor dominujący: najczęstszy kubełek (4 bity na kanał) w przerzedzonym wycinku,
+    zwracany jako średnia pikseli z tego kubełka.
+    """
+    colors = np.zeros((len(xmin), image.shape[2]), dtype=np.uint8)
+    for i in range(len(xmin)):
+        if xmax[i] <= xmin[i] or ymax[i] <= ymin[i]:
+            continue
+        step_y = max(1, (ymax[i] - ymin[i]) // samples)
+        step_x = max(1, (xmax[i] - xmin[i]) // samples)
+        pixels = image[ymin[i]:ymax[i]:step_y, xmin[i]:xmax[i]:step_x].reshape(-1, image.shape[2])
+        quantized = (pixels >> 4).astype(np.int32)
+        bins = (quantized[:, 0] << 8) | (quantized[:, 1] << 4) | quantized[:, 2]
+        dominant = np.bincount(bins, minlength=4096).argmax()
+        colors[i] = pixels[bins == dominant].mean(axis=0).astype(np.uint8)
+    return colors
+
+
+def get_dominant_colors(image, boxes, mode="mean"):
+    """
+    Kolory wszystkich pudełek klatki w jednym przebiegu.
+
+    :param image: Klatka jako tablica HxWx3 (lub obraz PIL - konwertowany raz).
+    :param boxes: Tablica Nx4 (xmin, ymin, xmax, ymax).
+    :param mode: "mean" - średni kolor (jak `get_dominant_color`), "mode" - najczęstszy kolor.
+    :return: Tablica Nx3 uint8 w kolejności kanałów obrazu; puste pudełka dają zera.
+    """
+    if isinstance(image, Image.Image):
+        image = np.asarray(image)
+
+    height, width = image.shape[:2]
+    xmin, ymin, xmax, ymax = _clip_boxes(boxes, height, width)
+    if len(xmin) == 0:
+        return np.zeros((0, 3), dtype=np.uint8)
+
+    if mode == "mode":
+        return _mode_colors(image, xmin, ymin, xmax, ymax)
+    if mode != "mean":
+        raise ValueError(f"Unknown color mode: {mode}")
+
+    areas = np.maximum(xmax - xmin, 0) * np.maximum(ymax - ymin, 0)
+    # Obraz całkowy opłaca się dopiero, gdy pudełka wielokrotnie pokrywają klatkę
+    if areas.sum() > 4 * height * width:
+        sums = _box_sums_integral(image, xmin, ymin, xmax, ymax)
+    else:
+        sums = _box_sums_direct(image, xmin, ymin, xmax, ymax)
+
+    return (sums // np.maximum(areas, 1)[:, None]).astype(np.uint8)
+
+
+def colors_to_hex(colors):
+    """
+    Zamienia kolory Nx3 na hex tak jak `get_dominant_color` - kanały w odwrotnej kolejności (BGR -> #RRGGBB).
+    """
+    return [f"#{c[2]:02x}{c[1]:02x}{c[0]:02x}" for c in np.asarray(colors).tolist()]
+
+
+def get_dominant_color(image, bbox):
+    """
+    Średni kolor jednego pudełka `bbox` (słownik xmin/ymin/xmax/ymax) jako hex.
+    """
+    boxes = [[bbox['xmin'], bbox['ymin'], bbox['xmax'], bbox['ymax']]]
+    return colors_to_hex(get_dominant_colors(image, boxes))[0]
+
+
+# ===== Przestrzenie kolorów i odległości =====
+
+COLOR_SPACES = ("rgb", "lab", "de2000")
+
+_SRGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                         [0.2126729, 0.7151522, 0.0721750],
+                         [0.0193339, 0.1191920, 0.9503041]])
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+
+@lru_cache(maxsize=65536)
+def hex_to_rgb(hex_color):
+    """
+    #RRGGBB -> (R, G, B). Wynik jest zapamiętywany - te same kolory wracają w każdym cyklu trackera.
+    """
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def rgb_to_lab(rgb):
+    """
+    sRGB (0-255, ostatnia oś = R, G, B) -> CIELAB (D65). Działa na tablicach dowolnego kształtu (..., 3).
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ.T / _WHITE_D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+_LAB_CACHE = {}  # hex -> Lab; czyszczony po przekroczeniu _LAB_CACHE_SIZE
+_LAB_CACHE_SIZE = 65536
+
+
+def hex_to_lab(hex_color):
+    return tuple(hex_to_space([hex_color], "lab")[0].tolist())
+
+
+def delta_e_2000(lab1, lab2):
+    """
+    Różnica kolorów CIEDE2000 między tablicami Lab (..., 3) z broadcastingiem,
+    np. (m, 1, 3) z (1, n, 3) daje macierz (m, n).
+    """
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    C_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    G = 0.5 * (1 - np.sqrt(C_mean ** 7 / (C_mean ** 7 + 25.0 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dL = L2 - L1
+    dC = C2p - C1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(C1p * C2p == 0, 0, dh)
+    dH = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dh / 2))
+
+    L_mean = (L1 + L2) / 2
+    Cp_mean = (C1p + C2p) / 2
+    h_sum = h1p + h2p
+    h_mean = np.where(np.abs(h1p - h2p) <= 180, h_sum / 2,
+                      np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2))
+    h_mean = np.where(C1p * C2p == 0, h_sum, h_mean)
+
+    T = (1 - 0.17 * np.cos(np.radians(h_mean - 30)) + 0.24 * np.cos(np.radians(2 * h_mean))
+         + 0.32 * np.cos(np.radians(3 * h_mean + 6)) - 0.20 * np.cos(np.radians(4 * h_mean - 63)))
+    S_L = 1 + 0.015 * (L_mean - 50) ** 2 / np.sqrt(20 + (L_mean - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_mean
+    S_H = 1 + 0.015 * Cp_mean * T
+    R_T = (-2 * np.sqrt(Cp_mean ** 7 / (Cp_mean ** 7 + 25.0 ** 7))
+           * np.sin(np.radians(60 * np.exp(-(((h_mean - 275) / 25) ** 2)))))
+
+    return np.sqrt((dL / S_L) ** 2 + (dC / S_C) ** 2 + (dH / S_H) ** 2 + R_T * (dC / S_C) * (dH / S_H))
+
+
+def hex_to_space(hex_colors, space="rgb"):
+    """
+    Lista kolorów hex -> tablica (n, 3) w przestrzeni porównań: RGB dla "rgb", Lab dla "lab" i "de2000".
+    """
+    if space not in COLOR_SPACES:
+        raise ValueError(f"Unknown color space: {space}")
+    if space == "rgb":
+        return np.array([hex_to_rgb(color) for color in hex_colors], dtype=np.float32).reshape(-1, 3)
+
+    # Wartości potrzebne w tym wywołaniu zbieramy lokalnie - czyszczenie cache (także w innym wątku)
+    # nie może usunąć koloru, który już z niego odczytaliśmy
+    labs = {}
+    missing = []
+    for color in hex_colors:
+        if color not in labs:
+            lab = _LAB_CACHE.get(color)
+            if lab is None:
+                missing.append(color)
+            labs[color] = lab
+    if missing:
+        # Kolory spoza cache przeliczamy jednym wektorowym wywołaniem
+        computed = dict(zip(missing, rgb_to_lab([hex_to_rgb(color) for color in missing]).tolist()))
+        labs.update(computed)
+        if len(_LAB_CACHE) + len(computed) > _LAB_CACHE_SIZE:
+            _LAB_CACHE.clear()
+        _LAB_CACHE.update(computed)
+    return np.array([labs[color] for color in hex_colors], dtype=np.float32).reshape(-1, 3)
+
+
+def color_cost(colors1, colors2, threshold, space="rgb"):
+    """
+    Macierz (m, n) kwadratu odległości kolorów podzielonego przez kwadrat progu - para jest podobna,
+    gdy koszt <= 1. Dla "rgb" i "lab" (ΔE76) to sama suma kwadratów, bez pierwiastka.
+    """
+    if space == "de2000":
+        distance = delta_e_2000(colors1[:, None, :], colors2[None, :, :])
+        return (distance * distance / (threshold * threshold)).astype(np.float32)
+    diff = colors1[:, None, :] - colors2[None, :, :]
+    return np.einsum('ijk,ijk->ij', diff, diff) / (threshold * threshold)
@@ -1,13 +1,9 @@
 import json
 import os
-import google.generativeai as genai
-from google.generativeai import types
 from dotenv import load_dotenv
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
 def generate_prompt(text_line: str) -> str:
     """
     Tworzy prompt wymuszający krótką odpowiedź, podając przykłady oraz wymagając podsumowania po '&'.
@@ -44,67 +40,152 @@ def generate_prompt(text_line: str) -> str:
 
 
 
-from PIL import Image
-import io
-import google.generativeai as genai
+import threading
+import time
+from types import SimpleNamespace
 
-from PIL import Image
-import io
-import google.generativeai as genai
+from metrics import timed
 
-from PIL import Image
-import io
-import google.generativeai as genai
-from google.generativeai import types
 
-def analyze_image(image_path: str, txt_line: str):
+class FakeVisionModel:
     """
-    Analizuje obraz i generuje opis oraz prompt, ograniczając długość odpowiedzi.
+    Lokalny zamiennik `genai.GenerativeModel` (VISION_BACKEND=fake) - do testów i benchmarków bez sieci.
     """
-    try:
-        with open(image_path, "rb") as image_file:
-            image_bytes = image_file.read()
 
-        image = Image.open(io.BytesIO(image_bytes))
+    def __init__(self, latency=0.0, answer="The object is next to the desk.&It is next to the desk."):
+        """
+        :param answer: Stała odpowiedź albo funkcja (contents) -> tekst odpowiedzi.
+        """
+        self.latency = latency
+        self.answer = answer
+        self.calls = 0
 
-        model = genai.GenerativeModel("gemini-1.5-flash")  # Lub "gemini-pro" jeśli dostępne
+    def generate_content(self, contents, generation_config=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self.answer(contents) if callable(self.answer) else self.answer
+        return SimpleNamespace(text=answer)
 
-        # Ustawienia generacji - kluczowe zmiany:
-        generation_config = types.GenerationConfig(
-            max_output_tokens=30,  # Ograniczenie do ok. 30 tokenów (dostosuj)
-            temperature=0.2       # Niższa temperatura dla krótszych odpowiedzi
-        )
 
-        response = model.generate_content(
-            [
-                {"mime_type": "image/jpeg", "data": image_bytes},
-                "Describe this image concisely." # Dodano "concisely" do promptu bazowego
-            ],
-            generation_config=generation_config
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Wspólny model Gemini tworzony raz (zamiast nowego `GenerativeModel` na każde żądanie).
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            if os.getenv("VISION_BACKEND") == "fake":
+                _model = FakeVisionModel(latency=float(os.getenv("FAKE_VISION_LATENCY", "0")))
+            else:
+                # Klient Gemini importowany i konfigurowany dopiero przy pierwszym użyciu
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _model = genai.GenerativeModel("gemini-1.5-flash")  # Lub "gemini-pro" jeśli dostępne
+        return _model
+
+
+def set_model(model):
+    """
+    Podmienia backend modelu (np. na `FakeVisionModel`).
+    """
+    global _model
+    with _model_lock:
+        _model = model
+
+
+def make_generation_config(max_output_tokens: int = 30):
+    # Ustawienia generacji - kluczowe zmiany:
+    # (słownik zamiast types.GenerationConfig - nie wymaga importu google.generativeai)
+    return dict(
+        max_output_tokens=max_output_tokens,  # Ograniczenie do ok. 30 tokenów (dostosuj)
+        temperature=0.2       # Niższa temperatura dla krótszych odpowiedzi
+    )
+
+
+def split_answer(final_answer: str):
+    """
+    Rozdziela odpowiedź na opis (przed '&') i podsumowanie (po '&', puste jeśli brak '&').
+    """
+    parts = final_answer.split("&")
+    description_part = parts[0].strip()  # Pierwsza część (przed '&')
+    summary_part = parts[1].strip() if len(parts) > 1 else ""  # Druga część (po '&') lub puste, jeśli brak '&'
+    return description_part, summary_part
+
+
+def generate_group_prompt(objects) -> str:
+    """
+    Jeden prompt dla kilku obiektów z tej samej klatki.
+    :param objects: Lista par (nazwa_obiektu, dane_obiektu).
+    Model ma odpowiedzieć jedną linią na obiekt: `<nazwa>: <zdanie> & <podsumowanie>`.
+    """
+    lines = []
+    for object_id, data in objects:
+        bbox = data.get("bbox", {})
+        lines.append(
+            f"- {object_id}: a {data.get('color', 'unknown color')} {data.get('name', 'object')} at "
+            f"xmin: {bbox.get('xmin', '?')}, ymin: {bbox.get('ymin', '?')}, "
+            f"xmax: {bbox.get('xmax', '?')}, ymax: {bbox.get('ymax', '?')}"
         )
 
-        description = response.text if response.text else "Brak opisu"
+    return (
+        "For each object listed below, describe its location in *one concise sentence*, "
+        "relative to a clearly visible object in the scene.\n"
+        + "\n".join(lines) + "\n\n"
+        "Answer with exactly one line per object in the format:\n"
+        "<object id>: <location sentence> & <one-sentence summary>\n"
+        "For example:\n"
+        "cup_1: The cup is next to the flowers on the table. & It is on the table.\n\n"
+        "*Keep every answer extremely brief.*"
+    )
+
+
+def analyze_image(image_path: str, txt_line: str, include_description: bool = True, image_bytes: bytes = None):
+    """
+    Analizuje obraz i generuje opis oraz prompt, ograniczając długość odpowiedzi.
+    :param include_description: Czy wykonać dodatkowe zapytanie o ogólny opis obrazu
+        (niepotrzebne, gdy wywołujący korzysta tylko z podsumowania).
+    :param image_bytes: Bajty obrazu, jeśli wywołujący już je wczytał.
+    """
+    try:
+        if image_bytes is None:
+            with open(image_path, "rb") as image_file:
+                image_bytes = image_file.read()
+
+        model = get_model()
+
+        generation_config = make_generation_config()
+
+        description = ""
+        if include_description:
+            with timed("gemini"):
+                response = model.generate_content(
+                    [
+                        {"mime_type": "image/jpeg", "data": image_bytes},
+                        "Describe this image concisely." # Dodano "concisely" do promptu bazowego
+                    ],
+                    generation_config=generation_config
+                )
+
+            description = response.text if response.text else "Brak opisu"
         prompt = generate_prompt(txt_line)
 
         # Dodajemy prompt do kontekstu dla modelu - to może pomóc w uzyskaniu lepszych odpowiedzi na prompt
-        response_prompt = model.generate_content(
-            [
-                {"mime_type": "image/jpeg", "data": image_bytes},
-                prompt
-            ],
-            generation_config=generation_config
-        )
+        with timed("gemini"):
+            response_prompt = model.generate_content(
+                [
+                    {"mime_type": "image/jpeg", "data": image_bytes},
+                    prompt
+                ],
+                generation_config=generation_config
+            )
 
         final_answer = response_prompt.text if response_prompt.text else "Brak odpowiedzi na prompt"
-
-        # Rozdzielenie odpowiedzi na opis i podsumowanie po '&'
-        try:
-            parts = final_answer.split("&")
-            description_part = parts[0].strip()  # Pierwsza część (przed '&')
-            summary_part = parts[1].strip() if len(parts) > 1 else ""  # Druga część (po '&') lub puste, jeśli brak '&'
-        except IndexError:  # Obsługa sytuacji, gdy nie ma znaku '&'
-            description_part = final_answer.strip()
-            summary_part = ""
+        description_part, summary_part = split_answer(final_answer)
 
         result = {
             "description": description,
@@ -134,16 +215,24 @@ def read_file(file_path):
         return {}
 
 def process_lost_objects():
+    from batch_analyzer import BatchAnalyzer
+
     data = read_file('./zgubione.txt')
-    for key, value in data.items():
-        frame_number = value.get("frame")
-        image_path = f"./wyniki/frame_{frame_number}.jpg"
-        result = analyze_image(image_path, f"{key}: {json.dumps(value)}")
+
+    # Równoległa analiza z limitem zapytań; obiekty z tej samej klatki idą w jednym zapytaniu,
+    # a niezmienione obiekty są pomijane (wyniki w analysis_results.db)
+    analyzer = BatchAnalyzer(
+        max_in_flight=int(os.getenv("ANALYZER_MAX_IN_FLIGHT", "4")),
+        requests_per_second=float(os.getenv("ANALYZER_RPS", "2")),
+    )
+    results = analyzer.analyze(data)
+
+    for key, result in results.items():
         if "error" in result:
-            print("❌ Błąd:", result["error"])
+            print(f"❌ Błąd ({key}):", result["error"])
         else:
-            print("🔹 Opis obrazu:", result["description"])
-            print("📍 Wygenerowany prompt:", result["prompt"])
+            print(f"🔹 {key}:", result["answer"])
+            print("📍 Podsumowanie:", result["summary"])
 
 if __name__ == "__main__":
     process_lost_objects()
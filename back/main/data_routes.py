@@ -1,82 +1,68 @@
-from flask import Blueprint, jsonify, send_file
+from flask import Blueprint, jsonify, send_file, request
 import os
-import json
+import hashlib
+from lost_state import get_lost_state
+from frame_store import get_frame_store
 
 data_bp = Blueprint('data_bp', __name__)
 
-def convert_to_json(file_path):
-    converted_data = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                if ":" not in line:
-                    continue  # Pomijamy linie bez dwukropka
-                
-                key, value = line.split(":", 1)  # Rozdzielamy pierwszy dwukropek
-                key = key.strip()
-                value = value.strip()
-                
-                try:
-                    converted_data[key] = json.loads(value)
-                except json.JSONDecodeError:
-                    print(f"❌ Błąd parsowania JSON dla klucza: {key}")
-        
-        with open("zgubione.json", "w", encoding="utf-8") as json_file:
-            json.dump(converted_data, json_file, indent=4, ensure_ascii=False)
-        
-        return converted_data
-    except Exception as e:
-        print(f"❌ Wystąpił błąd: {e}")
-        return {}
+FRAME_MAX_AGE = 365 * 24 * 3600  # Klatki są niezmienne - przeglądarka może je trzymać w cache
+
+
+def conditional_json(payload, etag):
+    """
+    Odpowiedź JSON z ETagiem - klient wysyłający If-None-Match dostaje 304, gdy nic się nie zmieniło.
+    """
+    response = jsonify(payload)
+    if etag:
+        response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def sub_etag(etag, key):
+    return hashlib.sha1(f"{etag}/{key}".encode('utf-8')).hexdigest() if etag else None
 
-def read_file():
-    file_path = './zgubione.txt'
-    json_path = './zgubione.json'
-    
-    if not os.path.exists(file_path):
-        return {"error": "File not found"}
-    
-    convert_to_json(file_path)  # Konwertujemy plik przy każdym odczycie
-    
-    try:
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        return data
-    except json.JSONDecodeError:
-        return {"error": "Invalid JSON format in file"}
-    except Exception as e:
-        return {"error": str(e)}
 
 @data_bp.route('/get-all', methods=['GET'])
 def get_all():
-    data = read_file()
-    if "error" in data:
-        return jsonify({"error": data["error"]}), 500
-    return jsonify(data)
+    state = get_lost_state('./zgubione.txt').snapshot()
+    if state is None:
+        return jsonify({"error": "File not found"}), 500
+    data, _, etag = state
+    return conditional_json(data, etag)
 
 @data_bp.route('/get-by-class/<class_name>', methods=['GET'])
 def get_by_class(class_name):
-    data = read_file()
-    if "error" in data:
-        return jsonify({"error": data["error"]}), 500
-    filtered_data = {key: value for key, value in data.items() if value["name"] == class_name}
-    return jsonify(filtered_data)
+    state = get_lost_state('./zgubione.txt').snapshot()
+    if state is None:
+        return jsonify({"error": "File not found"}), 500
+    _, by_class, etag = state
+    return conditional_json(by_class.get(class_name, {}), sub_etag(etag, f"class:{class_name}"))
 
 @data_bp.route('/get-frame/<int:frame_number>', methods=['GET'])
 def get_frame(frame_number):
-    image_path = f"wyniki/frame_{frame_number}.jpg"
-    if os.path.exists(image_path):
-        return send_file(image_path, mimetype='image/jpeg')
-    else:
+    # Lookup w indeksie klatek zamiast os.path.exists
+    store = get_frame_store("wyniki")
+    store.wait_for(frame_number)  # Klatka mogła jeszcze czekać na zapis w tle
+    record = store.get(frame_number)
+    if record is None:
+        return jsonify({"error": "Frame not found"}), 404
+    try:
+        # Klatki się nie zmieniają - ETag/Last-Modified, obsługa If-None-Match i Range, długi cache
+        response = send_file(os.path.abspath(record["path"]), mimetype='image/jpeg', conditional=True, max_age=FRAME_MAX_AGE)
+    except FileNotFoundError:
         return jsonify({"error": "Frame not found"}), 404
+    response.headers["Cache-Control"] = f"public, max-age={FRAME_MAX_AGE}, immutable"
+    return response
 
 @data_bp.route('/get-item-details/<string:item_id>', methods=['GET'])
 def get_item_details(item_id):
-    data = read_file()
-    if "error" in data:
-        return jsonify({"error": data["error"]}), 500
+    state = get_lost_state('./zgubione.txt').snapshot()
+    if state is None:
+        return jsonify({"error": "File not found"}), 500
+    data, _, etag = state
     item_details = data.get(item_id)
     if item_details:
-        return jsonify(item_details)
+        return conditional_json(item_details, sub_etag(etag, f"item:{item_id}"))
     else:
         return jsonify({"error": "Item not found"}), 404
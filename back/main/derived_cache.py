@@ -0,0 +1,141 @@
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+DERIVED_DIR = "derived"  # Podkatalog katalogu klatek: derived/<numer_klatki>/<wariant>.jpg
+
+
+def derived_dir_for(frames_directory, frame_id):
+    return os.path.join(frames_directory, DERIVED_DIR, str(frame_id))
+
+
+def remove_derived(frames_directory, frame_id):
+    """
+    Usuwa wszystkie obrazy pochodne klatki (miniatury, wycinki) - wołane przy usuwaniu klatki.
+    Działa na plikach, więc także z procesu trackera.
+    """
+    shutil.rmtree(derived_dir_for(frames_directory, frame_id), ignore_errors=True)
+
+
+class DerivedImageCache:
+    """
+    Dyskowy cache obrazów pochodnych (miniatury, wycinki obiektów) z budżetem rozmiaru i LRU.
+
+    Pliki leżą w `<katalog_klatek>/derived/<numer_klatki>/`, więc usunięcie klatki usuwa też
+    jej pochodne (`remove_derived`). Indeks LRU jest w pamięci i odbudowywany z dysku przy starcie;
+    plik usunięty z zewnątrz traktujemy jak chybienie.
+
+    Klatki usuwa też proces trackera (frame_store.py), o czym ten indeks się nie dowiaduje - dlatego
+    najwyżej co `reconcile_interval` sekund (przed usuwaniem wpisów ponad budżet i przy odczycie
+    statystyk) wyrzucamy z indeksu wpisy, których plików już nie ma.
+    """
+
+    def __init__(self, frames_directory="wyniki", max_bytes=256 * 1024 * 1024, reconcile_interval=30.0):
+        self.frames_directory = frames_directory
+        self.max_bytes = max_bytes
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # ścieżka -> rozmiar, od najdawniej używanych
+        self._total = 0
+        self._reconciled = time.monotonic()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "vanished": 0}
+        self._scan()
+
+    def _scan(self):
+        root = os.path.join(self.frames_directory, DERIVED_DIR)
+        found = []
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_atime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total += size
+
+    def path_for(self, frame_id, variant):
+        return os.path.join(derived_dir_for(self.frames_directory, frame_id), f"{variant}.jpg")
+
+    def get(self, frame_id, variant):
+        """
+        Ścieżka zapisanego wariantu albo None.
+        """
+        path = self.path_for(frame_id, variant)
+        with self._lock:
+            if path in self._entries:
+                if os.path.exists(path):
+                    self._entries.move_to_end(path)
+                    self.stats["hits"] += 1
+                    return path
+                self._total -= self._entries.pop(path)
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, frame_id, variant, data):
+        """
+        Zapisuje wariant (bajty JPEG) atomowo i usuwa najdawniej używane wpisy ponad budżet.
+        """
+        path = self.path_for(frame_id, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Wołane pod self._lock
+        if self._total > self.max_bytes:
+            self._reconcile()  # Najpierw pliki usunięte z zewnątrz, zanim usuniemy żywe wpisy
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+                self.stats["evictions"] += 1
+            except FileNotFoundError:
+                self.stats["vanished"] += 1
+
+    def _reconcile(self, force=False):
+        # Wołane pod self._lock
+        now = time.monotonic()
+        if not force and now - self._reconciled < self.reconcile_interval:
+            return
+        self._reconciled = now
+        for path in [path for path in self._entries if not os.path.exists(path)]:
+            self._total -= self._entries.pop(path)
+            self.stats["vanished"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._reconcile()
+            return dict(self.stats, entries=len(self._entries), bytes=self._total, max_bytes=self.max_bytes)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_derived_cache(frames_directory="wyniki"):
+    """
+    Wspólna instancja cache dla katalogu klatek; budżet z DERIVED_CACHE_MAX_BYTES.
+    """
+    key = os.path.abspath(frames_directory)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = DerivedImageCache(
+                frames_directory, max_bytes=int(os.getenv("DERIVED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))))
+        return _caches[key]
@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from color_utils import hex_to_rgb
+from metrics import timed
+
+# Rekord jednego wykrycia - stała szerokość, bez wyrównania, więc segment da się zmapować w pamięci
+DETECTION_DTYPE = np.dtype([
+    ("frame", "<i8"),
+    ("class", "<i2"),
+    ("conf", "<f4"),
+    ("bbox", "<i4", (4,)),  # xmin, ymin, xmax, ymax
+    ("center", "<i4", (2,)),  # x, y
+    ("color", "u1", (3,)),  # R, G, B
+    ("timestamp", "<i8"),  # sekundy od epoki
+])
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def records_from_detections(frame_number, detection_list, timestamp=None, colors=None):
+    """
+    Zamienia listę słowników wykryć (format z `upload_frame`/`detect_video`) na rekordy DETECTION_DTYPE.
+    `colors` (Nx3 uint8, R, G, B) - kolory policzone dla klatki; bez nich kolor jest odczytywany z hex.
+    """
+    records = np.zeros(len(detection_list), dtype=DETECTION_DTYPE)
+    now = int(time.time()) if timestamp is None else int(timestamp)
+
+    for i, detection in enumerate(detection_list):
+        bbox = detection.get("bbox", {})
+        center = detection.get("center", {})
+        records[i]["frame"] = frame_number
+        records[i]["class"] = detection.get("class", -1)
+        records[i]["conf"] = detection.get("confidence", 0.0)
+        records[i]["bbox"] = (bbox.get("xmin", 0), bbox.get("ymin", 0), bbox.get("xmax", 0), bbox.get("ymax", 0))
+        records[i]["center"] = (center.get("x", 0), center.get("y", 0))
+        if colors is None:
+            records[i]["color"] = hex_to_rgb(detection.get("color", "#000000"))
+
+        if isinstance(detection.get("timestamp"), str):
+            records[i]["timestamp"] = int(datetime.strptime(detection["timestamp"], TIMESTAMP_FORMAT).timestamp())
+        else:
+            records[i]["timestamp"] = now
+
+    if colors is not None:
+        records["color"] = colors
+    return records
+
+
+def records_to_detections(records, class_names=None):
+    """
+    Odwrotność `records_from_detections` - słowniki w formacie oczekiwanym przez `ObjectTracker`.
+    """
+    class_names = class_names or {}
+    detection_list = []
+
+    # Kolumny zamieniamy na listy Pythona naraz (pola wielowymiarowe dają zagnieżdżone listy)
+    columns = zip(records["class"].tolist(), records["conf"].tolist(), records["bbox"].tolist(),
+                  records["center"].tolist(), records["color"].tolist(), records["timestamp"].tolist())
+
+    for class_id, conf, bbox, center, color, timestamp in columns:
+        detection_list.append({
+            "class": class_id,
+            "name": class_names.get(str(class_id), f"class_{class_id}"),
+            "confidence": round(conf, 2),
+            "bbox": {"xmin": bbox[0], "ymin": bbox[1], "xmax": bbox[2], "ymax": bbox[3]},
+            "center": {"x": center[0], "y": center[1]},
+            "color": f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}",
+            "timestamp": datetime.fromtimestamp(timestamp).strftime(TIMESTAMP_FORMAT),
+        })
+
+    return detection_list
+
+
+def group_by_frame(records):
+    """
+    Dzieli rekordy na kolejne grupy o tym samym numerze klatki (w kolejności zapisu).
+    """
+    if len(records) == 0:
+        return []
+    boundaries = np.flatnonzero(np.diff(records["frame"])) + 1
+    return [(int(group["frame"][0]), group) for group in np.split(records, boundaries)]
+
+
+class DetectionStore:
+    """
+    Dziennik wykryć w postaci segmentów z rekordami stałej szerokości (DETECTION_DTYPE).
+
+    Segmenty `seg_NNNNNN.dat` są tylko dopisywane i mają po `SEGMENT_RECORDS` rekordów,
+    więc pozycję rekordu wyznacza jego globalny numer. `reset()` zaczyna nową generację
+    (odpowiednik dawnego otwierania logu w trybie "w") - czytelnicy wykrywają to po `generation()`.
+
+    Pisać może tylko jeden proces naraz (serwer Flask; `get_detection_store` daje mu jedną instancję
+    na katalog): blokada jest wątkowa, a rozmiar aktywnego segmentu trzymamy w pamięci.
+    Czytać (np. z procesu trackera) można równolegle.
+    """
+
+    SEGMENT_RECORDS = 1 << 18
+
+    def __init__(self, directory="wyniki/detections"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._active = None  # (numer aktywnego segmentu, liczba rekordów w nim); None - do odczytania z dysku
+
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"seg_{index:06d}.dat")
+
+    def generation(self):
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f).get("generation", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+
+    def _segment_sizes(self):
+        sizes = []
+        while True:
+            try:
+                sizes.append(os.path.getsize(self._segment_path(len(sizes))) // DETECTION_DTYPE.itemsize)
+            except FileNotFoundError:
+                return sizes
+
+    def count(self):
+        """
+        Liczba kompletnych rekordów w dzienniku.
+        """
+        return sum(self._segment_sizes())
+
+    # ===== Zapis =====
+
+    def append_records(self, records):
+        with self._lock:
+            if self._active is None:
+                self._active = self._recover_active()
+            index, used = self._active
+
+            written = 0
+            try:
+                while written < len(records):
+                    if used >= self.SEGMENT_RECORDS:
+                        index, used = index + 1, 0
+                    chunk = records[written:written + self.SEGMENT_RECORDS - used]
+                    with open(self._segment_path(index), "ab") as f:
+                        f.write(chunk.tobytes())
+                    written += len(chunk)
+                    used += len(chunk)
+                    self._active = (index, used)
+            except Exception:
+                self._active = None  # Niepełny zapis - następny zapis odczyta rozmiar z dysku
+                raise
+
+    def _recover_active(self):
+        """
+        Aktywny segment i liczba kompletnych rekordów w nim. Niepełny rekord na końcu (przerwany zapis)
+        jest obcinany - inaczej kolejne rekordy dopisane w trybie "ab" byłyby przesunięte.
+        """
+        sizes = self._segment_sizes()
+        if not sizes:
+            return 0, 0
+        index = len(sizes) - 1
+        path = self._segment_path(index)
+        if os.path.getsize(path) != sizes[index] * DETECTION_DTYPE.itemsize:
+            os.truncate(path, sizes[index] * DETECTION_DTYPE.itemsize)
+        return index, sizes[index]
+
+    def append(self, frame_number, detection_list, timestamp=None, colors=None):
+        """
+        Zapisuje wykrycia jednej klatki - zastępuje dopisywanie linii `Frame N: [...]`.
+        """
+        if detection_list:
+            with timed("log_append"):
+                self.append_records(records_from_detections(frame_number, detection_list, timestamp, colors))
+
+    def reset(self):
+        """
+        Usuwa wszystkie segmenty i zaczyna nową generację dziennika.
+        """
+        with self._lock:
+            generation = self.generation() + 1
+            self._active = None
+            for name in os.listdir(self.directory):
+                if name.startswith("seg_") and name.endswith(".dat"):
+                    os.remove(os.path.join(self.directory, name))
+            tmp_path = f"{self._meta_path()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation}, f)
+            os.replace(tmp_path, self._meta_path())
+
+    # ===== Odczyt =====
+
+    def _map_segment(self, index, count):
+        if count == 0:
+            return np.zeros(0, dtype=DETECTION_DTYPE)
+        return np.memmap(self._segment_path(index), dtype=DETECTION_DTYPE, mode="r", shape=(count,))
+
+    def read(self, start=0, limit=None):
+        """
+        Zwraca (rekordy, nowy_offset) - rekordy o globalnych numerach od `start`.
+        Wynik jest kopią, więc nie trzyma otwartych mapowań plików.
+        """
+        chunks = []
+        position = 0
+        remaining = limit
+        for index, count in enumerate(self._segment_sizes()):
+            if position + count <= start:
+                position += count
+                continue
+            begin = max(start - position, 0)
+            end = count if remaining is None else min(count, begin + remaining)
+            chunks.append(np.array(self._map_segment(index, count)[begin:end]))
+            if remaining is not None:
+                remaining -= end - begin
+                if remaining <= 0:
+                    break
+            position += count
+
+        records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=DETECTION_DTYPE)
+        return records, max(start, 0) + len(records)
+
+    def scan(self, frame_range=None, classes=None):
+        """
+        Przegląda dziennik bez parsowania JSON - filtr po zakresie klatek [od, do] i/lub klasach.
+        Zwraca rekordy spełniające warunki.
+        """
+        chunks = []
+        class_ids = None if classes is None else np.asarray(list(classes), dtype=np.int16)
+
+        for index, count in enumerate(self._segment_sizes()):
+            segment = self._map_segment(index, count)
+            if count == 0:
+                continue
+            mask = np.ones(count, dtype=bool)
+            if frame_range is not None:
+                first, last = frame_range
+                if first is not None:
+                    mask &= segment["frame"] >= first
+                if last is not None:
+                    mask &= segment["frame"] <= last
+            if class_ids is not None:
+                mask &= np.isin(segment["class"], class_ids)
+            if mask.any():
+                chunks.append(np.array(segment[mask]))
+
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=DETECTION_DTYPE)
+
+
+def import_text_log(text_path, store):
+    """
+    Importuje dawny log `Frame N: <json>` do dziennika. Zwraca liczbę zaimportowanych klatek.
+    """
+    imported = 0
+    with open(text_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if ': ' not in line:
+                continue
+            frame_info, raw_data = line.strip().split(': ', 1)
+            try:
+                frame_number = int(frame_info.replace("Frame ", ""))
+                detection_list = json.loads(raw_data)
+            except (ValueError, json.JSONDecodeError) as e:
+                print(f"[ERROR] Error parsing line: {line.strip()} -> {e}")
+                continue
+            store.append(frame_number, detection_list)
+            imported += 1
+    return imported
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_detection_store(directory="wyniki/detections"):
+    """
+    Wspólna instancja `DetectionStore` dla katalogu.
+    """
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = DetectionStore(directory)
+        return _stores[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import tekstowego logu wykryć do dziennika binarnego.")
+    parser.add_argument("text_log", nargs="?", default="wyniki/general_detections.txt")
+    parser.add_argument("--store", default="wyniki/detections")
+    args = parser.parse_args()
+
+    count = import_text_log(args.text_log, get_detection_store(args.store))
+    print(f"[LOG] Imported {count} frames from {args.text_log} into {args.store}")
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import threading
+
+from inference_server import create_detector
+
+# Nazwa backendu -> plik modelu. ultralytics sam wybiera runtime po rozszerzeniu:
+# .pt - PyTorch, .onnx - onnxruntime, katalog *_openvino_model - OpenVINO.
+# Modele ONNX/OpenVINO (także INT8) powstają przez export_model.py.
+DEFAULT_BACKENDS = {
+    "large": "./yolo/yolo11l.pt",
+    "small": "./yolo/yolo11s.pt",
+    "nano": "./yolo/yolo11n.pt",
+    "nano-onnx": "./yolo/yolo11n.onnx",
+    "nano-openvino": "./yolo/yolo11n_openvino_model",
+    "nano-openvino-int8": "./yolo/yolo11n_int8_openvino_model",
+}
+
+# Domyślny backend dla każdego endpointu - można nadpisać per żądanie
+DEFAULT_ENDPOINTS = {
+    "upload": "large",
+    "video": "large",
+}
+
+BACKEND_HEADER = "X-Detector-Backend"
+BACKEND_PARAM = "backend"
+ADMIN_HEADER = "X-Admin-Token"
+
+
+class UnknownBackend(Exception):
+    pass
+
+
+class BackendNotAllowed(UnknownBackend):
+    pass
+
+
+class BackendLimitReached(Exception):
+    pass
+
+
+def load_backend_config():
+    """
+    Backendy, przypisania endpointów i backendy, które klient może wybrać per żądanie.
+    DETECTOR_BACKENDS wskazuje plik JSON {"backends": {...}, "endpoints": {...}, "allowed": {...}}
+    uzupełniający wartości domyślne; DETECTOR_UPLOAD / DETECTOR_VIDEO nadpisują backend endpointu,
+    a DETECTOR_UPLOAD_ALLOWED / DETECTOR_VIDEO_ALLOWED (lista po przecinku) - dozwolone backendy.
+    """
+    backends = dict(DEFAULT_BACKENDS)
+    endpoints = dict(DEFAULT_ENDPOINTS)
+    allowed = {}
+
+    config_path = os.getenv("DETECTOR_BACKENDS")
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        backends.update(config.get("backends", {}))
+        endpoints.update(config.get("endpoints", {}))
+        allowed.update({endpoint: list(names) for endpoint, names in config.get("allowed", {}).items()})
+
+    for endpoint in endpoints:
+        override = os.getenv(f"DETECTOR_{endpoint.upper()}")
+        if override:
+            endpoints[endpoint] = override
+        allowed_override = os.getenv(f"DETECTOR_{endpoint.upper()}_ALLOWED")
+        if allowed_override is not None:
+            allowed[endpoint] = [name.strip() for name in allowed_override.split(",") if name.strip()]
+
+    for endpoint, name in endpoints.items():
+        if name not in backends:
+            raise UnknownBackend(f"Endpoint '{endpoint}' uses unknown detector backend '{name}'")
+    for endpoint, names in allowed.items():
+        for name in names:
+            if name not in backends:
+                raise UnknownBackend(f"Endpoint '{endpoint}' allows unknown detector backend '{name}'")
+    return backends, endpoints, allowed
+
+
+class DetectorRegistry:
+    """
+    Detektory (`InferenceServer`/`LocalDetector`) tworzone leniwie dla każdego backendu -
+    procesy z modelem powstają dopiero, gdy backend zostanie użyty.
+
+    Każdy backend to osobna pula procesów z modelem, więc klient nie może wybrać dowolnego:
+    per żądanie dozwolone są tylko backendy z `allowed[endpoint]` (domyślnie żaden poza
+    domyślnym dla endpointu), a pozostałe tylko z nagłówkiem X-Admin-Token równym `admin_token`.
+    Liczba pul jest ograniczona przez `max_pools` - kolejny backend dostaje BackendLimitReached (503).
+    """
+
+    def __init__(self, backends, endpoints, allowed=None, detector_factory=create_detector,
+                 max_pools=None, admin_token=None):
+        self.backends = backends
+        self.endpoints = endpoints
+        self.allowed = allowed or {}
+        self.detector_factory = detector_factory
+        # Backendy domyślne muszą się zmieścić zawsze
+        self.max_pools = max(max_pools or 0, len(self._defaults()))
+        self.admin_token = admin_token
+        self._detectors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Konfiguracja z load_backend_config() oraz DETECTOR_MAX_POOLS i DETECTOR_ADMIN_TOKEN.
+        """
+        backends, endpoints, allowed = load_backend_config()
+        return cls(backends, endpoints, allowed,
+                   max_pools=int(os.getenv("DETECTOR_MAX_POOLS", "3")),
+                   admin_token=os.getenv("DETECTOR_ADMIN_TOKEN") or None)
+
+    def resolve(self, endpoint, requested=None, privileged=False):
+        """
+        Nazwa backendu dla żądania: jawnie wybrany (parametr/nagłówek) albo domyślny dla endpointu.
+        :param privileged: Żądanie z poprawnym tokenem administratora - może wybrać dowolny backend.
+        """
+        default = self.endpoints.get(endpoint) or self.endpoints["upload"]
+        name = requested or default
+        if name not in self.backends:
+            raise UnknownBackend(f"Unknown detector backend '{name}'. Available: {', '.join(sorted(self.backends))}")
+        if name != default and not privileged and name not in self.allowed.get(endpoint, ()):
+            allowed = sorted({default, *self.allowed.get(endpoint, ())})
+            raise BackendNotAllowed(f"Detector backend '{name}' is not allowed for '{endpoint}'. "
+                                    f"Allowed: {', '.join(allowed)}")
+        return name
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._detectors:
+                self._check_capacity(name)
+                logging.info(f"Detektor '{name}': {self.backends[name]}")
+                self._detectors[name] = self.detector_factory(self.backends[name])
+            return self._detectors[name]
+
+    def _check_capacity(self, name):
+        if name not in self.backends:
+            raise UnknownBackend(f"Unknown detector backend '{name}'")
+        if name not in self._detectors and len(self._detectors) >= self.max_pools:
+            raise BackendLimitReached(f"Detector backend '{name}' is not loaded and the limit of "
+                                      f"{self.max_pools} detector pools has been reached")
+
+    def resolve_request(self, endpoint, request, body=None):
+        """
+        Nazwa backendu dla żądania Flask - pole "backend" w JSON, `?backend=` albo nagłówek X-Detector-Backend.
+        Sprawdza też limit pul, żeby zadanie wideo nie trafiło do kolejki z backendem, którego nie da się utworzyć.
+        """
+        requested = ((body or {}).get(BACKEND_PARAM) or request.args.get(BACKEND_PARAM)
+                     or request.headers.get(BACKEND_HEADER))
+        privileged = self.admin_token is not None and request.headers.get(ADMIN_HEADER) == self.admin_token
+        name = self.resolve(endpoint, requested, privileged)
+        with self._lock:
+            self._check_capacity(name)
+        return name
+
+    def for_request(self, endpoint, request, body=None):
+        return self.get(self.resolve_request(endpoint, request, body))
+
+    def _defaults(self):
+        return sorted(set(self.endpoints.values()))
+
+    def warm_up(self, timeout=None):
+        """
+        Rozgrzewa backendy przypisane do endpointów. Zwraca najdłuższe czasy faz.
+        """
+        timings = {}
+        for name in self._defaults():
+            for phase, seconds in self.get(name).warm_up(timeout).items():
+                timings[phase] = max(timings.get(phase, 0.0), seconds)
+        return timings
+
+    def is_ready(self):
+        return all(self.get(name).is_ready() for name in self._defaults())
+
+    def status(self):
+        with self._lock:
+            detectors = dict(self._detectors)
+        errors = [error for detector in detectors.values() for error in detector.status()["errors"]]
+        return {
+            "endpoints": dict(self.endpoints),
+            "allowed": {endpoint: sorted(names) for endpoint, names in self.allowed.items()},
+            "max_pools": self.max_pools,
+            "backends": {name: detector.status() for name, detector in detectors.items()},
+            "errors": errors,
+        }
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(detector.queue_depth() for detector in self._detectors.values())
+
+    def stop(self):
+        with self._lock:
+            detectors = list(self._detectors.values())
+        for detector in detectors:
+            detector.stop()
@@ -0,0 +1,256 @@
+"""
+Eksport modeli YOLO do szybszych backendów CPU (ONNX, OpenVINO, INT8) i walidacja względem modelu wzorcowego.
+
+    python export_model.py export --weights yolo/yolo11n.pt --format openvino --int8 --data coco8.yaml
+    python export_model.py validate --reference yolo/yolo11l.pt --candidate yolo/yolo11n.onnx --images probki/
+
+Walidacja traktuje wykrycia modelu wzorcowego jako prawdę i liczy zgodność pudełek (F1 przy IoU >= 0.5),
+mAP@0.5 kandydata na próbkach oraz czas na klatkę. Z `--data` liczy też prawdziwe mAP przez `model.val`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from inference_server import load_yolo
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def box_iou(a, b):
+    """
+    Macierz IoU dla pudełek a (Nx4) i b (Mx4) w formacie xmin, ymin, xmax, ymax.
+    """
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Zachłanne dopasowanie wykryć kandydata (od najpewniejszych) do wzorca tej samej klasy.
+    Wykrycia to tablice Nx6 (xmin, ymin, xmax, ymax, conf, class).
+    Zwraca tablicę bool: czy kolejne (posortowane malejąco po conf) wykrycie kandydata trafiło.
+    """
+    order = np.argsort(-candidate[:, 4]) if len(candidate) else np.zeros(0, dtype=int)
+    candidate = candidate[order]
+    hits = np.zeros(len(candidate), dtype=bool)
+    if len(reference) == 0 or len(candidate) == 0:
+        return candidate, hits
+
+    iou = box_iou(candidate[:, :4], reference[:, :4])
+    iou[candidate[:, 5][:, None] != reference[:, 5][None, :]] = 0.0
+    taken = np.zeros(len(reference), dtype=bool)
+    for i in range(len(candidate)):
+        row = np.where(taken, 0.0, iou[i])
+        j = int(np.argmax(row))
+        if row[j] >= iou_threshold:
+            taken[j] = hits[i] = True
+    return candidate, hits
+
+
+def average_precision(confidences, hits, total_positives):
+    """
+    AP (interpolacja po wszystkich punktach) z listy trafień posortowanej malejąco po pewności.
+    """
+    if total_positives == 0:
+        return None
+    if len(hits) == 0:
+        return 0.0
+    order = np.argsort(-np.asarray(confidences))
+    hits = np.asarray(hits)[order]
+    tp = np.cumsum(hits)
+    fp = np.cumsum(~hits)
+    recall = tp / total_positives
+    precision = tp / np.maximum(tp + fp, 1)
+
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.flatnonzero(recall[1:] != recall[:-1])
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def load_images(directory, limit=None):
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images = []
+    for path in paths[:limit]:
+        image = cv2.imread(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def run_model(model, images, **predict_kwargs):
+    """
+    Zwraca (wykrycia Nx6 dla każdego obrazu, średni czas na obraz w ms). Pierwszy obraz rozgrzewa model.
+    """
+    if images:
+        model.predict([images[0]], verbose=False, **predict_kwargs)
+    detections = []
+    started = time.perf_counter()
+    for image in images:
+        result = model.predict([image], verbose=False, **predict_kwargs)[0]
+        detections.append(result.boxes.data.cpu().numpy())
+    elapsed = time.perf_counter() - started
+    return detections, 1000.0 * elapsed / max(len(images), 1)
+
+
+def compare(reference_detections, candidate_detections, iou_threshold=0.5):
+    """
+    Zgodność kandydata ze wzorcem: precyzja, czułość, F1 oraz mAP@IoU po klasach wzorca.
+    """
+    per_class = {}
+    matched = candidate_total = reference_total = 0
+
+    for reference, candidate in zip(reference_detections, candidate_detections):
+        candidate, hits = match_detections(reference, candidate, iou_threshold)
+        matched += int(hits.sum())
+        candidate_total += len(candidate)
+        reference_total += len(reference)
+
+        for class_id in np.unique(reference[:, 5]).tolist():
+            per_class.setdefault(class_id, {"conf": [], "hits": [], "positives": 0})
+            per_class[class_id]["positives"] += int(np.sum(reference[:, 5] == class_id))
+        for detection, hit in zip(candidate, hits):
+            entry = per_class.setdefault(float(detection[5]), {"conf": [], "hits": [], "positives": 0})
+            entry["conf"].append(float(detection[4]))
+            entry["hits"].append(bool(hit))
+
+    precision = matched / candidate_total if candidate_total else 1.0
+    recall = matched / reference_total if reference_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    aps = [average_precision(entry["conf"], entry["hits"], entry["positives"]) for entry in per_class.values()]
+    aps = [ap for ap in aps if ap is not None]
+
+    return {
+        "images": len(reference_detections),
+        "reference_boxes": reference_total,
+        "candidate_boxes": candidate_total,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "box_agreement_f1": round(f1, 4),
+        f"map{int(iou_threshold * 100)}_vs_reference": round(float(np.mean(aps)), 4) if aps else None,
+    }
+
+
+def validate(reference_path, candidate_path, images_dir, limit=None, conf=0.25, iou_threshold=0.5, data=None):
+    images = load_images(images_dir, limit)
+    if not images:
+        raise ValueError(f"No images found in {images_dir}")
+
+    reference_detections, reference_ms = run_model(load_yolo(reference_path), images, conf=conf)
+    candidate_model = load_yolo(candidate_path)
+    candidate_detections, candidate_ms = run_model(candidate_model, images, conf=conf)
+
+    report = compare(reference_detections, candidate_detections, iou_threshold)
+    report.update({
+        "reference": reference_path,
+        "candidate": candidate_path,
+        "reference_ms_per_image": round(reference_ms, 2),
+        "candidate_ms_per_image": round(candidate_ms, 2),
+        "speedup": round(reference_ms / candidate_ms, 2) if candidate_ms else None,
+    })
+
+    if data:
+        # Prawdziwe mAP na zbiorze z etykietami (format ultralytics)
+        for key, path in (("reference_map50_95", reference_path), ("candidate_map50_95", candidate_path)):
+            metrics = load_yolo(path).val(data=data, verbose=False, plots=False)
+            report[key] = round(float(metrics.box.map), 4)
+
+    return report
+
+
+def quantize_onnx(onnx_path):
+    """
+    Dynamiczna kwantyzacja wag ONNX do INT8 (onnxruntime.quantization). Zwraca ścieżkę nowego pliku.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = onnx_path[:-len(".onnx")] + "_int8.onnx"
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+
+def export(weights, export_format="onnx", int8=False, imgsz=640, data=None, dynamic=True):
+    """
+    Eksportuje model i zwraca ścieżkę wyniku. Dynamiczny rozmiar paczki jest potrzebny
+    do mikro-paczek z inference_server.py.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    kwargs = {"format": export_format, "imgsz": imgsz, "dynamic": dynamic}
+    if int8 and export_format == "openvino":
+        kwargs["int8"] = True  # Kwantyzacja z kalibracją na zbiorze `data`
+        if data:
+            kwargs["data"] = data
+    path = str(model.export(**kwargs))
+
+    if int8 and export_format == "onnx":
+        path = quantize_onnx(path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Eksport i walidacja backendów detektora.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Eksport modelu do ONNX/OpenVINO")
+    export_parser.add_argument("--weights", default="yolo/yolo11n.pt")
+    export_parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    export_parser.add_argument("--int8", action="store_true", help="Kwantyzacja INT8")
+    export_parser.add_argument("--imgsz", type=int, default=640)
+    export_parser.add_argument("--data", help="Zbiór do kalibracji INT8 / pomiaru mAP")
+    export_parser.add_argument("--static", action="store_true", help="Stały rozmiar paczki (1)")
+    export_parser.add_argument("--validate-images", help="Po eksporcie porównaj z --reference na tych obrazach")
+    export_parser.add_argument("--reference", default="yolo/yolo11l.pt")
+
+    validate_parser = commands.add_parser("validate", help="Porównanie kandydata z modelem wzorcowym")
+    validate_parser.add_argument("--reference", default="yolo/yolo11l.pt")
+    validate_parser.add_argument("--candidate", required=True)
+    validate_parser.add_argument("--images", required=True, help="Katalog z próbkami (np. wyniki/)")
+    validate_parser.add_argument("--data", help="Zbiór z etykietami do prawdziwego mAP")
+
+    for command in (export_parser, validate_parser):
+        command.add_argument("--limit", type=int, default=200, help="Najwyżej tyle obrazów")
+        command.add_argument("--conf", type=float, default=0.25)
+        command.add_argument("--iou", type=float, default=0.5, help="Próg IoU dopasowania pudełek")
+        command.add_argument("--min-agreement", type=float, default=0.0,
+                             help="Kod wyjścia 1, gdy F1 zgodności pudełek jest niższe")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        path = export(args.weights, args.format, args.int8, args.imgsz, args.data, dynamic=not args.static)
+        print(f"[LOG] Exported {args.weights} -> {path}")
+        if not args.validate_images:
+            return 0
+        candidate, images = path, args.validate_images
+    else:
+        candidate, images = args.candidate, args.images
+
+    report = validate(args.reference, candidate, images, args.limit, args.conf, args.iou, args.data)
+    print(json.dumps(report, indent=4))
+
+    if report["box_agreement_f1"] < args.min_agreement:
+        print(f"[ERROR] Box agreement {report['box_agreement_f1']} below {args.min_agreement}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class FrameDeduplicator:
+    """
+    Pomija inferencję dla prawie identycznych klatek od tego samego klienta.
+
+    Sygnaturą klatki jest pomniejszony obraz w skali szarości (`size`); różnica to średnia
+    bezwzględna różnica jasności (0-255) względem ostatniej przetworzonej klatki klienta.
+    Poniżej progu `threshold` zwracamy poprzednie wykrycia. Po `max_age` sekundach klatka
+    jest przetwarzana mimo podobieństwa, żeby powolne zmiany sceny nie umknęły.
+    """
+
+    def __init__(self, threshold=3.0, size=32, max_age=10.0, max_clients=256):
+        self.threshold = threshold
+        self.size = size
+        self.max_age = max_age
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()  # klient -> {"signature", "detections", "time"}
+        self.stats = {"frames_checked": 0, "frames_skipped": 0, "skipped_by_client": {}}
+
+    def signature(self, image):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def check(self, client_id, image):
+        """
+        Zwraca (sygnatura, poprzednie_wykrycia albo None). Wykrycia są zwracane tylko dla duplikatu.
+        """
+        signature = self.signature(image)
+        now = time.monotonic()
+        with self._lock:
+            self.stats["frames_checked"] += 1
+            if self.threshold <= 0:
+                return signature, None
+            previous = self._clients.get(client_id)
+            if previous is None or now - previous["time"] > self.max_age:
+                return signature, None
+            difference = float(np.mean(np.abs(signature - previous["signature"])))
+            if difference >= self.threshold:
+                return signature, None
+
+            self._clients.move_to_end(client_id)
+            self.stats["frames_skipped"] += 1
+            skipped = self.stats["skipped_by_client"]
+            skipped[client_id] = skipped.get(client_id, 0) + 1
+            return signature, previous["detections"]
+
+    def remember(self, client_id, signature, detections):
+        """
+        Zapamiętuje ostatnią przetworzoną klatkę klienta.
+        """
+        with self._lock:
+            self._clients[client_id] = {"signature": signature, "detections": detections, "time": time.monotonic()}
+            self._clients.move_to_end(client_id)
+            while len(self._clients) > self.max_clients:
+                evicted, _ = self._clients.popitem(last=False)
+                self.stats["skipped_by_client"].pop(evicted, None)
+
+    def snapshot(self):
+        with self._lock:
+            checked = self.stats["frames_checked"]
+            return {
+                "threshold": self.threshold,
+                "frames_checked": checked,
+                "frames_skipped": self.stats["frames_skipped"],
+                "skip_ratio": round(self.stats["frames_skipped"] / checked, 4) if checked else 0.0,
+                "skipped_by_client": dict(self.stats["skipped_by_client"]),
+                "clients": len(self._clients),
+            }
+
+
+def create_deduplicator():
+    """
+    Konfiguracja z DEDUP_THRESHOLD (0 wyłącza), DEDUP_SIZE, DEDUP_MAX_AGE, DEDUP_MAX_CLIENTS.
+    """
+    return FrameDeduplicator(
+        threshold=float(os.getenv("DEDUP_THRESHOLD", "3.0")),
+        size=int(os.getenv("DEDUP_SIZE", "32")),
+        max_age=float(os.getenv("DEDUP_MAX_AGE", "10")),
+        max_clients=int(os.getenv("DEDUP_MAX_CLIENTS", "256")),
+    )
@@ -0,0 +1,296 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import cv2
+
+from derived_cache import remove_derived
+from metrics import timed
+
+
+class FrameStore:
+    """
+    Indeks klatek zapisanych w katalogu wyników: numer klatki -> ścieżka, rozmiar, czas zapisu.
+
+    Numery klatek rosną monotonicznie i są unikalne także między procesami: proces rezerwuje
+    w SQLite pulę numerów (`ID_BLOCK`) i wydaje je z licznika w pamięci pod blokadą,
+    więc kolejne wywołania `next_frame_id` nie dotykają dysku.
+    """
+
+    ID_BLOCK = 64  # Ile numerów rezerwujemy w bazie naraz
+    WRITE_QUEUE = 64  # Ile klatek może czekać na zapis w tle, zanim `save_async` zacznie blokować
+
+    def __init__(self, directory="wyniki", db_name="frames.db"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._block_end = 0  # Pierwszy numer poza zarezerwowaną pulą
+
+        self._writes = queue.Queue(maxsize=self.WRITE_QUEUE)
+        self._pending = {}  # numer klatki -> Event ustawiany po zapisie
+        self._writer = None
+
+        self._conn = sqlite3.connect(os.path.join(directory, db_name), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS frames ("
+                           "id INTEGER PRIMARY KEY, path TEXT NOT NULL, size INTEGER, created_at REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS frames_created ON frames (created_at)")
+
+        if self._meta("next_id") is None:
+            self._import_existing()
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _import_existing(self):
+        """
+        Jednorazowy import istniejących plików frame_N.jpg (katalog sprzed wprowadzenia indeksu).
+        """
+        rows = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not (name.startswith("frame_") and name.endswith(".jpg")):
+                continue
+            try:
+                frame_id = int(name[len("frame_"):-len(".jpg")])
+            except ValueError:
+                continue
+            stat = entry.stat()
+            rows.append((frame_id, entry.path, stat.st_size, stat.st_mtime))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta("next_id") is None:
+                    self._conn.executemany("INSERT OR IGNORE INTO frames VALUES (?, ?, ?, ?)", rows)
+                    next_id = max((row[0] for row in rows), default=0) + 1
+                    self._conn.execute("INSERT INTO meta VALUES ('next_id', ?)", (next_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _reserve_block(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = self._meta("next_id") or 1
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'next_id'", (start + self.ID_BLOCK,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._next_id, self._block_end = start, start + self.ID_BLOCK
+
+    def next_frame_id(self):
+        """
+        Zwraca nowy, unikalny numer klatki.
+        """
+        with self._lock:
+            if self._next_id >= self._block_end:
+                self._reserve_block()
+            frame_id = self._next_id
+            self._next_id += 1
+            return frame_id
+
+    def path_for(self, frame_id):
+        return os.path.join(self.directory, f"frame_{frame_id}.jpg")
+
+    def register(self, frame_id, path=None, size=None, created_at=None):
+        """
+        Dodaje zapisany plik klatki do indeksu.
+        """
+        path = path or self.path_for(frame_id)
+        if size is None:
+            size = os.path.getsize(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)",
+                               (frame_id, path, size, created_at or time.time()))
+
+    def save_image(self, frame_id, image_bgr):
+        """
+        Zapisuje klatkę (BGR) jako JPEG i rejestruje ją w indeksie.
+        """
+        path = self.path_for(frame_id)
+        with timed("disk_write"):
+            if not cv2.imwrite(path, image_bgr):
+                raise IOError(f"Failed to write {path}")
+        self.register(frame_id, path)
+        return path
+
+    def save_bytes(self, frame_id, data):
+        """
+        Zapisuje gotowe bajty JPEG (np. przesłane przez telefon) bez dekodowania i ponownego kodowania.
+        """
+        path = self.path_for(frame_id)
+        tmp_path = f"{path}.tmp"
+        with timed("disk_write"):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self.register(frame_id, path, size=len(data))
+        return path
+
+    # ===== Zapis w tle =====
+
+    def _write_loop(self):
+        while True:
+            frame_id, data, image_bgr = self._writes.get()
+            try:
+                if data is not None:
+                    self.save_bytes(frame_id, data)
+                else:
+                    self.save_image(frame_id, image_bgr)
+            except Exception as e:
+                logging.error(f"Zapis klatki {frame_id} nie powiódł się: {e}")
+            finally:
+                with self._lock:
+                    event = self._pending.pop(frame_id, None)
+                if event is not None:
+                    event.set()
+                self._writes.task_done()
+
+    def write_queue_depth(self):
+        return self._writes.qsize()
+
+    def save_async(self, frame_id, data=None, image_bgr=None):
+        """
+        Zleca zapis klatki wątkowi I/O - bajty JPEG (`data`) zapisywane bez zmian albo obraz BGR
+        kodowany do JPEG. Zwraca ścieżkę, pod którą klatka się pojawi.
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="frame-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+            self._pending[frame_id] = threading.Event()
+        self._writes.put((frame_id, data, image_bgr))
+        return self.path_for(frame_id)
+
+    def wait_for(self, frame_id, timeout=5.0):
+        """
+        Czeka, aż klatka zlecona przez `save_async` trafi na dysk. Zwraca False po upływie czasu.
+        """
+        with self._lock:
+            event = self._pending.get(frame_id)
+        return event is None or event.wait(timeout)
+
+    def flush(self):
+        """
+        Czeka na zapis wszystkich zleconych klatek.
+        """
+        if self._writer is not None:
+            self._writes.join()
+
+    def get(self, frame_id):
+        """
+        Zwraca {"id", "path", "size", "created_at"} albo None, jeśli klatki nie ma w indeksie.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT id, path, size, created_at FROM frames WHERE id = ?",
+                                     (frame_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "path": row[1], "size": row[2], "created_at": row[3]}
+
+    def frame_ids(self, below=None, start=None):
+        """
+        Numery zaindeksowanych klatek (rosnąco), opcjonalnie tylko z zakresu [`start`, `below`).
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM frames WHERE id >= ? AND id < ? ORDER BY id",
+                                      (start if start is not None else -2 ** 63,
+                                       below if below is not None else 2 ** 63 - 1)).fetchall()
+        return [row[0] for row in rows]
+
+    def frame_ids_before(self, created_before, below=None):
+        """
+        Numery klatek zapisanych przed `created_before` (czas epoki), opcjonalnie mniejsze niż `below`.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM frames WHERE created_at < ? AND id < ? ORDER BY id",
+                                      (created_before, below if below is not None else 2 ** 63 - 1)).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest(self, limit, below=None):
+        """
+        Najstarsze klatki jako lista (numer, rozmiar).
+        """
+        with self._lock:
+            return self._conn.execute("SELECT id, size FROM frames WHERE id < ? ORDER BY id LIMIT ?",
+                                      (below if below is not None else 2 ** 63 - 1, limit)).fetchall()
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM frames").fetchone()[0]
+
+    def remove(self, frame_id):
+        """
+        Usuwa plik klatki, jej obrazy pochodne i wpis z indeksu. Zwraca True, jeśli klatka była w indeksie.
+        """
+        record = self.get(frame_id)
+        if record is None:
+            return False
+        try:
+            os.remove(record["path"])
+        except FileNotFoundError:
+            pass
+        remove_derived(self.directory, frame_id)  # Miniatury i wycinki tej klatki
+        with self._lock:
+            self._conn.execute("DELETE FROM frames WHERE id = ?", (frame_id,))
+        return True
+
+    def remove_many(self, frame_ids):
+        """
+        Usuwa wiele klatek naraz - pliki, obrazy pochodne i wpisy indeksu w jednej transakcji.
+        Zwraca liczbę usuniętych wpisów.
+        """
+        frame_ids = list(frame_ids)
+        if not frame_ids:
+            return 0
+        with self._lock:
+            rows = []
+            for start in range(0, len(frame_ids), 500):  # Limit parametrów SQLite
+                chunk = frame_ids[start:start + 500]
+                rows += self._conn.execute(
+                    f"SELECT id, path FROM frames WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+
+        for frame_id, path in rows:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            remove_derived(self.directory, frame_id)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("DELETE FROM frames WHERE id = ?", [(row[0],) for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_frame_store(directory="wyniki"):
+    """
+    Wspólna instancja `FrameStore` dla katalogu (app.py, data_routes, lost_objects_tracker).
+    """
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = FrameStore(directory)
+        return _stores[key]
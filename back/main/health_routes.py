@@ -0,0 +1,78 @@
+from flask import Blueprint, jsonify, current_app
+import logging
+import threading
+import time
+
+health_bp = Blueprint('health_bp', __name__)
+
+
+class StartupReport:
+    """
+    Czasy kolejnych faz uruchamiania (import, ładowanie modelu, rozgrzewka) w sekundach.
+    """
+
+    def __init__(self, started_at):
+        """
+        :param started_at: `time.perf_counter()` z początku importu aplikacji.
+        """
+        self.started_at = started_at
+        self.phases = {}
+        self.state = "starting"  # starting -> warming_up -> ready / failed
+        self.error = None
+        self._lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = round(seconds, 3)
+
+    def finish(self, state, error=None):
+        with self._lock:
+            self.state, self.error = state, error
+            self.phases["ready_after"] = round(time.perf_counter() - self.started_at, 3)
+        logging.info(f"Raport startu: {self.to_dict()}")
+
+    def to_dict(self):
+        with self._lock:
+            return {"state": self.state, "phases": dict(self.phases), "error": self.error}
+
+
+def start_warmup(detector, report):
+    """
+    Ładuje model i wykonuje próbną predykcję w tle, zapisując czasy w raporcie startu.
+    """
+    def run():
+        report.state = "warming_up"
+        try:
+            for phase, seconds in detector.warm_up().items():
+                report.record(phase, seconds)
+            if detector.is_ready():
+                report.finish("ready")
+            else:
+                report.finish("failed", "; ".join(detector.status()["errors"]) or "Model not loaded")
+        except Exception as e:
+            logging.error(f"Rozgrzewka modelu nie powiodła się: {str(e)}")
+            report.finish("failed", str(e))
+
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness - proces odpowiada, nie sprawdzamy modelu
+    return jsonify({"status": "ok"}), 200
+
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness - gotowy po rozgrzewce modelu; bez rozgrzewki zaraz po imporcie (model ładuje się leniwie).
+    """
+    report = current_app.extensions["startup"]
+    detector = current_app.extensions["detector"]
+    startup = report.to_dict()
+
+    ready = startup["state"] == "ready"
+    body = {"ready": ready, "startup": startup, "detector": detector.status()}
+    return jsonify(body), 200 if ready else 503
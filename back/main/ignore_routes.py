@@ -1,14 +1,16 @@
 from flask import Blueprint, jsonify, request
-import json
-import os
+from class_filter import get_class_filter
 
 ignore_bp = Blueprint('ignore_bp', __name__)
 
 @ignore_bp.route('/view-ignored-classes', methods=['GET'])
 def view_ignored_classes():
     try:
-        with open('./ignored_classes.json', 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        data = get_class_filter().data()
+        profile = request.args.get('profile')
+        if profile:
+            return jsonify({"profile": profile,
+                            "ignored_classes": data["profiles"].get(profile, data["ignored_classes"])})
         return jsonify(data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -16,27 +18,18 @@ def view_ignored_classes():
 @ignore_bp.route('/edit-ignored-classes', methods=['POST'])
 def edit_ignored_classes():
     try:
-        new_classes = request.json.get('new_classes', [])
-        remove_classes = request.json.get('remove_classes', [])
+        body = request.get_json(silent=True) or {}
+        new_classes = body.get('new_classes', [])
+        remove_classes = body.get('remove_classes', [])
+        # Opcjonalnie: "profile" - edycja profilu zamiast listy globalnej, "delete_profile": true - usunięcie
+        profile = body.get('profile')
 
-        if not os.path.exists('./ignored_classes.json'):
-            data = {"ignored_classes": []}
-        else:
-            with open('./ignored_classes.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-
-        ignored_classes = set(data.get('ignored_classes', []))
-
-        # Add new classes
-        ignored_classes.update(new_classes)
-        # Remove specified classes
-        ignored_classes.difference_update(remove_classes)
-
-        data['ignored_classes'] = list(ignored_classes)
-
-        with open('./ignored_classes.json', 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
+        # Zapis atomowy i natychmiastowa aktualizacja filtra używanego przez inferencję
+        get_class_filter().update(new_classes, remove_classes, profile=profile,
+                                  delete_profile=bool(profile and body.get('delete_profile')))
 
         return jsonify({"message": "Ignored classes updated successfully"})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
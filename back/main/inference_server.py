@@ -0,0 +1,489 @@
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class InferenceTimeout(Exception):
+    """Wynik predykcji nie przyszedł w zadanym czasie."""
+
+
+def load_yolo(model_path):
+    from ultralytics import YOLO
+    if model_path.endswith(".pt"):
+        return YOLO(model_path)
+    # Modele wyeksportowane (ONNX, OpenVINO) nie niosą informacji o zadaniu
+    return YOLO(model_path, task="detect")
+
+
+def _kwargs_key(kwargs):
+    return tuple(sorted((key, tuple(value) if isinstance(value, list) else value)
+                        for key, value in kwargs.items()))
+
+
+def warm_up_model(model, size=640):
+    """
+    Próbna predykcja na pustym obrazie - alokuje bufory i kompiluje jądra przed pierwszym żądaniem.
+    """
+    model.predict([np.zeros((size, size, 3), dtype=np.uint8)], verbose=False)
+
+
+def _predict_group(model, requests):
+    """
+    Jedno wywołanie modelu dla żądań o tych samych parametrach predykcji.
+    Zwraca listę (id_żądania, wykrycia Nx6 albo None, błąd albo None).
+    """
+    images = [request[1] for request in requests]
+    try:
+        results = model.predict(images, verbose=False, **requests[0][2])
+        return [(request[0], result.boxes.data.cpu().numpy(), None)
+                for request, result in zip(requests, results)]
+    except Exception as e:
+        return [(request[0], None, str(e)) for request in requests]
+
+
+def _worker_main(worker_index, model_factory, model_path, cores, threads, requests, results,
+                 max_batch, batch_window, warmup):
+    """
+    Proces roboczy: własny model, przypięty do podzbioru rdzeni, z własną liczbą wątków torch.
+    Żądania, które przyjdą w ciągu `batch_window` sekund od pierwszego, łączy w jedną paczkę.
+    Po załadowaniu modelu wysyła (None, indeks, {czasy, błąd}) - sygnał gotowości dla serwera.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError as e:
+            logging.warning(f"Worker {worker_index}: nie udało się przypiąć rdzeni {cores}: {e}")
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    model, load_error = None, None
+    timings = {}
+    try:
+        started = time.perf_counter()
+        model = model_factory(model_path)
+        timings["model_load"] = time.perf_counter() - started
+        if warmup:
+            started = time.perf_counter()
+            warm_up_model(model)
+            timings["warmup"] = time.perf_counter() - started
+    except Exception as e:
+        load_error = f"Model load failed: {e}"
+        logging.error(f"Worker {worker_index}: {load_error}")
+    results.put((None, worker_index, {"timings": timings, "error": load_error}))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+
+        batch = [request]
+        deadline = time.monotonic() + batch_window
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                requests.put(None)  # Oddajemy sygnał stopu po obsłużeniu paczki
+                break
+            batch.append(item)
+
+        # Żądania po terminie nie trafiają do modelu - klient i tak dostał już timeout
+        now = time.time()
+        live = [item for item in batch if item[3] is None or item[3] > now]
+
+        groups = {}
+        for item in live:
+            groups.setdefault(_kwargs_key(item[2]), []).append(item)
+
+        for group in groups.values():
+            if model is None:
+                for item in group:
+                    results.put((item[0], None, load_error))
+                continue
+            for result in _predict_group(model, group):
+                results.put(result)
+
+
+class InferenceServer:
+    """
+    Pula procesów z modelami YOLO za wspólną kolejką żądań.
+
+    Handlery HTTP wywołują `predict()` (albo `submit()`), które zwraca wykrycia Nx6
+    (xmin, ymin, xmax, ymax, conf, class). Procesy startują przy pierwszym żądaniu.
+
+    Wątek odbierający wyniki pilnuje też procesów: martwy proces jest uruchamiany ponownie
+    (najwyżej `max_restarts` razy), a po wyczerpaniu limitu zapisywany jako błąd w `status()`.
+    Żądania, które martwy proces zdążył pobrać z kolejki, kończą się timeoutem.
+    """
+
+    SUPERVISE_INTERVAL = 1.0  # Co ile sekund sprawdzamy, czy procesy żyją
+
+    def __init__(self, model_path, workers=2, threads_per_worker=None, max_batch=8,
+                 batch_window_ms=5, queue_size=64, default_timeout=30.0, model_factory=load_yolo,
+                 warmup=True, max_restarts=3):
+        """
+        :param workers: Liczba procesów z modelem.
+        :param threads_per_worker: Wątki torch na proces (domyślnie liczba przypiętych rdzeni).
+        :param max_batch: Maksymalna liczba obrazów w jednym wywołaniu modelu.
+        :param batch_window_ms: Jak długo proces czeka na kolejne żądania do paczki.
+        :param queue_size: Pojemność kolejki żądań.
+        :param default_timeout: Domyślny limit czasu żądania w sekundach.
+        :param model_factory: Funkcja na poziomie modułu (ścieżka) -> model; musi dać się zserializować.
+        :param warmup: Czy każdy proces wykonuje próbną predykcję zaraz po załadowaniu modelu.
+        :param max_restarts: Ile razy uruchamiamy ponownie proces, który się zakończył.
+        """
+        self.model_path = model_path
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = threads_per_worker
+        self.max_batch = max(1, int(max_batch))
+        self.batch_window = batch_window_ms / 1000.0
+        self.queue_size = queue_size
+        self.default_timeout = default_timeout
+        self.model_factory = model_factory
+        self.warmup = warmup
+        self.max_restarts = max_restarts
+
+        self._lock = threading.Lock()
+        self._workers_ready = {}  # indeks procesu -> {"timings", "error"}
+        self._all_ready = threading.Event()
+        self._ids = itertools.count()
+        self._pending = {}
+        self._processes = []
+        self._restarts = []  # indeks procesu -> liczba ponownych uruchomień
+        self._core_assignment = None
+        self._context = None
+        self._requests = None
+        self._results = None
+        self._dispatcher = None
+
+    def _core_sets(self):
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        per_worker = max(1, len(cores) // self.workers)
+        return [cores[i * per_worker:(i + 1) * per_worker] or cores for i in range(self.workers)]
+
+    def start(self):
+        with self._lock:
+            if self._processes:
+                return
+            self._context = mp.get_context("spawn")
+            self._requests = self._context.Queue(maxsize=self.queue_size)
+            self._results = self._context.Queue()
+
+            self._core_assignment = self._core_sets()
+            self._processes = [self._spawn(index) for index in range(self.workers)]
+            self._restarts = [0] * self.workers
+
+            self._dispatcher = threading.Thread(target=self._dispatch, name="inference-dispatcher", daemon=True)
+            self._dispatcher.start()
+            atexit.register(self.stop)
+            logging.info(f"Serwer inferencji: {self.workers} procesów, paczki do {self.max_batch}")
+
+    def _spawn(self, index):
+        # Wołane pod self._lock
+        cores = self._core_assignment[index]
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.model_factory, self.model_path, set(cores),
+                  self.threads_per_worker or len(cores), self._requests, self._results,
+                  self.max_batch, self.batch_window, self.warmup),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        """
+        Uruchamia ponownie procesy, które się zakończyły; po `max_restarts` próbach zapisuje błąd.
+        """
+        with self._lock:
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or self._restarts[index] > self.max_restarts:
+                    continue
+                error = f"Worker {index} exited (exit code {process.exitcode})"
+                if self._restarts[index] == self.max_restarts:
+                    self._restarts[index] += 1  # Nie próbujemy więcej
+                    logging.error(f"{error}; restart limit reached")
+                    self._workers_ready[index] = {"timings": {}, "error": error}
+                    if len(self._workers_ready) >= self.workers:
+                        self._all_ready.set()
+                    continue
+                self._restarts[index] += 1
+                logging.warning(f"{error}; restarting ({self._restarts[index]}/{self.max_restarts})")
+                self._workers_ready.pop(index, None)  # Nowy proces zgłosi gotowość sam
+                self._processes[index] = self._spawn(index)
+
+    def _dispatch(self):
+        supervised = time.monotonic()
+        while True:
+            if time.monotonic() - supervised >= self.SUPERVISE_INTERVAL:
+                self._supervise()
+                supervised = time.monotonic()
+            try:
+                item = self._results.get(timeout=self.SUPERVISE_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                return
+            if item is None:
+                return
+            request_id, detections, error = item
+            if request_id is None:
+                with self._lock:
+                    self._workers_ready[detections] = error
+                    if len(self._workers_ready) >= self.workers:
+                        self._all_ready.set()
+                continue
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None or future.done():
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(detections)
+
+    def is_ready(self):
+        """
+        True, gdy co najmniej jeden proces ma załadowany model.
+        """
+        with self._lock:
+            return any(state["error"] is None for state in self._workers_ready.values())
+
+    def status(self):
+        with self._lock:
+            errors = [state["error"] for state in self._workers_ready.values() if state["error"]]
+            return {"workers": self.workers, "started": bool(self._processes),
+                    "loaded": len(self._workers_ready) - len(errors), "errors": errors}
+
+    def warm_up(self, timeout=None):
+        """
+        Startuje procesy i czeka, aż wszystkie załadują model (i wykonają próbną predykcję).
+        Zwraca najdłuższe czasy faz spośród procesów.
+        """
+        self.start()
+        # Nie czekamy w nieskończoność: proces, który zginie przed zgłoszeniem gotowości, wątek
+        # odbierający wyniki uruchamia ponownie, a po wyczerpaniu prób zapisuje jako błąd (`_supervise`)
+        self._all_ready.wait(timeout)
+        timings = {}
+        with self._lock:
+            for state in self._workers_ready.values():
+                for phase, seconds in state["timings"].items():
+                    timings[phase] = max(timings.get(phase, 0.0), seconds)
+        return timings
+
+    def queue_depth(self):
+        try:
+            return self._requests.qsize() if self._requests is not None else 0
+        except NotImplementedError:  # macOS
+            return 0
+
+    def submit(self, image, timeout=None, **predict_kwargs):
+        """
+        Wysyła obraz (tablica HxWx3, BGR) do puli. Zwraca `Future` z wykryciami Nx6.
+        """
+        self.start()
+        timeout = self.default_timeout if timeout is None else timeout
+        request_id = next(self._ids)
+        future = Future()
+        future.request_id = request_id
+        with self._lock:
+            if self._restarts and all(count > self.max_restarts for count in self._restarts):
+                raise RuntimeError("All inference workers have exited")
+            self._pending[request_id] = future
+        deadline = time.time() + timeout if timeout else None
+        try:
+            self._requests.put((request_id, np.ascontiguousarray(image), predict_kwargs, deadline),
+                               timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise InferenceTimeout("Inference queue is full")
+        return future
+
+    def _wait(self, future, deadline):
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+        except FutureTimeoutError:
+            raise InferenceTimeout("Inference timed out")
+
+    def _discard(self, futures):
+        # Proces pomija żądania po terminie i nie odeśle dla nich wyniku - usuwamy je z oczekujących
+        with self._lock:
+            for future in futures:
+                self._pending.pop(future.request_id, None)
+        for future in futures:
+            future.cancel()
+
+    def predict(self, image, timeout=None, **predict_kwargs):
+        """
+        Wykrycia Nx6 dla jednego obrazu. Rzuca `InferenceTimeout` po przekroczeniu limitu czasu.
+        """
+        return self.predict_batch([image], timeout=timeout, **predict_kwargs)[0]
+
+    def predict_batch(self, images, timeout=None, **predict_kwargs):
+        """
+        Wysyła wszystkie obrazy naraz (procesy złożą je w paczki) i czeka na komplet wyników.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        futures = []
+        try:
+            for image in images:
+                futures.append(self.submit(image, timeout=timeout, **predict_kwargs))
+            return [self._wait(future, deadline) for future in futures]
+        except BaseException:
+            self._discard([future for future in futures if not future.done()])
+            raise
+
+    def stop(self):
+        with self._lock:
+            processes, self._processes = self._processes, []
+        if not processes:
+            return
+        for _ in processes:
+            try:
+                self._requests.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._dispatcher.join(timeout=5)
+
+
+class LocalDetector:
+    """
+    Predykcja w procesie serwera (INFERENCE_WORKERS=0) - jeden model chroniony blokadą,
+    ładowany przy pierwszym użyciu. Ten sam interfejs co `InferenceServer`.
+    """
+
+    def __init__(self, model_path, model_factory=load_yolo):
+        self.model_path = model_path
+        self.model_factory = model_factory
+        self.model = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Wołane pod self._lock
+        if self.model is None:
+            try:
+                self.model = self.model_factory(self.model_path)
+                self.error = None
+            except Exception as e:
+                self.error = f"Model load failed: {e}"
+                raise
+        return self.model
+
+    def is_ready(self):
+        return self.model is not None
+
+    def status(self):
+        return {"workers": 0, "started": self.model is not None,
+                "loaded": int(self.model is not None), "errors": [self.error] if self.error else []}
+
+    def warm_up(self, timeout=None):
+        timings = {}
+        with self._lock:
+            started = time.perf_counter()
+            model = self._load()
+            timings["model_load"] = time.perf_counter() - started
+            started = time.perf_counter()
+            warm_up_model(model)
+            timings["warmup"] = time.perf_counter() - started
+        return timings
+
+    def queue_depth(self):
+        return 0
+
+    def predict(self, image, timeout=None, **predict_kwargs):
+        return self.predict_batch([image], timeout=timeout, **predict_kwargs)[0]
+
+    def predict_batch(self, images, timeout=None, **predict_kwargs):
+        with self._lock:
+            results = self._load().predict(list(images), verbose=False, **predict_kwargs)
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+    def stop(self):
+        pass
+
+
+class _Detections:
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class _Result:
+    def __init__(self, array):
+        self.boxes = SimpleNamespace(data=_Detections(array))
+
+
+class PooledModel:
+    """
+    Pula schowana za interfejsem `model.predict(lista_klatek)` z ultralytics -
+    pozwala `VideoPipeline` i zadaniom wideo korzystać z tych samych procesów co handlery HTTP.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def predict(self, images, verbose=False, **predict_kwargs):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        return [_Result(array) for array in self.detector.predict_batch(images, **predict_kwargs)]
+
+    __call__ = predict
+
+
+def create_detector(model_path, model_factory=load_yolo):
+    """
+    Detektor skonfigurowany ze zmiennych środowiskowych:
+    INFERENCE_WORKERS (0 = model w procesie serwera), INFERENCE_THREADS, INFERENCE_MAX_BATCH,
+    INFERENCE_BATCH_WINDOW_MS, INFERENCE_QUEUE_SIZE, INFERENCE_TIMEOUT, MODEL_WARMUP.
+    Nic nie jest ładowane od razu - model wczytuje się przy pierwszym żądaniu albo w `warm_up()`.
+    """
+    workers = int(os.getenv("INFERENCE_WORKERS", "2"))
+    if workers <= 0:
+        return LocalDetector(model_path, model_factory)
+
+    threads = os.getenv("INFERENCE_THREADS")
+    return InferenceServer(
+        model_path,
+        workers=workers,
+        threads_per_worker=int(threads) if threads else None,
+        max_batch=int(os.getenv("INFERENCE_MAX_BATCH", "8")),
+        batch_window_ms=float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5")),
+        queue_size=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+        default_timeout=float(os.getenv("INFERENCE_TIMEOUT", "30")),
+        model_factory=model_factory,
+        warmup=os.getenv("MODEL_WARMUP", "1") != "0",
+    )
@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request, current_app
+from video_jobs import JobQueueFull
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+
+def get_job_manager():
+    return current_app.extensions["video_jobs"]
+
+
+def submit_video_job(data):
+    """
+    Wspólna obsługa zlecenia zadania - używana też przez /detect_video z "async": true.
+    """
+    if not data or not data.get("video_url"):
+        return jsonify({"error": "No video URL provided"}), 400
+
+    try:
+        job = get_job_manager().submit(data)
+    except JobQueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@jobs_bp.route('/jobs/detect_video', methods=['POST'])
+def create_video_job():
+    data = request.get_json(silent=True)
+    prepare = current_app.extensions.get("prepare_video_request")
+    if data and data.get("video_url") and prepare is not None:
+        # Backend, profil filtra klas i X-Profile tak samo jak w /detect_video z "async": true
+        prepare(data)
+    return submit_video_job(data)
+
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    manager = get_job_manager()
+    return jsonify({
+        "queue_depth": manager.queue_depth(),
+        "jobs": [job.to_dict() for job in manager.list()]
+    })
+
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@jobs_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@jobs_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
@@ -1,27 +1,89 @@
 import json
+import logging
 import time
 import re
+import hashlib
 from pathlib import Path
 import math
 import os
 
+import numpy as np
+
+import color_utils
+import metrics
+from class_filter import get_class_names
+from frame_store import get_frame_store
+from retention import RetentionEngine, RetentionPolicy
+from state_publisher import StatePublisher, write_atomic
+from detection_store import get_detection_store, group_by_frame, records_to_detections
+
+logger = logging.getLogger("lost_objects_tracker")
+
+# Własny rejestr procesu trackera - zapisywany do pliku .prom i doklejany przez /metrics aplikacji
+TRACKER_METRICS = metrics.Registry()
+TRACKER_STAGE_SECONDS = TRACKER_METRICS.register(metrics.Histogram(
+    "tracker_stage_seconds", "Czas etapu cyklu trackera", ("stage",)))
+TRACKER_FRAMES = TRACKER_METRICS.register(metrics.Counter(
+    "tracker_frames_total", "Klatki przetworzone przez tracker"))
+TRACKER_ERRORS = TRACKER_METRICS.register(metrics.Counter(
+    "tracker_errors_total", "Błędy cyklu trackera", ("kind",)))
+
+
+class ClassBucket:
+    """
+    Obiekty jednej klasy: nazwy w kolejności dodania i ich kolory jako macierz (n, 3) w przestrzeni
+    porównań trackera (RGB albo Lab). Kolory są dekodowane z hex tylko raz, przy dodaniu lub aktualizacji obiektu.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.colors = np.empty((8, 3), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, color):
+        size = len(self.names)
+        if size == len(self.colors):
+            self.colors = np.concatenate([self.colors, np.empty_like(self.colors)])
+        self.colors[size] = color
+        self.names.append(name)
+        return size
+
+    def matches(self, colors, threshold, start=0, stop=None, space="rgb"):
+        """
+        Maska obiektów z zakresu [start, stop), których kolor mieści się w progu.
+        Wiersze = kolory z `colors` (macierz (m, 3)), kolumny = obiekty z kubełka.
+        """
+        stop = len(self.names) if stop is None else stop
+        return color_utils.color_cost(colors, self.colors[start:stop], threshold, space) <= 1.0
+
 
 class ObjectTracker:
-    def __init__(self, delta_color_threshold):
+    def __init__(self, delta_color_threshold, color_space="rgb"):
         """
         Inicjalizuje tracker z limitem podobieństwa kolorów.
-        :param delta_color_threshold: Maksymalna akceptowalna różnica między kolorami.
+        :param delta_color_threshold: Maksymalna akceptowalna różnica między kolorami (w jednostkach `color_space`).
+        :param color_space: "rgb" (odległość euklidesowa RGB), "lab" (ΔE76) albo "de2000" (CIEDE2000).
         """
+        if color_space not in color_utils.COLOR_SPACES:
+            raise ValueError(f"color_space must be one of {color_utils.COLOR_SPACES}")
         self.objects = {}  
         self.delta_color_threshold = delta_color_threshold
+        self.color_space = color_space
+        self.buckets = {}  # klasa -> ClassBucket
+        self.class_counters = {}  # klasa -> ostatni użyty numer obiektu
+        self.frame_refs = {}  # klatka -> liczba obiektów, których ostatnie wykrycie jest na tej klatce
+        self.released = []  # klatki, na które przestał wskazywać ostatni obiekt (dla RetentionEngine)
+        self.changed = set()  # obiekty zmienione od ostatniej publikacji stanu (dla StatePublisher)
+        self.max_frame = -1  # najnowsza przetworzona klatka
 
     @staticmethod
     def hex_to_rgb(hex_color):
         """
         Konwertuj kolor
         """
-        hex_color = hex_color.lstrip('#')
-        return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+        return color_utils.hex_to_rgb(hex_color)
 
     @staticmethod
     def color_distance(color1, color2):
@@ -30,20 +92,75 @@ class ObjectTracker:
         r2, g2, b2 = ObjectTracker.hex_to_rgb(color2)
         return math.sqrt((r1 - r2) ** 2 + (g1 - g2) ** 2 + (b1 - b2) ** 2)
 
+    def color_vectors(self, hex_colors):
+        """
+        Kolory hex -> macierz (n, 3) w przestrzeni porównań trackera (konwersje są zapamiętywane).
+        """
+        return color_utils.hex_to_space(hex_colors, self.color_space)
+
     def is_similar_color(self, color1, color2):
-        distance = self.color_distance(color1, color2)
-        print(f"[DEBUG] Comparing {color1} and {color2} - Distance: {distance}, Threshold: {self.delta_color_threshold}")
-        return distance <= self.delta_color_threshold
+        colors = self.color_vectors([color1, color2])
+        cost = color_utils.color_cost(colors[:1], colors[1:], self.delta_color_threshold, self.color_space)[0, 0]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Comparing %s and %s - Distance: %.2f, Threshold: %s", color1, color2,
+                         math.sqrt(cost) * self.delta_color_threshold, self.delta_color_threshold)
+        return cost <= 1.0
 
 
     def generate_object_name(self, obj_class):
         
-        existing_keys = [key for key in self.objects.keys() if key.startswith(obj_class)]
-        return f"{obj_class}_{len(existing_keys) + 1}"
+        number = self.class_counters.get(obj_class, 0) + 1
+        self.class_counters[obj_class] = number
+        return f"{obj_class}_{number}"
+
+    def _assign(self, name, obj):
+        """
+        Przypisuje wykrycie do obiektu i przenosi referencję obiektu na nową klatkę.
+        """
+        previous = self.objects.get(name)
+        self.objects[name] = obj
+        self.changed.add(name)
+        frame = obj.get('frame')
+        self.frame_refs[frame] = self.frame_refs.get(frame, 0) + 1
+        if previous is not None:
+            self._unref(previous.get('frame'))
+
+    def _forget(self, name):
+        """
+        Usuwa obiekt ze stanu i zwalnia jego referencję do klatki.
+        """
+        previous = self.objects.pop(name, None)
+        if previous is not None:
+            self.changed.add(name)
+            self._unref(previous.get('frame'))
+
+    def _unref(self, frame):
+        count = self.frame_refs.get(frame, 0) - 1
+        if count > 0:
+            self.frame_refs[frame] = count
+        else:
+            self.frame_refs.pop(frame, None)
+            self.released.append(frame)
+
+    def drain_released(self):
+        """
+        Zwraca i czyści listę klatek zwolnionych od poprzedniego wywołania.
+        """
+        released, self.released = self.released, []
+        return released
+
+    def drain_changed(self):
+        """
+        Zwraca i czyści zbiór nazw obiektów dodanych, zmienionych lub usuniętych od poprzedniego wywołania.
+        """
+        changed, self.changed = self.changed, set()
+        return changed
 
     def process_frame(self, frame_data, frame_number):
         
         #print(f"[LOG] Processing frame {frame_number}: {frame_data}")
+        self.max_frame = max(self.max_frame, frame_number)
+        by_class = {}
         for obj in frame_data:
             obj_class = obj.get('name')
             obj_color = obj.get('color')
@@ -52,168 +169,383 @@ class ObjectTracker:
                 #print("[WARNING] Object without 'name' or 'color' ignored.")
                 continue
 
-            matched = False
-            for existing_name, existing_obj in self.objects.items():
-                if existing_name.startswith(obj_class):  
-                    if self.is_similar_color(existing_obj['color'], obj_color): 
-                        #print(f"[DEBUG] Match found: {existing_name} for color {obj_color}")
-                        obj['frame'] = frame_number
-                        self.objects[existing_name] = obj
-                        matched = True
-                        break
-
-            if not matched:
-                #print(f"[DEBUG] No match for object {obj_class} with color {obj_color}")
-                new_object_name = self.generate_object_name(obj_class)
+            by_class.setdefault(obj_class, []).append(obj)
+
+        for obj_class, class_objects in by_class.items():
+            bucket = self.buckets.setdefault(obj_class, ClassBucket())
+            colors = self.color_vectors([obj['color'] for obj in class_objects])
+
+            # Jedno wektorowe porównanie wszystkich wykryć klasy z istniejącymi obiektami
+            known = len(bucket)
+            if known:
+                within = bucket.matches(colors, self.delta_color_threshold, space=self.color_space)
+                first_match = np.where(within.any(axis=1), within.argmax(axis=1), -1)
+            else:
+                first_match = np.full(len(class_objects), -1)
+
+            for obj, color, index in zip(class_objects, colors, first_match):
                 obj['frame'] = frame_number
-                self.objects[new_object_name] = obj
 
+                if index < 0 and len(bucket) > known:
+                    # Obiekty utworzone wcześniej w tej samej klatce
+                    within = bucket.matches(color[None, :], self.delta_color_threshold, start=known,
+                                            space=self.color_space)[0]
+                    if within.any():
+                        index = known + int(within.argmax())
+
+                if index >= 0:
+                    #print(f"[DEBUG] Match found: {bucket.names[index]} for color {obj['color']}")
+                    bucket.colors[index] = color
+                    self._assign(bucket.names[index], obj)
+                else:
+                    #print(f"[DEBUG] No match for object {obj_class} with color {obj['color']}")
+                    new_object_name = self.generate_object_name(obj_class)
+                    bucket.add(new_object_name, color)
+                    self._assign(new_object_name, obj)
+
+
+    def snapshot(self):
+        """
+        Zwraca stan trackera nadający się do zapisania w checkpoincie (JSON).
+        """
+        return {"objects": self.objects, "class_counters": self.class_counters, "max_frame": self.max_frame}
+
+    def restore(self, snapshot):
+        """
+        Odtwarza stan trackera z wyniku `snapshot()` i przebudowuje indeks klas.
+        """
+        self.objects = dict(snapshot.get("objects", {}))
+        self.class_counters = dict(snapshot.get("class_counters", {}))
+        self.buckets = {}
+        self.frame_refs = {}
+        self.released = []
+        self.changed = set(self.objects)
+        self.max_frame = snapshot.get("max_frame", -1)
+
+        for name, obj in self.objects.items():
+            frame = obj.get('frame')
+            if frame is not None:
+                self.frame_refs[frame] = self.frame_refs.get(frame, 0) + 1
+                self.max_frame = max(self.max_frame, frame)
+
+            obj_class = obj.get('name')
+            if not obj_class or not obj.get('color'):
+                continue
+            self.buckets.setdefault(obj_class, ClassBucket()).add(name, self.color_vectors([obj['color']])[0])
+
+            # Starsze checkpointy nie mają liczników - odtwarzamy je z nazw obiektów
+            suffix = name[len(obj_class) + 1:]
+            if name.startswith(f"{obj_class}_") and suffix.isdigit():
+                self.class_counters[obj_class] = max(self.class_counters.get(obj_class, 0), int(suffix))
 
     def get_all_objects(self):
         """
         Zwraca aktualny stan wszystkich obiektów.
         """
-        print(f"[LOG] Current state of objects: {self.objects}")
+        logger.debug("Current state of objects: %s", self.objects)
         return self.objects
 
 
 def fix_json_line(line):
 
     try:
-        print(f"[LOG] Original line before fixing: {line.strip()}")
+        logger.debug("Original line before fixing: %s", line.strip())
         line = re.sub(r"(?<!\\)'", '"', line)
         line = re.sub(r'(\b[a-zA-Z_]\w*\b):', r'"\1":', line)
         return line
     except Exception as e:
-        print(f"[ERROR] Error fixing line: {e}")
+        logger.error("Error fixing line: %s", e)
         raise
 
 
 def write_to_txt_file(output_file, data):
     """
-    Zapisuje dane do pliku tekstowego w formacie klucz: wartość.
+    Zapisuje dane do pliku tekstowego w formacie klucz: wartość (atomowo, plik tymczasowy + os.replace).
     """
     try:
-        print(f"[LOG] Writing data to {output_file}")
-        with open(output_file, 'w') as f:
-            for obj_name, obj_data in data.items():
-                f.write(f"{obj_name}: {json.dumps(obj_data)}\n")
-        print(f"[LOG] Successfully wrote data to {output_file}")
+        logger.debug("Writing data to %s", output_file)
+        write_atomic(output_file, "".join(f"{obj_name}: {json.dumps(obj_data)}\n" for obj_name, obj_data in data.items()))
+        logger.debug("Successfully wrote data to %s", output_file)
     except Exception as e:
-        print(f"[ERROR] Failed to write to {output_file}: {e}")
+        logger.error("Failed to write to %s: %s", output_file, e)
 
 
-def monitor_file(input_file, output_file, delta_color_threshold):
-    tracker = ObjectTracker(delta_color_threshold=delta_color_threshold)
+class DetectionTailer:
+    """
+    Czyta z pliku wykryć tylko linie dopisane od ostatniego odczytu.
 
-    input_path = Path(input_file)
-    output_path = Path(output_file)
+    Pozycja (offset) jest trzymana między cyklami i może być zapisana w checkpoincie
+    razem ze stanem trackera, więc po restarcie nie przetwarzamy ponownie całej historii.
+    Obcięcie pliku lub jego podmiana (np. `detect_video` otwiera plik w trybie "w")
+    jest wykrywana po inode, rozmiarze i skrócie pierwszej linii - wtedy czytamy od zera.
+    """
 
-    while True:
+    HEAD_BYTES = 4096  # Ile bajtów pierwszej linii bierzemy do odcisku pliku
+
+    def __init__(self, input_file):
+        self.input_path = Path(input_file)
+        self.offset = 0
+        self.file_id = None
+        self.head_digest = None
+
+    def _read_head_digest(self, file):
+        file.seek(0)
+        head = file.readline(self.HEAD_BYTES)
+        if not head.endswith(b"\n") and len(head) < self.HEAD_BYTES:
+            return None  # Pierwsza linia jeszcze niedopisana
+        return hashlib.sha1(head).hexdigest()
+
+    def read_new_lines(self):
+        """
+        Zwraca listę nowych, kompletnych linii albo None, jeśli plik nie istnieje.
+        Niedokończona ostatnia linia zostaje w pliku do następnego odczytu.
+        """
         try:
-            if not input_path.exists():
-                print(f"[WARNING] Input file {input_file} not found. Waiting...")
-                time.sleep(10)
-                continue
+            stat = os.stat(self.input_path)
+        except FileNotFoundError:
+            return None
+
+        file_id = [stat.st_dev, stat.st_ino]
+
+        with self.input_path.open('rb') as file:
+            head_digest = self._read_head_digest(file)
+
+            rewritten = (
+                file_id != self.file_id
+                or stat.st_size < self.offset
+                or (self.head_digest is not None and head_digest != self.head_digest)
+            )
+            if rewritten and self.offset > 0:
+                logger.warning("Plik %s został obcięty lub podmieniony. Czytam od początku.", self.input_path)
+            if rewritten:
+                self.offset = 0
+                self.file_id = file_id
+                self.head_digest = None
+            if self.head_digest is None:
+                self.head_digest = head_digest
+
+            file.seek(self.offset)
+            data = file.read(stat.st_size - self.offset)
+
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+
+        self.offset += end + 1
+        return data[:end + 1].decode('utf-8', errors='replace').splitlines()
+
+    def read_new_frames(self):
+        """
+        Zwraca listę (numer_klatki, wykrycia) z nowych linii albo None, jeśli plik nie istnieje.
+        """
+        lines = self.read_new_lines()
+        if lines is None:
+            return None
 
-            with input_path.open('r') as file:
-                lines = file.readlines()  # ZAWSZE czytamy cały plik od początku
+        frames = []
+        for line in lines:
+            try:
+                if ': ' in line:
+                    frames.append(parse_detection_line(line))
+                else:
+                    logger.warning("Invalid line format ignored: %s", line.strip())
+            except (json.JSONDecodeError, IndexError, ValueError) as e:
+                logger.error("Error parsing line: %s -> %s", line.strip(), e)
+        return frames
 
-            #print(f"[LOG] Read {len(lines)} lines from input file.")
+    def state(self):
+        return {"offset": self.offset, "file_id": self.file_id, "head_digest": self.head_digest}
 
-            for line in lines:
-                try:
-                    if ': ' in line:
-                        frame_info, raw_data = line.strip().split(': ', 1)
-                        
-                        # Usuwamy "Frame " i zamieniamy na liczbę
-                        frame_number = int(frame_info.replace("Frame ", ""))  
+    def load_state(self, state):
+        self.offset = state.get("offset", 0)
+        self.file_id = state.get("file_id")
+        self.head_digest = state.get("head_digest")
 
-                        fixed_data = fix_json_line(raw_data)
-                        frame_data = json.loads(fixed_data)
-                        tracker.process_frame(frame_data, frame_number)  # Przekazujemy poprawny frame_number
-                    else:
-                        print(f"[WARNING] Invalid line format ignored: {line.strip()}")
-                except (json.JSONDecodeError, IndexError, ValueError) as e:
-                    print(f"[ERROR] Error parsing line: {line.strip()} -> {e}")
 
+class StoreTailer:
+    """
+    Odpowiednik `DetectionTailer` dla binarnego dziennika wykryć (`DetectionStore`):
+    offset to globalny numer rekordu, a zmiana generacji dziennika oznacza czytanie od zera.
+    """
 
-            if output_path.exists():
-                try:
-                    output_path.unlink()  # Usuwamy stary plik wyjściowy
-                except Exception as e:
-                    print(f"[ERROR] Failed to delete old output file: {e}")
-                    continue  
+    def __init__(self, store, class_names=None):
+        self.store = store
+        self.class_names = class_names or {}
+        self.offset = 0
+        self.generation = None
 
-            all_objects = tracker.get_all_objects()
-            try:
-                write_to_txt_file(output_file, all_objects)
+    def read_new_frames(self):
+        generation = self.store.generation()
+        if generation != self.generation:
+            if self.offset > 0:
+                logger.warning("Dziennik %s został wyczyszczony. Czytam od początku.", self.store.directory)
+            self.offset = 0
+            self.generation = generation
 
-                # Pobierz aktualnie używane klatki
-                used_frames = {obj["frame"] for obj in all_objects.values() if "frame" in obj}                
-                clean_unused_images('./wyniki/', used_frames, tracker)  # Przekazujemy tracker, żeby sprawdzać obiekty
-            except Exception as e:
-                print(f"[ERROR] Failed to write to output file: {e}")
-                continue  
+        records, self.offset = self.store.read(self.offset)
+        return [(frame_number, records_to_detections(group, self.class_names))
+                for frame_number, group in group_by_frame(records)]
 
-        except Exception as e:
-            print(f"[ERROR] Unexpected error: {e}")
+    def state(self):
+        return {"offset": self.offset, "generation": self.generation}
 
-        time.sleep(2)  # Oczekiwanie przed kolejnym odczytem
+    def load_state(self, state):
+        self.offset = state.get("offset", 0)
+        self.generation = state.get("generation")
 
-import os
 
-def clean_unused_images(image_folder, used_frames, object_tracker):
+def load_class_names(path="class_names.json"):
+    """
+    Nazwy klas ze wspólnego `class_filter.get_class_names`; bez pliku nazwy mają postać class_<id>.
     """
-    Usuwa obrazy `./wyniki/frame_x`, jeśli klatka nie jest już używana, 
-    jest starsza niż 10 klatek od najnowszej i nie zawiera żadnych obiektów.
+    try:
+        return get_class_names(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to read class names from %s: %s", path, e)
+        return {}
+
 
-    :param image_folder: Folder, w którym znajdują się obrazy.
-    :param used_frames: Zestaw klatek, które powinny pozostać.
-    :param object_tracker: Instancja `ObjectTracker`, do sprawdzenia obiektów na klatkach.
+def save_checkpoint(checkpoint_file, tailer, tracker, retention=None):
+    """
+    Atomowo zapisuje offset tailera, snapshot trackera i próg retencji (plik tymczasowy + os.replace).
     """
+    checkpoint = {"tailer": tailer.state(), "tracker": tracker.snapshot()}
+    if retention is not None:
+        # Checkpoint powstaje przed `retention.collect` - zwolnione klatki z tego cyklu muszą przetrwać restart
+        checkpoint["retention"] = retention.state(tracker.released)
+    tmp_file = f"{checkpoint_file}.tmp"
     try:
-        if not os.path.exists(image_folder):
-            print(f"[WARNING] Folder {image_folder} nie istnieje. Pomijam czyszczenie.")
-            return
-
-        if not used_frames:
-            print(f"[WARNING] Brak klatek w `used_frames`. Pomijam czyszczenie.")
-            return
-
-        max_used_frame = max(used_frames)  # Najnowsza używana klatka
-        safe_threshold = max_used_frame - 10  # Nie usuwamy klatek nowszych niż (max - 10)
-
-        print(f"[LOG] Maksymalna używana klatka: {max_used_frame}, Usuwamy starsze niż: {safe_threshold}")
-
-        for frame_number in range(safe_threshold):  # Sprawdzamy tylko starsze klatki
-            frame_path = os.path.join(image_folder, f"frame_{frame_number}.jpg")
-
-            # Sprawdź, czy na tej klatce są jakieś obiekty
-            has_objects = any(obj["frame"] == frame_number for obj in object_tracker.objects.values())
-
-            # Usuwamy, jeśli:
-            # 1. Nie ma jej w `used_frames`
-            # 2. Jest starsza niż `safe_threshold`
-            # 3. Nie zawiera obiektów
-            if frame_number not in used_frames and not has_objects:
-                if os.path.exists(frame_path):
-                    try:
-                        os.remove(frame_path)
-                        print(f"[LOG] Usunięto zbędny obraz: {frame_path}")
-                    except Exception as e:
-                        print(f"[ERROR] Nie udało się usunąć {frame_path}: {e}")
-                else:
-                    print(f"[WARNING] Plik {frame_path} nie istnieje.")
-            else:
-                print(f"[DEBUG] Nie usuwam frame_{frame_number} - "
-                      f"{'jest w used_frames' if frame_number in used_frames else ''} "
-                      f"{'ma obiekty' if has_objects else ''}".strip())
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_file, checkpoint_file)
+    except Exception as e:
+        logger.error("Failed to write checkpoint %s: %s", checkpoint_file, e)
+
 
+def load_checkpoint(checkpoint_file, tailer, tracker, retention=None):
+    """
+    Wczytuje checkpoint, jeśli istnieje. Zwraca True, gdy stan został odtworzony.
+    """
+    if not checkpoint_file or not os.path.exists(checkpoint_file):
+        return False
+    try:
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        tailer.load_state(checkpoint.get("tailer", {}))
+        tracker.restore(checkpoint.get("tracker", {}))
+        if retention is not None:
+            retention.load_state(checkpoint.get("retention", {}))
+        logger.info("Restored checkpoint %s (offset %s)", checkpoint_file, tailer.offset)
+        return True
     except Exception as e:
-        print(f"[ERROR] Błąd podczas czyszczenia obrazów: {e}")
+        logger.error("Failed to read checkpoint %s: %s", checkpoint_file, e)
+        return False
+
+
+def parse_detection_line(line):
+    """
+    Parsuje linię `Frame N: [...]` i zwraca (numer_klatki, lista_wykryć).
+    """
+    frame_info, raw_data = line.strip().split(': ', 1)
+
+    # Usuwamy "Frame " i zamieniamy na liczbę
+    frame_number = int(frame_info.replace("Frame ", ""))
+
+    fixed_data = fix_json_line(raw_data)
+    return frame_number, json.loads(fixed_data)
 
 
+def create_tracker(delta_color_threshold, mode=None):
+    """
+    Tracker wybrany przez TRACKER_MODE: "color" (domyślny, tylko klasa i kolor) albo "sort"
+    (`SortTracker` - skojarzenie po pudełku i kolorze z cyklem życia torów, parametry z SORT_*).
+    Przestrzeń porównań kolorów z TRACKER_COLOR_SPACE ("rgb", "lab", "de2000"); próg w jej jednostkach
+    można nadpisać przez TRACKER_COLOR_THRESHOLD (np. około 10-15 dla "de2000").
+    """
+    mode = mode or os.getenv("TRACKER_MODE", "color")
+    color_space = os.getenv("TRACKER_COLOR_SPACE", "rgb")
+    delta_color_threshold = float(os.getenv("TRACKER_COLOR_THRESHOLD", delta_color_threshold))
+    if mode == "sort":
+        from sort_tracker import SortTracker  # sort_tracker importuje ten moduł
+        return SortTracker.from_env(delta_color_threshold, color_space)
+    if mode != "color":
+        raise ValueError(f"Unknown TRACKER_MODE '{mode}'")
+    return ObjectTracker(delta_color_threshold=delta_color_threshold, color_space=color_space)
+
+
+def publish_tracker_metrics(tracker):
+    """
+    Zapisuje metryki trackera do pliku .prom (czytanego przez /metrics aplikacji).
+    """
+    TRACKER_METRICS.replace(metrics.GaugeCallback(
+        "tracker_objects", "Obiekty trzymane przez tracker", lambda: len(tracker.objects)))
+    TRACKER_METRICS.replace(metrics.GaugeCallback(
+        "tracker_referenced_frames", "Klatki wskazywane przez obiekty trackera", lambda: len(tracker.frame_refs)))
+    try:
+        metrics.write_textfile("tracker", TRACKER_METRICS)
+    except OSError as e:
+        logger.warning("Failed to write tracker metrics: %s", e)
+
+
+def monitor_cycle(tailer, tracker, retention, publisher, checkpoint_file=None):
+    """
+    Jeden cykl `monitor_file`: nowe wykrycia -> tracker -> publikacja stanu (`StatePublisher`) -> retencja klatek.
+    Zwraca liczbę przetworzonych klatek albo None, gdy pliku wejściowego nie ma.
+    """
+    with metrics.timed("read", TRACKER_STAGE_SECONDS):
+        frames = tailer.read_new_frames()  # Tylko wykrycia dopisane od ostatniego cyklu
+    if frames is None:
+        return None
+
+    with metrics.timed("tracker_update", TRACKER_STAGE_SECONDS):
+        for frame_number, frame_data in frames:
+            try:
+                tracker.process_frame(frame_data, frame_number)  # Przekazujemy poprawny frame_number
+                TRACKER_FRAMES.inc()
+            except (IndexError, ValueError) as e:
+                TRACKER_ERRORS.inc(kind="frame")
+                logger.error("Error processing frame %s -> %s", frame_number, e)
+
+    if frames and checkpoint_file:
+        save_checkpoint(checkpoint_file, tailer, tracker, retention)
+
+    try:
+        # Zapis atomowy i tylko przy zmianie - serializujemy wyłącznie zmienione obiekty
+        with metrics.timed("write_output", TRACKER_STAGE_SECONDS):
+            publisher.publish(tracker.objects, tracker.drain_changed())
+
+        # Tylko klatki zwolnione od ostatniego cyklu i te, które wypadły z okna keep_last
+        with metrics.timed("retention", TRACKER_STAGE_SECONDS):
+            retention.collect(tracker)
+    except Exception as e:
+        TRACKER_ERRORS.inc(kind="output")
+        logger.error("Failed to write to output file: %s", e)
+    return len(frames)
+
+
+def monitor_file(input_file, output_file, delta_color_threshold, checkpoint_file=None):
+    tracker = create_tracker(delta_color_threshold)
+    if str(input_file).endswith('.txt'):
+        tailer = DetectionTailer(input_file)  # Dawny tekstowy log `Frame N: [...]`
+    else:
+        tailer = StoreTailer(get_detection_store(input_file), load_class_names())
+    retention = RetentionEngine(get_frame_store('./wyniki/'), RetentionPolicy.from_env())
+    load_checkpoint(checkpoint_file, tailer, tracker, retention)
+    publisher = StatePublisher.from_env(output_file)
+
+    while True:
+        try:
+            if monitor_cycle(tailer, tracker, retention, publisher, checkpoint_file) is None:
+                logger.warning("Input file %s not found. Waiting...", input_file)
+                time.sleep(10)
+                continue
+        except Exception as e:
+            TRACKER_ERRORS.inc(kind="unexpected")
+            logger.exception("Unexpected error: %s", e)
+        finally:
+            publish_tracker_metrics(tracker)
+
+        time.sleep(2)  # Oczekiwanie przed kolejnym odczytem
 
 def ensure_directory_exists(file_path):
     directory = os.path.dirname(file_path)
@@ -222,6 +554,9 @@ def ensure_directory_exists(file_path):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     output_file = './zgubione.txt'
     ensure_directory_exists(output_file)
-    monitor_file('./wyniki/general_detections.txt', output_file, delta_color_threshold=100)
+    monitor_file('./wyniki/detections', output_file, delta_color_threshold=100,
+                 checkpoint_file='./zgubione.checkpoint.json')
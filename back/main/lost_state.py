@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+
+from state_publisher import journal_path_for
+
+
+class LostObjectsState:
+    """
+    Współdzielony w pamięci stan zgubionych obiektów z `zgubione.txt`.
+
+    Plik jest parsowany ponownie tylko wtedy, gdy zmieni się jego mtime/rozmiar/inode.
+    Oprócz danych trzymamy indeks po klasie i ETag bieżącej wersji.
+
+    Jeśli tracker prowadzi dziennik zmian (`StatePublisher` z STATE_JOURNAL=1), po pierwszym pełnym
+    odczycie stosujemy tylko nowe wpisy dziennika zamiast ponownie parsować cały plik.
+    """
+
+    def __init__(self, path='./zgubione.txt', json_path='./zgubione.json'):
+        self.path = path
+        self.json_path = json_path
+        self.journal_path = journal_path_for(path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._journal = None  # {"epoch": ..., "offset": ...} - pozycja w dzienniku zmian
+        self.data = {}
+        self.by_class = {}
+        self.etag = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    @staticmethod
+    def parse(content):
+        """
+        Parsuje linie `nazwa: {json}` (format `write_to_txt_file`).
+        """
+        data = {}
+        for line in content.splitlines():
+            if ":" not in line:
+                continue  # Pomijamy linie bez dwukropka
+
+            key, value = line.split(":", 1)  # Rozdzielamy pierwszy dwukropek
+            key = key.strip()
+            try:
+                data[key] = json.loads(value.strip())
+            except json.JSONDecodeError:
+                print(f"❌ Błąd parsowania JSON dla klucza: {key}")
+        return data
+
+    def _set(self, data, etag):
+        by_class = {}
+        for key, value in data.items():
+            by_class.setdefault(value.get("name"), {})[key] = value
+        self.data, self.by_class, self.etag = data, by_class, etag
+
+    def _write_json_copy(self):
+        # Kopia JSON dla zgodności wstecz - zapisywana tylko przy zmianie, atomowo
+        if not self.json_path:
+            return
+        tmp_path = f"{self.json_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as json_file:
+                json.dump(self.data, json_file, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.json_path)
+        except Exception as e:
+            print(f"❌ Wystąpił błąd: {e}")
+
+    def _reload(self, signature):
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        self._set(self.parse(content.decode('utf-8')), hashlib.sha1(content).hexdigest())
+        self._signature = signature
+        self._write_json_copy()
+
+    # ===== Dziennik zmian =====
+
+    def _journal_position(self):
+        """
+        Epoka i koniec ostatniej pełnej linii dziennika - zapamiętywane przed pełnym odczytem pliku.
+        """
+        try:
+            with open(self.journal_path, 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+        end = content.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        try:
+            header = json.loads(content[:content.index(b"\n")])
+        except ValueError:
+            return None
+        return {"epoch": header.get("epoch"), "offset": end}
+
+    def _apply_journal(self):
+        """
+        Stosuje nowe wpisy dziennika i zwraca ich liczbę. Zwraca None, gdy dziennika nie ma albo został
+        skompaktowany (inna epoka) - wtedy potrzebny jest pełny odczyt pliku.
+        """
+        try:
+            with open(self.journal_path, 'rb') as file:
+                try:
+                    header = json.loads(file.readline())
+                except ValueError:
+                    return None
+                if header.get("epoch") != self._journal["epoch"]:
+                    return None
+                file.seek(self._journal["offset"])
+                chunk = file.read()
+        except FileNotFoundError:
+            return None
+
+        end = chunk.rfind(b"\n") + 1  # Ostatnia linia może być jeszcze dopisywana
+        if end == 0:
+            return 0
+        try:
+            entries = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        except ValueError:
+            return None
+        self._apply(entries, chunk[:end])
+        self._journal["offset"] += end
+        return len(entries)
+
+    def _apply(self, entries, raw):
+        # Nowe słowniki zamiast zmian w miejscu - wyniki wcześniejszych `snapshot()` zostają nienaruszone
+        data, by_class = dict(self.data), dict(self.by_class)
+        copied = set()
+
+        def class_index(class_name):
+            if class_name not in copied:
+                by_class[class_name] = dict(by_class.get(class_name, {}))
+                copied.add(class_name)
+            return by_class[class_name]
+
+        for entry in entries:
+            for key in entry.get("delete", []):
+                previous = data.pop(key, None)
+                if previous is not None:
+                    class_index(previous.get("name")).pop(key, None)
+            for key, value in entry.get("upsert", {}).items():
+                previous = data.get(key)
+                if previous is not None and previous.get("name") != value.get("name"):
+                    class_index(previous.get("name")).pop(key, None)
+                data[key] = value
+                class_index(value.get("name"))[key] = value
+
+        for class_name in copied:
+            if not by_class[class_name]:
+                del by_class[class_name]
+        self.data, self.by_class = data, by_class
+        self.etag = hashlib.sha1((self.etag or "").encode('utf-8') + raw).hexdigest()
+        self._write_json_copy()
+
+    def refresh(self):
+        """
+        Przeładowuje stan, jeśli plik się zmienił. Zwraca False, gdy pliku nie ma i brak stanu w pamięci.
+        """
+        with self._lock:
+            if self._journal is not None:
+                applied = self._apply_journal()
+                if applied is not None:
+                    signature = self._file_signature()
+                    # Plik zmieniony bez nowego wpisu w dzienniku (np. tracker bez dziennika) - pełny odczyt
+                    if applied or signature == self._signature:
+                        self._signature = signature
+                        return True
+            # Pozycja w dzienniku przed odczytem pliku: późniejsze wpisy są nowsze niż wczytany stan albo już w nim są
+            self._journal = self._journal_position()
+            signature = self._file_signature()
+            if signature is None:
+                self._signature = None
+                self._journal = None
+                self._set({}, None)
+                return False
+            if signature != self._signature:
+                try:
+                    self._reload(signature)
+                except FileNotFoundError:
+                    # Plik podmieniany w trakcie odczytu - zostajemy przy poprzedniej wersji
+                    self._journal = None
+                    return self.etag is not None
+            return True
+
+    def snapshot(self):
+        """
+        Zwraca (dane, indeks_po_klasie, etag) albo None, jeśli stanu nie ma.
+        Zwrócone słowniki nie są modyfikowane w miejscu - kolejne wersje podmieniają je w całości.
+        """
+        if not self.refresh():
+            return None
+        with self._lock:
+            return self.data, self.by_class, self.etag
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def get_lost_state(path='./zgubione.txt'):
+    """
+    Wspólna instancja `LostObjectsState` dla pliku (data_routes, vision_routes).
+    """
+    key = os.path.abspath(path)
+    with _states_lock:
+        if key not in _states:
+            _states[key] = LostObjectsState(path)
+        return _states[key]
@@ -0,0 +1,203 @@
+"""
+Lekka instrumentacja potoku wykryć w formacie tekstowym Prometheusa (bez zależności).
+
+- `STAGE_SECONDS` - histogram czasów etapów (decode, inference, colors, disk_write, log_append,
+  tracker_update, retention, gemini, ...), zasilany przez `timed(...)` albo `observe_stage(...)`.
+- Liczniki (`counter`) i wskaźniki liczone przy odczycie (`gauge_callback`) np. dla głębokości kolejek.
+- Procesy bez serwera HTTP (tracker) zapisują własny rejestr do pliku *.prom w METRICS_TEXTFILE_DIR
+  (`write_textfile`); /metrics (metrics_routes.py) skleja go z rejestrem aplikacji.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TEXTFILE_DIR = os.getenv("METRICS_TEXTFILE_DIR", "metrics")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etykiety -> [liczniki kubełków..., suma, liczba]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class GaugeCallback:
+    """
+    Wskaźnik liczony przy odczycie - `callback()` zwraca liczbę albo słownik {wartość_etykiety: liczba}.
+    """
+
+    def __init__(self, name, help_text, callback, label=None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.label = label
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.callback()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for key, item in sorted(value.items()):
+                lines.append(f"{self.name}{_label_text((self.label,), (key,))} {item}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Ponowna rejestracja (np. przeładowanie modułu) zwraca istniejącą metrykę
+            return self._metrics.setdefault(metric.name, metric)
+
+    def replace(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labels=()):
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+def gauge_callback(name, help_text, callback, label=None):
+    return REGISTRY.replace(GaugeCallback(name, help_text, callback, label))
+
+
+STAGE_SECONDS = histogram("detection_stage_seconds", "Czas etapu potoku wykryć", ("stage",))
+
+_stage_listeners = []  # np. zbieranie czasów żądania do Server-Timing (metrics_routes.py)
+
+
+def add_stage_listener(listener):
+    """
+    `listener(etap, sekundy)` wołany po każdym pomiarze etapu.
+    """
+    _stage_listeners.append(listener)
+
+
+def observe_stage(stage, seconds, metric=STAGE_SECONDS):
+    """
+    Zapisuje czas etapu w histogramie i przekazuje go słuchaczom.
+    """
+    metric.observe(seconds, stage=stage)
+    for listener in _stage_listeners:
+        listener(stage, seconds)
+
+
+@contextmanager
+def timed(stage, metric=STAGE_SECONDS):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, metric)
+
+
+# ===== Metryki innych procesów =====
+
+def write_textfile(name, registry, directory=TEXTFILE_DIR):
+    """
+    Zapisuje rejestr do `<directory>/<name>.prom` atomowo (tmp + os.replace) - dla procesów bez HTTP.
+    Rejestr procesu powinien mieć własne nazwy metryk - /metrics skleja go z rejestrem aplikacji.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.prom")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+def read_textfiles(directory=TEXTFILE_DIR):
+    if not os.path.isdir(directory):
+        return ""
+    parts = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".prom"):
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    parts.append(f.read())
+            except OSError:
+                continue
+    return "".join(parts)
@@ -0,0 +1,63 @@
+from flask import Blueprint, Response, g, has_request_context, request
+import os
+import time
+
+import metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUESTS = metrics.counter("http_requests_total", "Obsłużone żądania HTTP", ("endpoint", "status"))
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Czas obsługi żądania HTTP", ("endpoint",))
+
+
+def _collect_request_stage(stage, seconds):
+    # Czasy etapów bieżącego żądania - do nagłówka Server-Timing
+    if has_request_context():
+        timings = g.setdefault("stage_timings", {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def server_timing_requested():
+    """
+    Server-Timing na życzenie: ?server_timing=1, nagłówek X-Server-Timing: 1 albo SERVER_TIMING=1.
+    """
+    return (os.getenv("SERVER_TIMING") == "1" or request.args.get("server_timing") == "1"
+            or request.headers.get("X-Server-Timing") == "1")
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or "unknown"
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+
+    if server_timing_requested():
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in g.get("stage_timings", {}).items()]
+        entries.append(f"total;dur={elapsed * 1000:.3f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+def init_metrics(app):
+    """
+    Rejestruje /metrics, liczniki i czasy żądań oraz nagłówek Server-Timing.
+    """
+    metrics.add_stage_listener(_collect_request_stage)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    body = metrics.REGISTRY.render() + metrics.read_textfiles()
+    return Response(body, headers={"Content-Type": CONTENT_TYPE})
@@ -0,0 +1,227 @@
+"""
+Deklaratywny potok przygotowania klatki: dekodowanie -> (zmniejszenie / letterbox) -> (poprawa obrazu) -> wejście modelu.
+
+Potok opisuje lista etapów, np.
+    [{"stage": "decode", "reduce": 2}, {"stage": "resize", "max_side": 1280}, {"stage": "enhance", "method": "clahe"}]
+Każdy etap mierzy swój czas (`FrameContext.timings`, ms). Współrzędne wykryć z wejścia modelu
+przeliczamy z powrotem na zdekodowany obraz (`boxes_in_image`) i na oryginał (`boxes_in_source`).
+"""
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbojpeg = TurboJPEG()
+except Exception:  # Brak biblioteki albo libjpeg-turbo - zostaje cv2.imdecode
+    _turbojpeg = None
+
+# Orientację EXIF pomijamy tak jak wcześniej PIL - pudełka odnoszą się do pikseli w pliku
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+    2: cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_COLOR_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION,
+}
+
+
+class PreprocessingError(ValueError):
+    pass
+
+
+def jpeg_orientation(data):
+    """
+    Wartość znacznika EXIF Orientation (0x0112) z nagłówka JPEG albo None.
+    Czyta tylko segmenty przed danymi obrazu - bez dekodowania.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        length = int.from_bytes(data[position + 2:position + 4], "big")
+        if marker == 0xDA:  # Początek danych obrazu - EXIF już nie wystąpi
+            return None
+        segment = data[position + 4:position + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            tiff = segment[6:]
+            order = "little" if tiff[:2] == b"II" else "big"
+            ifd = int.from_bytes(tiff[4:8], order)
+            count = int.from_bytes(tiff[ifd:ifd + 2], order)
+            for i in range(count):
+                entry = tiff[ifd + 2 + 12 * i:ifd + 14 + 12 * i]
+                if int.from_bytes(entry[:2], order) == 0x0112:
+                    return int.from_bytes(entry[8:10], order)
+            return None
+        position += 2 + length
+    return None
+
+
+class FrameContext:
+    """
+    Stan klatki w potoku. `image` to zdekodowany obraz BGR (bez poprawek - do kolorów i zapisu),
+    `model_input` to obraz podawany modelowi. `modified` mówi, czy `image` różni się od bajtów wejściowych
+    (jeśli nie, przesłany JPEG można zapisać bez ponownego kodowania).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.image = None
+        self.model_input = None
+        self.decode_scale = 1.0  # rozmiar oryginału / rozmiar `image`
+        self.input_scale = 1.0  # rozmiar `model_input` / rozmiar `image` (bez marginesów)
+        self.input_offset = (0.0, 0.0)  # margines letterboxa (x, y) w `model_input`
+        self.modified = False
+        self.timings = {}
+
+    def boxes_in_image(self, detections):
+        """
+        Wykrycia Nx6 ze współrzędnymi w `model_input` -> kopia ze współrzędnymi w `image`.
+        """
+        detections = np.array(detections, dtype=np.float32).reshape(-1, 6)
+        if self.input_scale != 1.0 or self.input_offset != (0.0, 0.0):
+            detections[:, [0, 2]] = (detections[:, [0, 2]] - self.input_offset[0]) / self.input_scale
+            detections[:, [1, 3]] = (detections[:, [1, 3]] - self.input_offset[1]) / self.input_scale
+        height, width = self.image.shape[:2]
+        detections[:, [0, 2]] = np.clip(detections[:, [0, 2]], 0, width)
+        detections[:, [1, 3]] = np.clip(detections[:, [1, 3]], 0, height)
+        return detections
+
+    def boxes_in_source(self, detections):
+        """
+        Wykrycia w `image` -> współrzędne pełnej rozdzielczości przesłanej klatki.
+        """
+        detections = np.array(detections, dtype=np.float32).reshape(-1, 6)
+        if self.decode_scale != 1.0:
+            detections[:, :4] *= self.decode_scale
+        return detections
+
+
+# ===== Etapy =====
+
+def decode(ctx, reduce=1):
+    """
+    Dekoduje bajty do BGR. `reduce` (1, 2, 4, 8) dekoduje JPEG od razu w mniejszej rozdzielczości.
+    """
+    if reduce not in _REDUCED_FLAGS:
+        raise PreprocessingError(f"decode: reduce must be one of {sorted(_REDUCED_FLAGS)}")
+
+    image = None
+    is_jpeg = ctx.data[:2] == b"\xff\xd8"
+    if _turbojpeg is not None and is_jpeg:
+        try:
+            image = _turbojpeg.decode(ctx.data, pixel_format=TJPF_BGR, scaling_factor=(1, reduce))
+        except Exception:
+            image = None
+    if image is None:
+        buffer = np.frombuffer(ctx.data, dtype=np.uint8)
+        image = cv2.imdecode(buffer, _REDUCED_FLAGS[reduce if is_jpeg else 1])
+        if image is not None and not is_jpeg and reduce > 1:
+            image = cv2.resize(image, (image.shape[1] // reduce, image.shape[0] // reduce),
+                               interpolation=cv2.INTER_AREA)
+    if image is None:
+        raise PreprocessingError("Cannot decode image data")
+
+    ctx.image = ctx.model_input = image
+    ctx.decode_scale = float(reduce)
+    # Orientację EXIF ignorujemy przy dekodowaniu, a przeglądarka by ją zastosowała - takiego
+    # pliku nie można zapisać bez zmian, bo pudełka nie pasowałyby do wyświetlanego obrazu
+    ctx.modified = reduce > 1 or not is_jpeg or jpeg_orientation(ctx.data) not in (None, 1)
+
+
+def resize(ctx, max_side=1280):
+    """
+    Zmniejsza klatkę tak, by dłuższy bok miał najwyżej `max_side` (nie powiększa).
+    Dotyczy też obrazu do kolorów i zapisu - oszczędza pracę na kolejnych etapach.
+    """
+    height, width = ctx.image.shape[:2]
+    factor = max_side / max(height, width)
+    if factor >= 1.0:
+        return
+    size = (max(1, round(width * factor)), max(1, round(height * factor)))
+    ctx.image = ctx.model_input = cv2.resize(ctx.image, size, interpolation=cv2.INTER_AREA)
+    ctx.decode_scale /= factor
+    ctx.modified = True
+
+
+def letterbox(ctx, size=640, color=114):
+    """
+    Skaluje wejście modelu do kwadratu `size` z zachowaniem proporcji i marginesami (np. dla modeli ONNX
+    o stałym wejściu). `image` zostaje bez zmian.
+    """
+    height, width = ctx.image.shape[:2]
+    factor = min(size / height, size / width)
+    new_width, new_height = round(width * factor), round(height * factor)
+    resized = cv2.resize(ctx.model_input, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    left, top = (size - new_width) // 2, (size - new_height) // 2
+    ctx.model_input = cv2.copyMakeBorder(resized, top, size - new_height - top, left, size - new_width - left,
+                                         cv2.BORDER_CONSTANT, value=(color, color, color))
+    ctx.input_scale = factor
+    ctx.input_offset = (float(left), float(top))
+
+
+def enhance(ctx, method="clahe", clip_limit=2.0, invert=True):
+    """
+    Poprawa obrazu tylko dla modelu: "clahe" (kontrast lokalny w kanale L) albo "edges"
+    (dawne mieszanie z krawędziami Canny, domyślnie odwróconymi).
+    """
+    image = ctx.model_input
+    if method == "clahe":
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+        lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+        ctx.model_input = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    elif method == "edges":
+        edges = cv2.Canny(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 100, 200)
+        edges_bgr = cv2.cvtColor(cv2.bitwise_not(edges) if invert else edges, cv2.COLOR_GRAY2BGR)
+        ctx.model_input = cv2.addWeighted(image, 0.8, edges_bgr, 0.2, 0)
+    else:
+        raise PreprocessingError(f"enhance: unknown method '{method}'")
+
+
+STAGES = {
+    "decode": decode,
+    "resize": resize,
+    "letterbox": letterbox,
+    "enhance": enhance,
+}
+
+
+class Preprocessor:
+    """
+    Potok etapów z `STAGES`. Pierwszym etapem musi być "decode".
+    """
+
+    def __init__(self, stages=None):
+        stages = [dict(stage) for stage in (stages or [{"stage": "decode"}])]
+        if not stages or stages[0].get("stage") != "decode":
+            raise PreprocessingError("Preprocessing pipeline must start with 'decode'")
+        self.stages = []
+        for stage in stages:
+            name = stage.pop("stage")
+            if name not in STAGES:
+                raise PreprocessingError(f"Unknown preprocessing stage '{name}'")
+            self.stages.append((name, STAGES[name], stage))
+
+    def describe(self):
+        return [dict(params, stage=name) for name, _, params in self.stages]
+
+    def run(self, data):
+        ctx = FrameContext(data)
+        for name, stage, params in self.stages:
+            started = time.perf_counter()
+            stage(ctx, **params)
+            elapsed = (time.perf_counter() - started) * 1000
+            ctx.timings[name] = round(ctx.timings.get(name, 0.0) + elapsed, 3)
+        return ctx
+
+
+def pipeline_from_env(variable, default=None):
+    """
+    Potok z JSON w zmiennej środowiskowej (lista etapów) albo `default`.
+    """
+    value = os.getenv(variable)
+    return Preprocessor(json.loads(value) if value else default)
@@ -0,0 +1,363 @@
+"""
+Profilowanie próbkujące na żądanie - dla wybranej części żądań HTTP i przebiegów detect_video.
+
+`StackSampler` co `interval` s odczytuje stosy wybranych wątków (`sys._current_frames`) i zlicza je
+po funkcjach; profilowany kod nie jest w żaden sposób instrumentowany. Wynik zapisujemy jako
+collapsed stacks (flamegraph.pl, speedscope, inferno) i JSON speedscope w ograniczonym katalogu
+(`ProfileStore`). Konfigurację zmienia się w locie przez POST /profiling (profiling_routes.py).
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_HEADER = "X-Profile"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+FORMATS = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class StackSampler:
+    """
+    Próbkuje stosy wątków o podanych identyfikatorach i wątków, których nazwa zaczyna się od
+    jednego z `name_prefixes`. Ramki są agregowane po funkcji (plik + pierwsza linia funkcji).
+    """
+
+    def __init__(self, thread_ids=(), name_prefixes=(), interval=0.005, max_depth=128):
+        self.thread_ids = set(thread_ids)
+        self.name_prefixes = tuple(name_prefixes)
+        self.interval = interval
+        self.max_depth = max_depth
+        self.counts = {}  # (ramka od korzenia, ...) -> liczba próbek
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+
+        self._functions = {}  # obiekt kodu -> (nazwa, plik, linia)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _targets(self):
+        targets = {ident: None for ident in self.thread_ids}
+        if self.name_prefixes:
+            for thread in threading.enumerate():
+                if thread.name.startswith(self.name_prefixes):
+                    targets[thread.ident] = thread.name
+        return targets
+
+    def _function(self, code):
+        function = self._functions.get(code)
+        if function is None:
+            function = self._functions[code] = (code.co_name, code.co_filename, code.co_firstlineno)
+        return function
+
+    def _sample(self, targets):
+        frames = sys._current_frames()
+        for ident, thread_name in targets.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._function(frame.f_code))
+                frame = frame.f_back
+            if thread_name:
+                stack.append((f"thread:{thread_name}", "", 0))
+            key = tuple(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+        self.samples += 1
+
+    def _run(self):
+        targets, refreshed = self._targets(), time.monotonic()
+        while not self._stop.wait(self.interval):
+            if self.name_prefixes and time.monotonic() - refreshed > 0.1:
+                targets, refreshed = self._targets(), time.monotonic()  # Wątki potoku startują później
+            self._sample(targets)
+
+    def start(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def collapsed(self):
+        """
+        Format collapsed stacks: `korzeń;...;liść liczba_próbek` w każdej linii.
+        """
+        lines = []
+        for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            names = ";".join(f"{name} ({os.path.basename(path)}:{line})" if path else name
+                             for name, path, line in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name):
+        """
+        Profil `sampled` w formacie JSON speedscope (https://www.speedscope.app).
+        """
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.counts.items():
+            indices = []
+            for function in stack:
+                if function not in index:
+                    index[function] = len(frames)
+                    function_name, path, line = function
+                    frames.append({"name": function_name, "file": path, "line": line} if path
+                                  else {"name": function_name})
+                indices.append(index[function])
+            samples.append(indices)
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "licYolo profiling.py",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": name, "unit": "seconds",
+                          "startValue": 0, "endValue": round(sum(weights), 6),
+                          "samples": samples, "weights": weights}],
+        }
+
+
+class ProfileStore:
+    """
+    Katalog profili ograniczony liczbą plików i łącznym rozmiarem - najstarsze profile są usuwane.
+    Każdy profil to `<id>.collapsed.txt`, `<id>.speedscope.json` i metadane `<id>.meta.json`.
+    """
+
+    def __init__(self, directory="profiles", max_bytes=50 * 1024 * 1024, max_profiles=200):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    def _write(self, path, text):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def save(self, sampler, label, meta=None):
+        """
+        Zapisuje profil i zwraca jego id.
+        """
+        label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:64] or "profile"
+        with self._lock:
+            self._counter += 1
+            profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._counter:04d}-{label}"
+        meta = dict(meta or {}, id=profile_id, label=label, created_at=sampler.started_at,
+                    duration=round(sampler.duration, 4), samples=sampler.samples,
+                    interval=sampler.interval)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(profile_id, FORMATS["collapsed"]), sampler.collapsed())
+        self._write(self._path(profile_id, FORMATS["speedscope"]), json.dumps(sampler.speedscope(profile_id)))
+        self._write(self._path(profile_id, ".meta.json"), json.dumps(meta))
+        self._trim()
+        return profile_id
+
+    def list(self):
+        """
+        Metadane zapisanych profili, od najnowszego.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta.json"):
+                continue
+            profile_id = name[:-len(".meta.json")]
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                meta["bytes"] = sum(os.path.getsize(self._path(profile_id, suffix)) for suffix in FORMATS.values())
+            except (OSError, ValueError):
+                continue  # Profil usuwany w trakcie listowania
+            profiles.append(meta)
+        return sorted(profiles, key=lambda meta: meta.get("created_at") or 0, reverse=True)
+
+    def path(self, profile_id, fmt="speedscope"):
+        """
+        Ścieżka pliku profilu albo None (nieznany format, niepoprawne id lub brak pliku).
+        """
+        if fmt not in FORMATS or not _PROFILE_ID.match(profile_id or ""):
+            return None
+        path = self._path(profile_id, FORMATS[fmt])
+        return path if os.path.exists(path) else None
+
+    def remove(self, profile_id):
+        for suffix in list(FORMATS.values()) + [".meta.json"]:
+            try:
+                os.remove(self._path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _trim(self):
+        profiles = self.list()
+        total = sum(meta["bytes"] for meta in profiles)
+        while profiles and (len(profiles) > self.max_profiles or total > self.max_bytes):
+            oldest = profiles.pop()
+            total -= oldest["bytes"]
+            self.remove(oldest["id"])
+
+
+class Profiler:
+    """
+    Decyduje, co profilować, i zapisuje wyniki w `ProfileStore`.
+
+    - żądania HTTP: losowo `sample_rate` żądań albo żądanie z nagłówkiem `X-Profile: 1`,
+    - detect_video (synchronicznie i zadania w tle): każdy przebieg, gdy `video` jest włączone,
+      albo zlecony z nagłówkiem `X-Profile: 1`.
+    Jednocześnie działa najwyżej `max_active` samplerów - nadmiarowe żądania nie są profilowane.
+    Jeśli ustawiono `admin_token`, nagłówek X-Profile działa tylko razem z X-Admin-Token. Zmiany
+    w locie (konfiguracja, usuwanie profili) wymagają tokenu - bez `admin_token` są zablokowane.
+    """
+
+    def __init__(self, store, sample_rate=0.0, video=False, interval=0.005, max_active=4, admin_token=None):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.video = video
+        self.interval = interval
+        self.max_active = max_active
+        self.admin_token = admin_token
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        PROFILE_DIR, PROFILE_MAX_BYTES, PROFILE_MAX_FILES, PROFILE_SAMPLE_RATE, PROFILE_VIDEO,
+        PROFILE_INTERVAL_MS, PROFILE_MAX_ACTIVE, PROFILING_ADMIN_TOKEN.
+        """
+        store = ProfileStore(os.getenv("PROFILE_DIR", "profiles"),
+                             max_bytes=int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024))),
+                             max_profiles=int(os.getenv("PROFILE_MAX_FILES", "200")))
+        return cls(store,
+                   sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+                   video=os.getenv("PROFILE_VIDEO", "0") == "1",
+                   interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+                   max_active=int(os.getenv("PROFILE_MAX_ACTIVE", "4")),
+                   admin_token=os.getenv("PROFILING_ADMIN_TOKEN") or None)
+
+    def config(self):
+        return {"sample_rate": self.sample_rate, "video": self.video,
+                "interval_ms": round(self.interval * 1000, 3), "max_active": self.max_active,
+                "active": self._active, "directory": self.store.directory,
+                "max_bytes": self.store.max_bytes, "max_profiles": self.store.max_profiles}
+
+    def configure(self, sample_rate=None, video=None, interval_ms=None):
+        """
+        Zmiana konfiguracji w locie (POST /profiling). Niepoprawne wartości -> ValueError.
+        """
+        if sample_rate is not None:
+            sample_rate = float(sample_rate)
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("sample_rate must be between 0 and 1")
+        if interval_ms is not None:
+            interval_ms = float(interval_ms)
+            if not 0.5 <= interval_ms <= 1000:
+                raise ValueError("interval_ms must be between 0.5 and 1000")
+        if video is not None and not isinstance(video, bool):
+            raise ValueError("video must be a boolean (true/false)")  # bool("false") byłoby True
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if video is not None:
+                self.video = video
+            if interval_ms is not None:
+                self.interval = interval_ms / 1000
+        return self.config()
+
+    def authorized(self, request):
+        """
+        Czy żądanie może zmieniać profilowanie w locie - tylko z poprawnym X-Admin-Token.
+        """
+        return self.admin_token is not None and request.headers.get("X-Admin-Token") == self.admin_token
+
+    def requested(self, request):
+        """
+        Czy żądanie prosi o profil nagłówkiem X-Profile: 1.
+        """
+        return request.headers.get(PROFILE_HEADER) == "1" and (self.admin_token is None or self.authorized(request))
+
+    def should_profile_request(self, request):
+        return self.requested(request) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def _acquire(self):
+        with self._lock:
+            if self._active >= self.max_active:
+                return False
+            self._active += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+
+    def start(self, thread_ids=(), name_prefixes=()):
+        """
+        Uruchamia sampler albo zwraca None, gdy działa już `max_active` samplerów.
+        """
+        if not self._acquire():
+            return None
+        return StackSampler(thread_ids, name_prefixes, self.interval).start()
+
+    def finish(self, sampler, label, meta=None):
+        """
+        Zatrzymuje sampler i zapisuje profil. Zwraca id profilu albo None przy błędzie zapisu.
+        """
+        sampler.stop()
+        self._release()
+        try:
+            return self.store.save(sampler, label, meta)
+        except OSError as e:
+            logging.error("Nie udało się zapisać profilu %s: %s", label, e)
+            return None
+
+    @contextmanager
+    def video_run(self, label, thread_prefix, forced=False, meta=None):
+        """
+        Profiluje przebieg `VideoPipeline.run` w bieżącym wątku razem z wątkami potoku.
+        Zwraca (przez `yield`) słownik, do którego po zakończeniu trafia "profile_id".
+        :param thread_prefix: `VideoPipeline.thread_prefix` - wątki równoległych przebiegów nie trafiają do profilu.
+        """
+        result = {}
+        sampler = self.start([threading.get_ident()], [thread_prefix]) if forced or self.video else None
+        try:
+            yield result
+        finally:
+            if sampler is not None:
+                result["profile_id"] = self.finish(sampler, label, meta)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """
+    Wspólna instancja `Profiler` skonfigurowana ze zmiennych środowiskowych.
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler.from_env()
+        return _profiler
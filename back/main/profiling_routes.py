@@ -0,0 +1,110 @@
+from flask import Blueprint, g, jsonify, request, send_file
+import os
+import threading
+
+from profiling import FORMATS, get_profiler
+
+profiling_bp = Blueprint('profiling_bp', __name__)
+
+# Bez profilowania żądań: same endpointy profilowania i metryk oraz detect_video,
+# którego przebieg (razem z wątkami potoku) profiluje `Profiler.video_run`
+SKIPPED_ENDPOINTS = {"detect_video", "metrics_bp.get_metrics"}
+
+
+def _before_request():
+    endpoint = request.endpoint or ""
+    if endpoint in SKIPPED_ENDPOINTS or endpoint.startswith("profiling_bp."):
+        return
+    profiler = get_profiler()
+    if profiler.should_profile_request(request):
+        g.profile_sampler = profiler.start([threading.get_ident()])
+
+
+def _finish_request_profile(status=None):
+    sampler = g.pop("profile_sampler", None)
+    if sampler is None:
+        return None
+    return get_profiler().finish(sampler, request.endpoint or "request",
+                                 {"kind": "request", "path": request.path, "method": request.method,
+                                  "status": status})
+
+
+def _after_request(response):
+    profile_id = _finish_request_profile(response.status_code)
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def _teardown_request(error=None):
+    # Żądanie zakończone wyjątkiem nie przechodzi przez after_request
+    _finish_request_profile("error")
+
+
+def init_profiling(app):
+    """
+    Rejestruje endpointy /profiling i profilowanie wybranych żądań.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(profiling_bp)
+
+
+def unauthorized():
+    return jsonify({"error": "Missing or invalid X-Admin-Token"}), 403
+
+
+@profiling_bp.route('/profiling', methods=['GET'])
+def get_profiling_config():
+    return jsonify(get_profiler().config())
+
+
+@profiling_bp.route('/profiling', methods=['POST'])
+def set_profiling_config():
+    """
+    Przełączanie w locie, np. {"sample_rate": 0.05, "video": true, "interval_ms": 5}.
+    """
+    profiler = get_profiler()
+    if not profiler.authorized(request):
+        return unauthorized()
+    body = request.get_json(silent=True) or {}
+    try:
+        config = profiler.configure(sample_rate=body.get("sample_rate"), video=body.get("video"),
+                                    interval_ms=body.get("interval_ms"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(config)
+
+
+@profiling_bp.route('/profiling/profiles', methods=['GET'])
+def list_profiles():
+    return jsonify({"profiles": get_profiler().store.list()})
+
+
+@profiling_bp.route('/profiling/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """
+    ?format=speedscope (domyślnie, JSON do https://www.speedscope.app) albo ?format=collapsed.
+    """
+    fmt = request.args.get("format", "speedscope")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}', expected one of {sorted(FORMATS)}"}), 400
+    path = get_profiler().store.path(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    mimetype = "application/json" if fmt == "speedscope" else "text/plain"
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True,
+                     download_name=os.path.basename(path))
+
+
+@profiling_bp.route('/profiling/profiles/<profile_id>', methods=['DELETE'])
+def delete_profile(profile_id):
+    profiler = get_profiler()
+    if not profiler.authorized(request):
+        return unauthorized()
+    if profiler.store.path(profile_id, "speedscope") is None:
+        return jsonify({"error": "Profile not found"}), 404
+    profiler.store.remove(profile_id)
+    return jsonify({"deleted": profile_id})
+
@@ -0,0 +1,172 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+
+class RetentionPolicy:
+    """
+    Zasady przechowywania klatek:
+    - `keep_last` - ostatnie N klatek (względem najnowszej przetworzonej przez tracker) nie są usuwane,
+    - pozostałe klatki bez obiektów wskazujących na nie są usuwane,
+    - `max_age` (s) i `max_bytes` usuwają najstarsze klatki także wtedy, gdy wskazuje na nie obiekt.
+    """
+
+    def __init__(self, keep_last=10, max_bytes=None, max_age=None):
+        self.keep_last = keep_last
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls):
+        """
+        RETENTION_KEEP_LAST, RETENTION_MAX_BYTES, RETENTION_MAX_AGE (puste = bez limitu).
+        """
+        max_bytes = os.getenv("RETENTION_MAX_BYTES")
+        max_age = os.getenv("RETENTION_MAX_AGE")
+        return cls(
+            keep_last=int(os.getenv("RETENTION_KEEP_LAST", "10")),
+            max_bytes=int(max_bytes) if max_bytes else None,
+            max_age=float(max_age) if max_age else None,
+        )
+
+
+class RetentionEngine:
+    """
+    Usuwanie zbędnych klatek bez przeglądania całego zakresu numerów. Tracker liczy referencje
+    obiektów do klatek (`ObjectTracker.frame_refs`) i zgłasza klatki zwolnione (`drain_released`). Silnik pamięta próg `low_water` - wszystkie klatki
+    poniżej zostały już ocenione - więc w każdym cyklu sprawdza tylko klatki nowo zwolnione
+    i te, które właśnie wypadły z okna `keep_last`. Usuwanie odbywa się paczkami w wątku w tle.
+    """
+
+    def __init__(self, frame_store, policy=None, batch_size=256, background=True):
+        self.frame_store = frame_store
+        self.policy = policy or RetentionPolicy()
+        self.batch_size = batch_size
+        self.low_water = 0
+        self.stats = {"cycles": 0, "scheduled": 0, "deleted": 0, "forced": 0}
+
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._queue = queue.Queue()
+        self._worker = None
+        if background:
+            self._worker = threading.Thread(target=self._delete_loop, name="retention", daemon=True)
+            self._worker.start()
+
+    # ===== Decyzje =====
+
+    def collect(self, tracker):
+        """
+        Wybiera klatki do usunięcia w tym cyklu i zleca ich usunięcie. Zwraca liczbę zleconych klatek.
+        """
+        self._count("cycles")
+        if tracker.max_frame < 0:
+            return 0
+        horizon = tracker.max_frame - self.policy.keep_last  # Klatki >= horizon są chronione
+        refs = tracker.frame_refs
+        candidates = []
+
+        # Klatki zwolnione od ostatniego cyklu; nowsze od low_water oceni przegląd zakresu
+        for frame_id in tracker.drain_released():
+            if frame_id < self.low_water and not refs.get(frame_id):
+                candidates.append(frame_id)
+
+        # Klatki, które właśnie wypadły z okna keep_last
+        if horizon > self.low_water:
+            for frame_id in self.frame_store.frame_ids(below=horizon, start=self.low_water):
+                if not refs.get(frame_id):
+                    candidates.append(frame_id)
+            self.low_water = horizon
+
+        forced = self._forced(horizon, set(candidates))
+        if forced:
+            logging.warning(f"Retencja: usuwam {len(forced)} klatek z obiektami (limit wieku/rozmiaru)")
+            self._count("forced", len(forced))
+
+        return self.schedule(candidates + forced)
+
+    def _forced(self, horizon, already):
+        forced = []
+        if self.policy.max_age:
+            cutoff = time.time() - self.policy.max_age
+            forced += [frame_id for frame_id in self.frame_store.frame_ids_before(cutoff, below=horizon)
+                       if frame_id not in already]
+
+        if self.policy.max_bytes:
+            excess = self.frame_store.total_bytes() - self.policy.max_bytes
+            if excess > 0:
+                skip = already | set(forced) | self._pending()
+                for frame_id, size in self.frame_store.oldest(len(skip) + 10 * self.batch_size, below=horizon):
+                    if excess <= 0:
+                        break
+                    excess -= size or 0
+                    if frame_id not in skip:
+                        forced.append(frame_id)
+        return forced
+
+    def _count(self, key, value=1):
+        # Statystyki zmieniają też wątek usuwający
+        with self._lock:
+            self.stats[key] += value
+
+    # ===== Usuwanie =====
+
+    def _pending(self):
+        with self._lock:
+            return set(self._queued)
+
+    def schedule(self, frame_ids):
+        with self._lock:
+            frame_ids = [frame_id for frame_id in frame_ids if frame_id not in self._queued]
+            self._queued.update(frame_ids)
+        for start in range(0, len(frame_ids), self.batch_size):
+            self._queue.put(frame_ids[start:start + self.batch_size])
+        self._count("scheduled", len(frame_ids))
+        if self._worker is None:
+            self.flush_now()
+        return len(frame_ids)
+
+    def _delete_batch(self, batch):
+        try:
+            self._count("deleted", self.frame_store.remove_many(batch))
+        except Exception as e:
+            logging.error(f"Retencja: nie udało się usunąć klatek: {e}")
+        finally:
+            with self._lock:
+                self._queued.difference_update(batch)
+
+    def _delete_loop(self):
+        while True:
+            batch = self._queue.get()
+            self._delete_batch(batch)
+            self._queue.task_done()
+
+    def flush_now(self):
+        """
+        Usuwa wszystkie zlecone klatki w bieżącym wątku (tryb bez wątku w tle).
+        """
+        while True:
+            try:
+                batch = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._delete_batch(batch)
+            self._queue.task_done()
+
+    def wait(self):
+        self._queue.join()
+
+    # ===== Checkpoint =====
+
+    def state(self, released=()):
+        """
+        Stan do checkpointu. Klatki jeszcze nieusunięte i zwolnione przez tracker, ale jeszcze
+        nieocenione (`released`, np. `tracker.released` przed `collect`), leżą poniżej zapisanego
+        progu - po restarcie przegląd zakresu oceni je ponownie.
+        """
+        return {"low_water": min([self.low_water] + list(self._pending()) + list(released))}
+
+    def load_state(self, state):
+        self.low_water = int(state.get("low_water", 0))
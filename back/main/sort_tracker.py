@@ -0,0 +1,378 @@
+"""
+Śledzenie wielu obiektów w stylu SORT: skojarzenie wykryć z torami po pudełku (IoU, a przy braku
+nakładania odległość środków) i kolorze, rozwiązywane algorytmem węgierskim (scipy) albo zachłannie.
+Opcjonalny filtr Kalmana przewiduje położenie toru w kolejnej klatce.
+
+Tor przechodzi przez stany: tentative (jeszcze niepewny, poza wynikiem) -> confirmed -> lost
+(niewidoczny najwyżej `max_lost` klatek, nadal może być skojarzony) -> archived (tylko ostatnie
+położenie w wyniku). Archiwum ma limit `max_archived`, więc pamięć trackera jest ograniczona.
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+import color_utils
+from lost_objects_tracker import ObjectTracker
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # Bez scipy zostaje skojarzenie zachłanne
+    linear_sum_assignment = None
+
+TENTATIVE = "tentative"
+CONFIRMED = "confirmed"
+LOST = "lost"
+ARCHIVED = "archived"
+
+MATCHERS = ("hungarian", "greedy")
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    IoU każdej pary pudełek (x1, y1, x2, y2): macierz (len(boxes_a), len(boxes_b)).
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def linear_assignment(cost, max_cost, method="hungarian"):
+    """
+    Pary (wiersz, kolumna) o minimalnym łącznym koszcie; pary droższe niż `max_cost` są odrzucane.
+    "hungarian" używa scipy, a bez niego - tak jak "greedy" - bierze pary od najtańszej.
+    """
+    if cost.size == 0:
+        return []
+    if method == "hungarian" and linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(np.minimum(cost, max_cost + 1.0))
+        return [(row, col) for row, col in zip(rows.tolist(), cols.tolist()) if cost[row, col] <= max_cost]
+
+    order = np.argsort(cost, axis=None, kind="stable")
+    order = order[cost.ravel()[order] <= max_cost]
+    rows, cols = np.unravel_index(order, cost.shape)
+    used_rows, used_cols, pairs = set(), set(), []
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+            if len(pairs) == min(cost.shape):
+                break
+    return pairs
+
+
+class BoxKalman:
+    """
+    Filtr Kalmana o stałej prędkości dla stanu (cx, cy, w, h, vx, vy, vw, vh).
+    Szumy są proporcjonalne do wysokości pudełka, jak w DeepSORT.
+    """
+
+    POSITION_NOISE = 1.0 / 20
+    VELOCITY_NOISE = 1.0 / 160
+
+    def __init__(self, box, velocity=None):
+        x1, y1, x2, y2 = box
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0, 0, 0, 0], dtype=np.float64)
+        if velocity is not None:
+            self.x[4:] = velocity
+        height = max(self.x[3], 1.0)
+        self.P = np.diag(np.square([2 * self.POSITION_NOISE * height] * 4 + [10 * self.VELOCITY_NOISE * height] * 4))
+
+    @property
+    def box(self):
+        cx, cy, width, height = self.x[:4]
+        width, height = max(width, 1.0), max(height, 1.0)
+        return np.array([cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2])
+
+    @property
+    def velocity(self):
+        return self.x[4:].tolist()
+
+    def predict(self, steps=1):
+        if steps <= 0:
+            return
+        F = np.eye(8)
+        F[range(4), range(4, 8)] = steps
+        height = max(self.x[3], 1.0)
+        Q = np.diag(np.square([self.POSITION_NOISE * height] * 4 + [self.VELOCITY_NOISE * height] * 4)) * steps
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, box):
+        x1, y1, x2, y2 = box
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        R = np.diag(np.square([self.POSITION_NOISE * max(self.x[3], 1.0)] * 4))
+        S = self.P[:4, :4] + R
+        K = np.linalg.solve(S, self.P[:4, :]).T  # P H^T S^-1, bo S jest symetryczna
+        self.x = self.x + K @ (z - self.x[:4])
+        self.P = self.P - K @ self.P[:4, :]
+
+
+class StaticMotion:
+    """
+    Model ruchu bez predykcji - tor zostaje w miejscu ostatniego wykrycia.
+    """
+
+    def __init__(self, box, velocity=None):
+        self.box = np.asarray(box, dtype=np.float64)
+
+    @property
+    def velocity(self):
+        return None
+
+    def predict(self, steps=1):
+        pass
+
+    def update(self, box):
+        self.box = np.asarray(box, dtype=np.float64)
+
+
+class Track:
+    __slots__ = ("name", "cls", "motion", "color", "detection", "hits", "frame", "predicted_at", "state")
+
+    def __init__(self, cls, motion, color, detection, frame):
+        self.name = None  # Nadawana przy potwierdzeniu
+        self.cls = cls
+        self.motion = motion
+        self.color = color  # W przestrzeni porównań trackera
+        self.detection = detection
+        self.hits = 1
+        self.frame = frame  # Ostatnie skojarzone wykrycie
+        self.predicted_at = frame
+        self.state = TENTATIVE
+
+    def to_dict(self):
+        return {"name": self.name, "class": self.cls, "box": [float(v) for v in self.motion.box],
+                "velocity": self.motion.velocity, "color": [float(v) for v in self.color], "hits": self.hits,
+                "frame": self.frame, "state": self.state}
+
+
+def detection_box(obj):
+    bbox = obj.get('bbox')
+    if not isinstance(bbox, dict):
+        return None
+    return np.array([bbox.get('xmin', 0), bbox.get('ymin', 0), bbox.get('xmax', 0), bbox.get('ymax', 0)],
+                    dtype=np.float64)
+
+
+class SortTracker(ObjectTracker):
+    """
+    Tracker z cyklem życia torów; zamiennik `ObjectTracker` o tym samym interfejsie
+    (`process_frame`, `objects`, `snapshot`/`restore`, referencje klatek dla retencji).
+
+    :param delta_color_threshold: Maksymalna odległość kolorów pary wykrycie-tor (w jednostkach `color_space`).
+    :param iou_threshold: Minimalne IoU pary; poniżej para przechodzi, jeśli środki są bliżej niż `max_centroid`.
+    :param max_centroid: Maksymalna odległość środków względem przekątnej pudełka toru.
+    :param color_weight: Waga kosztu koloru względem kosztu położenia.
+    :param min_hits: Liczba skojarzeń, po której tor jest potwierdzany i trafia do wyniku.
+    :param max_lost: Po ilu klatkach bez wykrycia tor jest archiwizowany.
+    :param max_archived: Ile zarchiwizowanych obiektów trzymamy (najstarsze są zapominane).
+    :param use_kalman: Predykcja ruchu filtrem Kalmana.
+    :param matcher: "hungarian" albo "greedy".
+    :param color_space: Przestrzeń porównań kolorów, jak w `ObjectTracker`.
+    """
+
+    def __init__(self, delta_color_threshold, iou_threshold=0.1, max_centroid=1.0, color_weight=0.5,
+                 min_hits=2, max_lost=30, max_archived=500, use_kalman=True, matcher="hungarian", color_space="rgb"):
+        super().__init__(delta_color_threshold, color_space)
+        if matcher not in MATCHERS:
+            raise ValueError(f"matcher must be one of {MATCHERS}")
+        self.iou_threshold = iou_threshold
+        self.max_centroid = max_centroid
+        self.color_weight = color_weight
+        self.min_hits = min_hits
+        self.max_lost = max_lost
+        self.max_archived = max_archived
+        self.use_kalman = use_kalman
+        self.matcher = matcher
+        self.tracks = {}  # klasa -> lista aktywnych torów (tentative, confirmed, lost)
+        self.archived = OrderedDict()  # nazwa -> None, od najdawniej zarchiwizowanych
+        self.stats = {"created": 0, "confirmed": 0, "lost": 0, "archived": 0, "forgotten": 0}
+
+    @classmethod
+    def from_env(cls, delta_color_threshold, color_space="rgb"):
+        """
+        Parametry z SORT_IOU_THRESHOLD, SORT_MAX_CENTROID, SORT_COLOR_WEIGHT, SORT_MIN_HITS, SORT_MAX_LOST,
+        SORT_MAX_ARCHIVED, SORT_KALMAN (0 wyłącza) i SORT_MATCHER.
+        """
+        return cls(
+            delta_color_threshold,
+            iou_threshold=float(os.getenv("SORT_IOU_THRESHOLD", "0.1")),
+            max_centroid=float(os.getenv("SORT_MAX_CENTROID", "1.0")),
+            color_weight=float(os.getenv("SORT_COLOR_WEIGHT", "0.5")),
+            min_hits=int(os.getenv("SORT_MIN_HITS", "2")),
+            max_lost=int(os.getenv("SORT_MAX_LOST", "30")),
+            max_archived=int(os.getenv("SORT_MAX_ARCHIVED", "500")),
+            use_kalman=os.getenv("SORT_KALMAN", "1") != "0",
+            matcher=os.getenv("SORT_MATCHER", "hungarian"),
+            color_space=color_space,
+        )
+
+    def _motion(self, box, velocity=None):
+        return BoxKalman(box, velocity) if self.use_kalman else StaticMotion(box)
+
+    # ===== Skojarzenie =====
+
+    def _cost(self, tracks, boxes, colors):
+        """
+        Koszt par (wykrycie, tor): 1 - IoU (albo 1 + odległość środków, gdy pudełka się nie nakładają)
+        plus ważony koszt koloru (`color_utils.color_cost` - kwadrat odległości względem progu, bez pierwiastka). Pary poza bramkami dostają koszt nieskończony.
+        """
+        track_boxes = np.array([track.motion.box for track in tracks])
+        track_colors = np.array([track.color for track in tracks], dtype=np.float32)
+
+        iou = iou_matrix(boxes, track_boxes)
+        centers = (boxes[:, None, :2] + boxes[:, None, 2:]) / 2
+        track_centers = (track_boxes[None, :, :2] + track_boxes[None, :, 2:]) / 2
+        diagonal = np.maximum(np.hypot(track_boxes[:, 2] - track_boxes[:, 0], track_boxes[:, 3] - track_boxes[:, 1]), 1.0)
+        distance = np.linalg.norm(centers - track_centers, axis=2) / diagonal[None, :]
+        motion = np.where(iou > 0, 1.0 - iou, 1.0 + distance)
+
+        color = color_utils.color_cost(colors, track_colors, self.delta_color_threshold, self.color_space)
+        cost = motion + self.color_weight * color
+
+        feasible = ((iou >= self.iou_threshold) | (distance <= self.max_centroid)) & (color <= 1.0)
+        return np.where(feasible, cost, np.inf)
+
+    @property
+    def max_cost(self):
+        return 2.0 + self.max_centroid + self.color_weight
+
+    def process_frame(self, frame_data, frame_number):
+        self.max_frame = max(self.max_frame, frame_number)
+        by_class = {}
+        for obj in frame_data:
+            box = detection_box(obj)
+            if not obj.get('name') or not obj.get('color') or box is None:
+                continue
+            by_class.setdefault(obj['name'], []).append((obj, box))
+
+        for obj_class in set(by_class) | set(self.tracks):
+            detections = by_class.get(obj_class, [])
+            tracks = self.tracks.setdefault(obj_class, [])
+            for track in tracks:
+                track.motion.predict(frame_number - track.predicted_at)
+                track.predicted_at = frame_number
+
+            matched = set()
+            if detections and tracks:
+                boxes = np.array([box for _, box in detections])
+                colors = self.color_vectors([obj['color'] for obj, _ in detections])
+                cost = self._cost(tracks, boxes, colors)
+                for row, col in linear_assignment(cost, self.max_cost, self.matcher):
+                    obj, box = detections[row]
+                    self._update(tracks[col], obj, box, colors[row], frame_number)
+                    matched.add(row)
+
+            for row, (obj, box) in enumerate(detections):
+                if row not in matched:
+                    obj['frame'] = frame_number
+                    track = Track(obj_class, self._motion(box), self.color_vectors([obj['color']])[0], obj, frame_number)
+                    tracks.append(track)
+                    self.stats["created"] += 1
+                    if self.min_hits <= 1:
+                        self._confirm(track)
+
+            self.tracks[obj_class] = [track for track in tracks if self._age(track, frame_number)]
+            if not self.tracks[obj_class]:
+                del self.tracks[obj_class]
+
+    def _update(self, track, obj, box, color, frame_number):
+        obj['frame'] = frame_number
+        track.motion.update(box)
+        track.color = color
+        track.detection = obj
+        track.hits += 1
+        track.frame = frame_number
+        if track.state == TENTATIVE:
+            if track.hits >= self.min_hits:
+                self._confirm(track)
+            return
+        track.state = CONFIRMED
+        obj['state'] = CONFIRMED
+        self._assign(track.name, obj)
+
+    def _confirm(self, track):
+        track.name = self.generate_object_name(track.cls)
+        track.state = CONFIRMED
+        track.detection['state'] = CONFIRMED
+        self._assign(track.name, track.detection)
+        self.stats["confirmed"] += 1
+
+    def _age(self, track, frame_number):
+        """
+        Aktualizuje stan toru bez wykrycia w tej klatce. Zwraca False, gdy tor przestaje być aktywny.
+        """
+        missed = frame_number - track.frame
+        if missed <= 0:
+            return True
+        if track.state == TENTATIVE:
+            return False
+        if missed > self.max_lost:
+            self._archive(track.name)
+            return False
+        if track.state == CONFIRMED:
+            track.state = LOST
+            self.objects[track.name]['state'] = LOST
+            self.changed.add(track.name)
+            self.stats["lost"] += 1
+        return True
+
+    def _archive(self, name):
+        self.objects[name]['state'] = ARCHIVED
+        self.changed.add(name)
+        self.archived[name] = None
+        self.stats["archived"] += 1
+        while len(self.archived) > self.max_archived:
+            forgotten, _ = self.archived.popitem(last=False)
+            self._forget(forgotten)
+            self.stats["forgotten"] += 1
+
+    def active_tracks(self):
+        return [track for tracks in self.tracks.values() for track in tracks]
+
+    # ===== Checkpoint =====
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["tracks"] = [track.to_dict() for track in self.active_tracks() if track.state != TENTATIVE]
+        snapshot["archived"] = list(self.archived)
+        return snapshot
+
+    def restore(self, snapshot):
+        super().restore(snapshot)
+        self.tracks = {}
+        self.archived = OrderedDict()
+
+        for data in snapshot.get("tracks", []):
+            name = data.get("name")
+            if name not in self.objects:
+                continue
+            # Kolor z bieżącego wykrycia - przestrzeń porównań mogła się zmienić od zapisu
+            track = Track(data["class"], self._motion(np.array(data["box"]), data.get("velocity")),
+                          self.color_vectors([self.objects[name]['color']])[0], self.objects[name], data["frame"])
+            track.name, track.hits, track.state = name, data.get("hits", self.min_hits), data.get("state", LOST)
+            track.predicted_at = track.frame
+            self.tracks.setdefault(track.cls, []).append(track)
+
+        # Obiekty bez toru (także cały stan z checkpointu trybu kolorów) są archiwalne - najstarsze pierwsze
+        active = {track.name for track in self.active_tracks()}
+        archived = snapshot.get("archived")
+        if archived is None:
+            archived = sorted((name for name in self.objects if name not in active),
+                              key=lambda name: self.objects[name].get('frame', -1))
+        for name in archived:
+            if name in self.objects and name not in active:
+                self.objects[name]['state'] = ARCHIVED
+                self.archived[name] = None
+        for name in [name for name in self.objects if name not in active and name not in self.archived]:
+            self._forget(name)
+        while len(self.archived) > self.max_archived:
+            self._forget(self.archived.popitem(last=False)[0])
@@ -0,0 +1,121 @@
+import json
+import os
+import uuid
+
+
+def journal_path_for(path):
+    """
+    Ścieżka dziennika zmian obok pliku stanu (np. zgubione.txt -> zgubione.txt.journal).
+    """
+    return f"{path}.journal"
+
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class StatePublisher:
+    """
+    Publikuje stan trackera (`{nazwa: obiekt}`) do pliku w formacie `nazwa: {json}` (zgubione.txt).
+
+    - Plik jest zapisywany tylko wtedy, gdy stan się zmienił. Tracker podaje nazwy zmienionych
+      obiektów (`ObjectTracker.drain_changed()`), więc serializujemy tylko je - linie pozostałych
+      obiektów są trzymane gotowe w pamięci.
+    - Zapis jest atomowy (plik tymczasowy + os.replace): czytelnicy widzą starą albo nową wersję,
+      nigdy brak pliku ani plik zapisany do połowy.
+    - Opcjonalny dziennik zmian (`journal=True`): po każdym zapisie dopisujemy linię JSON
+      {"seq": n, "upsert": {...}, "delete": [...]}. Pierwsza linia dziennika to nagłówek
+      {"epoch": ..., "seq": ...}. Co `compact_every` wpisów dziennik jest zastępowany samym nagłówkiem
+      z nową epoką - wtedy czytelnicy (lost_state.py) raz wczytują pełny plik, a potem znowu
+      stosują tylko kolejne zmiany.
+
+    Kolejność zapisu (najpierw plik stanu, potem wpis w dzienniku) pozwala czytelnikowi zapamiętać
+    pozycję w dzienniku, wczytać plik stanu i od tej pozycji stosować zmiany - wpisy są
+    idempotentne (pełne wartości obiektów), więc ponowne zastosowanie zmiany już obecnej w pliku nic nie psuje.
+    """
+
+    def __init__(self, path, journal=False, compact_every=500):
+        self.path = path
+        self.journal_path = journal_path_for(path) if journal else None
+        self.compact_every = compact_every
+        self.stats = {"writes": 0, "skipped": 0, "journal_entries": 0, "compactions": 0}
+
+        self._lines = {}  # nazwa -> gotowa linia `nazwa: {json}\n`
+        self._published = False
+        self._seq = 0
+        self._entries = 0  # Wpisy w bieżącym dzienniku (od ostatniej kompaktacji)
+
+    @classmethod
+    def from_env(cls, path):
+        """
+        STATE_JOURNAL=1 włącza dziennik zmian, STATE_JOURNAL_COMPACT_EVERY - liczba wpisów do kompaktacji.
+        """
+        return cls(path, journal=os.getenv("STATE_JOURNAL", "0") == "1",
+                   compact_every=int(os.getenv("STATE_JOURNAL_COMPACT_EVERY", "500")))
+
+    def publish(self, objects, changed=None):
+        """
+        Zapisuje stan, jeśli się zmienił. Zwraca True, gdy plik został zapisany.
+        :param objects: Pełny stan `{nazwa: obiekt}`.
+        :param changed: Nazwy obiektów zmienionych od ostatniej publikacji;
+            None - porównujemy wszystkie obiekty z ostatnio zapisanymi.
+        """
+        if changed is None or not self._published:
+            names = list(objects) + [name for name in self._lines if name not in objects]
+        else:
+            names = changed
+
+        upsert, delete = {}, []
+        for name in names:
+            obj = objects.get(name)
+            if obj is None:
+                if self._lines.pop(name, None) is not None:
+                    delete.append(name)
+                continue
+            line = f"{name}: {json.dumps(obj)}\n"
+            if self._lines.get(name) != line:
+                self._lines[name] = line
+                upsert[name] = obj
+
+        if self._published and not upsert and not delete:
+            self.stats["skipped"] += 1
+            return False
+
+        try:
+            write_atomic(self.path, "".join(self._lines.values()))
+            if not self._published and not self.journal_path:
+                self._remove_stale_journal()
+            if self.journal_path:
+                if not self._published or self._entries >= self.compact_every:
+                    self._compact()
+                else:
+                    self._append(upsert, delete)
+        except Exception:
+            self._published = False  # Następna publikacja zapisze pełny stan
+            raise
+        self._published = True
+        self.stats["writes"] += 1
+        return True
+
+    def _remove_stale_journal(self):
+        # Dziennik z poprzedniego uruchomienia z STATE_JOURNAL=1 - czytelnicy stosowaliby go zamiast pliku
+        try:
+            os.remove(journal_path_for(self.path))
+        except FileNotFoundError:
+            pass
+
+    def _append(self, upsert, delete):
+        self._seq += 1
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": self._seq, "upsert": upsert, "delete": delete}) + "\n")
+        self._entries += 1
+        self.stats["journal_entries"] += 1
+
+    def _compact(self):
+        # Nowa epoka: czytelnicy z pozycją w starym dzienniku wczytają pełny plik stanu
+        write_atomic(self.journal_path, json.dumps({"epoch": uuid.uuid4().hex, "seq": self._seq}) + "\n")
+        self._entries = 0
+        self.stats["compactions"] += 1
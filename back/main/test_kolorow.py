@@ -1,39 +1,34 @@
 import math
 
-def hex_to_rgb(hex_color):
-    """
-    Konwertuje kolor w formacie heksadecymalnym (#RRGGBB) na tuple RGB.
-    """
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+from color_utils import color_cost, hex_to_space
 
-def calculate_color_distance(color1, color2, threshold=50):
+def calculate_color_distance(color1, color2, threshold=50, space="rgb"):
     """
-    Oblicza odległość euklidesową między dwoma kolorami i sprawdza, czy są podobne w granicach progu.
+    Oblicza odległość między dwoma kolorami i sprawdza, czy są podobne w granicach progu.
     
     :param color1: Kolor w formacie heksadecymalnym (np. #FF5733).
     :param color2: Kolor w formacie heksadecymalnym (np. #FF5733).
     :param threshold: Maksymalna akceptowalna różnica między kolorami.
+    :param space: "rgb" (odległość euklidesowa), "lab" (ΔE76) albo "de2000" (CIEDE2000) - jak w trackerze.
     :return: Słownik z odległością oraz informacją o podobieństwie.
     """
-    rgb1 = hex_to_rgb(color1)
-    rgb2 = hex_to_rgb(color2)
+    colors = hex_to_space([color1, color2], space)
+    cost = float(color_cost(colors[:1], colors[1:], threshold, space)[0, 0])
     
-    distance = math.sqrt((rgb1[0] - rgb2[0]) ** 2 +
-                         (rgb1[1] - rgb2[1]) ** 2 +
-                         (rgb1[2] - rgb2[2]) ** 2)
+    distance = math.sqrt(cost) * threshold
     
-    similar = distance <= threshold
+    similar = cost <= 1.0
     
     return { 
         "color1": color1,
         "color2": color2,
         "distance": distance,
         "threshold": threshold,
+        "space": space,
         "similar": similar
     }
 
-def compare_colors_interactively(color1=None, color2=None, threshold=None):
+def compare_colors_interactively(color1=None, color2=None, threshold=None, space="rgb"):
     """
     Pozwala interaktywnie podać kolory i próg do porównania.
     Jeśli argumenty są podane, używa ich zamiast prosić o dane od użytkownika.
@@ -45,14 +40,15 @@ def compare_colors_interactively(color1=None, color2=None, threshold=None):
     if threshold is None:
         threshold = int(input("Podaj próg (threshold, np. 50): ").strip())
     
-    result = calculate_color_distance(color1, color2, threshold)
+    result = calculate_color_distance(color1, color2, threshold, space)
     
     print(f"\nKolory do porównania: {result['color1']} i {result['color2']}")
     print(f"Odległość: {result['distance']:.2f}")
-    print(f"Próg: {result['threshold']}")
+    print(f"Próg: {result['threshold']} ({result['space']})")
     print(f"Podobne: {'TAK' if result['similar'] else 'NIE'}")
 
 # Testy
 if __name__ == "__main__":
     compare_colors_interactively(color1="#2203FF", color2="#e709ff", threshold=50)
+    compare_colors_interactively(color1="#2203FF", color2="#e709ff", threshold=15, space="de2000")
     
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduły backendu leżą płasko w back/main (jak przy uruchamianiu `python app.py`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+from batch_analyzer import AnalysisResultsStore, BatchAnalyzer, parse_group_answers
+from computer_vision import FakeVisionModel
+
+
+def test_ids_with_spaces_and_bullets():
+    text = ("- cell phone_1: The cell phone_1 is on the desk.\n"
+            "* **cup_2**: The cup_2 is next to the monitor.\n"
+            "`potted plant_3`: The potted plant_3 is by the window.")
+    answers = parse_group_answers(text, ["cell phone_1", "cup_2", "potted plant_3"])
+    assert answers == {
+        "cell phone_1": "The cell phone_1 is on the desk.",
+        "cup_2": "The cup_2 is next to the monitor.",
+        "potted plant_3": "The potted plant_3 is by the window.",
+    }
+
+
+def test_answer_keeps_later_colons():
+    answers = parse_group_answers("book_1: Location: on the shelf", ["book_1"])
+    assert answers == {"book_1": "Location: on the shelf"}
+
+
+def test_unknown_ids_and_empty_answers_are_skipped():
+    text = "Here are the answers:\ncup_1:\nmouse_4: under the desk\ncup_2: on the chair"
+    assert parse_group_answers(text, ["cup_1", "cup_2"]) == {"cup_2": "on the chair"}
+
+
+def make_analyzer(tmp_path, model, **kwargs):
+    image_dir = tmp_path / "wyniki"
+    image_dir.mkdir(exist_ok=True)
+    return BatchAnalyzer(model, requests_per_second=1000, backoff_seconds=0,
+                         results_store=AnalysisResultsStore(str(tmp_path / "analysis.db")),
+                         image_dir=str(image_dir), **kwargs)
+
+
+def test_objects_without_frame_are_reported(tmp_path):
+    model = FakeVisionModel()
+    analyzer = make_analyzer(tmp_path, model)
+    (tmp_path / "wyniki" / "frame_1.jpg").write_bytes(b"jpeg")
+
+    results = analyzer.analyze({"cup_1": {"name": "cup", "frame": 1}, "book_1": {"name": "book"}})
+    assert results["book_1"] == {"error": "Object has no frame"}
+    assert "error" not in results["cup_1"]
+    assert model.calls == 1
+    assert analyzer.stats["errors"] == 1
+    assert analyzer.stats["analyzed"] == 1
+
+
+def test_stats_count_every_request_from_pool_threads(tmp_path):
+    analyzer = make_analyzer(tmp_path, FakeVisionModel(latency=0.001), max_in_flight=16)
+    objects = {}
+    for frame in range(1, 201):
+        (tmp_path / "wyniki" / f"frame_{frame}.jpg").write_bytes(f"jpeg {frame}".encode())
+        objects[f"cup_{frame}"] = {"name": "cup", "frame": frame}
+
+    analyzer.analyze(objects)
+    assert analyzer.stats["requests"] == 200
+    assert analyzer.stats["analyzed"] == 200
+
+    analyzer.analyze(objects)  # Niezmienione obiekty - bez zapytań
+    assert analyzer.stats["requests"] == 200
+    assert analyzer.stats["skipped"] == 200
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from class_filter import DEFAULT_ALLOWED, ClassFilter, get_class_names
+
+
+@pytest.fixture
+def class_names(tmp_path):
+    path = tmp_path / "class_names.json"
+    path.write_text(json.dumps({str(class_id): f"class_{class_id}" for class_id in range(80)}))
+    return str(path)
+
+
+@pytest.fixture
+def ignored_path(tmp_path):
+    return str(tmp_path / "ignored_classes.json")
+
+
+def test_files_are_read_on_first_use(tmp_path, ignored_path):
+    class_filter = ClassFilter(ignored_path, str(tmp_path / "missing.json"))
+    with pytest.raises(FileNotFoundError):
+        class_filter.allowed()
+
+
+def test_missing_file_defaults_to_upload_allow_list(class_names, ignored_path):
+    class_filter = ClassFilter(ignored_path, class_names)
+    assert class_filter.allowed() == DEFAULT_ALLOWED
+    # Bez profilu i listy z żądania wideo wykrywa wszystkie klasy
+    assert class_filter.allowed(use_global=False) is None
+    assert class_filter.allowed(extra_ignored=[0], use_global=False) == list(range(1, 80))
+
+
+def test_profiles_replace_global_list(class_names, ignored_path):
+    class_filter = ClassFilter(ignored_path, class_names)
+    class_filter.update(add=[1, 2], profile="kids")
+    class_filter.update(remove=[1], profile="kids")
+
+    allowed = class_filter.allowed("kids")
+    assert 2 not in allowed and 1 in allowed
+    assert class_filter.allowed("kids", use_global=False) == allowed
+    assert class_filter.allowed("unknown") == DEFAULT_ALLOWED
+    assert class_filter.profiles() == ["kids"]
+
+    class_filter.update(profile="kids", delete_profile=True)
+    assert class_filter.profiles() == []
+
+
+def test_update_is_atomic_and_bumps_version(class_names, ignored_path):
+    class_filter = ClassFilter(ignored_path, class_names)
+    class_filter.allowed()
+    version = class_filter.version
+
+    class_filter.update(add=[5])
+    assert class_filter.version > version
+    assert 5 not in class_filter.allowed()
+    with open(ignored_path, encoding="utf-8") as f:
+        assert 5 in json.load(f)["ignored_classes"]
+    assert [name for name in os.listdir(os.path.dirname(ignored_path)) if name.endswith(".tmp")] == []
+
+
+def test_external_change_is_picked_up(class_names, ignored_path):
+    class_filter = ClassFilter(ignored_path, class_names, check_interval=0)
+    class_filter.update(add=[5])
+
+    with open(ignored_path, "w", encoding="utf-8") as f:
+        json.dump({"ignored_classes": list(range(1, 80))}, f)
+    os.utime(ignored_path, ns=(1, 1))
+    assert class_filter.allowed() == [0]
+
+
+def test_class_names_are_cached(class_names):
+    assert get_class_names(class_names) is get_class_names(class_names)
+    assert get_class_names(class_names)["7"] == "class_7"
@@ -0,0 +1,40 @@
+import numpy as np
+
+import color_utils
+from color_utils import hex_to_space, rgb_to_lab, hex_to_rgb
+
+COLORS = ["#ff0000", "#00ff00", "#0000ff", "#123456", "#abcdef", "#fedcba"]
+
+
+def expected_lab(colors):
+    return rgb_to_lab([hex_to_rgb(color) for color in colors]).astype(np.float32)
+
+
+def test_lab_values_survive_cache_eviction(monkeypatch):
+    monkeypatch.setattr(color_utils, "_LAB_CACHE", {})
+    monkeypatch.setattr(color_utils, "_LAB_CACHE_SIZE", 4)
+
+    # Część kolorów z cache, część nowych - nowe nie mieszczą się, więc cache jest czyszczony w trakcie wywołania
+    hex_to_space(COLORS[:3], "lab")
+    colors = COLORS[1:] + COLORS[:2]
+    result = hex_to_space(colors, "lab")
+
+    np.testing.assert_allclose(result, expected_lab(colors), atol=1e-4)
+    assert len(color_utils._LAB_CACHE) <= 4
+
+
+def test_cache_stays_bounded(monkeypatch):
+    monkeypatch.setattr(color_utils, "_LAB_CACHE", {})
+    monkeypatch.setattr(color_utils, "_LAB_CACHE_SIZE", 4)
+
+    for color in COLORS * 3:
+        np.testing.assert_allclose(hex_to_space([color, "#000000"], "de2000"),
+                                   expected_lab([color, "#000000"]), atol=1e-4)
+        assert len(color_utils._LAB_CACHE) <= 4
+
+
+def test_rgb_space_bypasses_cache(monkeypatch):
+    monkeypatch.setattr(color_utils, "_LAB_CACHE", {})
+    result = hex_to_space(["#ff8000", "#ff8000"], "rgb")
+    assert result.tolist() == [[255, 128, 0], [255, 128, 0]]
+    assert color_utils._LAB_CACHE == {}
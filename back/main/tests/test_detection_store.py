@@ -0,0 +1,92 @@
+import numpy as np
+
+from detection_store import (DETECTION_DTYPE, DetectionStore, group_by_frame, records_from_detections,
+                             records_to_detections)
+
+CLASS_NAMES = {"0": "person", "41": "cup"}
+
+
+def detection(class_id, x, color, confidence=0.87):
+    return {
+        "class": class_id,
+        "name": CLASS_NAMES[str(class_id)],
+        "confidence": confidence,
+        "bbox": {"xmin": x, "ymin": 10, "xmax": x + 20, "ymax": 40},
+        "center": {"x": x + 10, "y": 25},
+        "color": color,
+        "timestamp": "2024-05-01 12:30:00",
+    }
+
+
+def test_round_trip(tmp_path):
+    store = DetectionStore(str(tmp_path / "detections"))
+    frames = {
+        1: [detection(0, 5, "#ff8000"), detection(41, 50, "#102030", 0.5)],
+        2: [detection(41, 60, "#abcdef")],
+    }
+    for frame_number, detection_list in frames.items():
+        store.append(frame_number, detection_list)
+
+    records, offset = store.read()
+    assert offset == store.count() == 3
+    grouped = group_by_frame(records)
+    assert [frame_number for frame_number, _ in grouped] == [1, 2]
+    for frame_number, group in grouped:
+        assert records_to_detections(group, CLASS_NAMES) == frames[frame_number]
+
+    # Odczyt od pozycji - tylko nowe rekordy
+    records, offset = store.read(start=2)
+    assert offset == 3
+    assert records_to_detections(records, CLASS_NAMES) == frames[2]
+
+
+def test_appends_span_segments(tmp_path):
+    store = DetectionStore(str(tmp_path / "detections"))
+    store.SEGMENT_RECORDS = 4
+    for frame_number in range(5):
+        store.append(frame_number, [detection(0, frame_number, "#000000")] * 3)
+
+    assert store._segment_sizes() == [4, 4, 4, 3]
+    # Nowa instancja (np. po restarcie) dopisuje do ostatniego segmentu
+    reopened = DetectionStore(store.directory)
+    reopened.SEGMENT_RECORDS = 4
+    reopened.append(5, [detection(41, 1, "#ffffff")] * 2)
+    assert reopened._segment_sizes() == [4, 4, 4, 4, 1]
+
+    records, _ = reopened.read(start=6, limit=5)
+    assert records["frame"].tolist() == [2, 2, 2, 3, 3]
+    assert len(reopened.scan(frame_range=(5, None), classes=[41])) == 2
+
+
+def test_reset_starts_new_generation(tmp_path):
+    store = DetectionStore(str(tmp_path / "detections"))
+    store.append(1, [detection(0, 5, "#ff8000")])
+    generation = store.generation()
+
+    store.reset()
+    assert store.generation() == generation + 1
+    assert store.count() == 0
+    store.append(7, [detection(41, 5, "#00ff00")])
+    records, _ = store.read()
+    assert records["frame"].tolist() == [7]
+
+
+def test_precomputed_colors_override_hex():
+    colors = np.array([[1, 2, 3]], dtype=np.uint8)
+    records = records_from_detections(1, [detection(0, 5, "#ff8000")], colors=colors)
+    assert records.dtype == DETECTION_DTYPE
+    assert records["color"].tolist() == [[1, 2, 3]]
+
+
+def test_partial_record_is_dropped_before_appending(tmp_path):
+    store = DetectionStore(str(tmp_path / "detections"))
+    store.append(1, [detection(0, 5, "#ff8000")])
+    # Przerwany zapis zostawia część rekordu na końcu segmentu
+    with open(store._segment_path(0), "ab") as f:
+        f.write(b"\x00" * (DETECTION_DTYPE.itemsize // 2))
+
+    reopened = DetectionStore(store.directory)
+    reopened.append(2, [detection(41, 50, "#102030")])
+    records, _ = reopened.read()
+    assert records["frame"].tolist() == [1, 2]
+    assert records_to_detections(records[1:], CLASS_NAMES) == [detection(41, 50, "#102030")]
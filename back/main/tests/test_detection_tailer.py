@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+from lost_objects_tracker import DetectionTailer, ObjectTracker, load_checkpoint, save_checkpoint
+
+
+def detection(x, color="#ff0000"):
+    return {"class": 41, "name": "cup", "confidence": 0.9,
+            "bbox": {"xmin": x, "ymin": 10, "xmax": x + 20, "ymax": 40},
+            "center": {"x": x + 10, "y": 25}, "color": color, "timestamp": "2024-05-01 12:30:00"}
+
+
+def line(frame_number, x=5):
+    return f"Frame {frame_number}: {json.dumps([detection(x)])}\n"
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / "general_detections.txt"
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_reads_only_new_lines(log_path):
+    tailer = DetectionTailer(log_path)
+    assert tailer.read_new_frames() is None  # Pliku jeszcze nie ma
+
+    append(log_path, line(1) + line(2))
+    assert [frame for frame, _ in tailer.read_new_frames()] == [1, 2]
+    assert tailer.offset == os.path.getsize(log_path)
+
+    assert tailer.read_new_frames() == []
+    append(log_path, line(3))
+    frames = tailer.read_new_frames()
+    assert [frame for frame, _ in frames] == [3]
+    assert frames[0][1] == [detection(5)]
+
+
+def test_partial_trailing_line_waits_for_newline(log_path):
+    tailer = DetectionTailer(log_path)
+    complete, partial = line(1), line(2)
+    append(log_path, complete + partial[:20])
+
+    assert [frame for frame, _ in tailer.read_new_frames()] == [1]
+    assert tailer.offset == len(complete.encode("utf-8"))
+
+    append(log_path, partial[20:])
+    assert [frame for frame, _ in tailer.read_new_frames()] == [2]
+
+
+def test_partial_first_line_is_not_fingerprinted(log_path):
+    tailer = DetectionTailer(log_path)
+    first = line(1)
+    append(log_path, first[:10])
+    assert tailer.read_new_frames() == []
+    assert tailer.head_digest is None
+
+    append(log_path, first[10:] + line(2))
+    assert [frame for frame, _ in tailer.read_new_frames()] == [1, 2]
+
+
+def test_truncation_restarts_from_beginning(log_path):
+    tailer = DetectionTailer(log_path)
+    append(log_path, line(1) + line(2) + line(3))
+    tailer.read_new_frames()
+
+    with open(log_path, "w", encoding="utf-8") as f:  # Dawny tryb "w" w detect_video
+        f.write(line(7))
+    assert [frame for frame, _ in tailer.read_new_frames()] == [7]
+
+
+def test_rewrite_in_place_is_detected_by_head_digest(log_path):
+    tailer = DetectionTailer(log_path)
+    append(log_path, line(1) + line(2))
+    tailer.read_new_frames()
+
+    # Ten sam inode i rozmiar niemniejszy niż offset - zmienia się tylko początek pliku
+    with open(log_path, "r+b") as f:
+        f.write((line(8) + line(9) + line(10)).encode("utf-8"))
+    assert [frame for frame, _ in tailer.read_new_frames()] == [8, 9, 10]
+
+
+def test_replaced_file_is_detected_by_inode(log_path, tmp_path):
+    tailer = DetectionTailer(log_path)
+    append(log_path, line(1))
+    tailer.read_new_frames()
+
+    replacement = tmp_path / "new.txt"
+    append(replacement, line(1) + line(2))
+    os.replace(replacement, log_path)
+    assert [frame for frame, _ in tailer.read_new_frames()] == [1, 2]
+
+
+def test_checkpoint_round_trip(log_path, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    tailer, tracker = DetectionTailer(log_path), ObjectTracker(delta_color_threshold=100)
+    append(log_path, line(1) + line(2, x=300))
+    for frame_number, frame_data in tailer.read_new_frames():
+        tracker.process_frame(frame_data, frame_number)
+    save_checkpoint(checkpoint, tailer, tracker)
+
+    restored_tailer, restored_tracker = DetectionTailer(log_path), ObjectTracker(delta_color_threshold=100)
+    assert load_checkpoint(checkpoint, restored_tailer, restored_tracker)
+    assert restored_tailer.state() == tailer.state()
+    assert restored_tracker.snapshot() == tracker.snapshot()
+
+    # Po restarcie tylko linie dopisane po checkpoincie
+    append(log_path, line(3))
+    assert [frame for frame, _ in restored_tailer.read_new_frames()] == [3]
+
+
+def test_missing_or_broken_checkpoint_starts_fresh(log_path, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    tailer, tracker = DetectionTailer(log_path), ObjectTracker(delta_color_threshold=100)
+    assert not load_checkpoint(str(checkpoint), tailer, tracker)
+
+    checkpoint.write_text("{not json", encoding="utf-8")
+    assert not load_checkpoint(str(checkpoint), tailer, tracker)
+    assert tailer.offset == 0
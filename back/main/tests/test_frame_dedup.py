@@ -0,0 +1,67 @@
+import numpy as np
+
+import frame_dedup
+from frame_dedup import FrameDeduplicator
+
+DETECTIONS = [{"class": 41, "name": "cup"}]
+
+
+def frame(value, noise=0):
+    image = np.full((120, 160, 3), value, dtype=np.uint8)
+    if noise:
+        image[::7, ::5] = value + noise
+    return image
+
+
+def test_near_duplicate_returns_previous_detections():
+    dedup = FrameDeduplicator(threshold=3.0)
+    signature, previous = dedup.check("phone", frame(100))
+    assert previous is None
+    dedup.remember("phone", signature, DETECTIONS)
+
+    _, previous = dedup.check("phone", frame(100, noise=10))
+    assert previous == DETECTIONS
+    _, previous = dedup.check("phone", frame(160))  # Inna scena
+    assert previous is None
+
+    snapshot = dedup.snapshot()
+    assert snapshot["frames_checked"] == 3
+    assert snapshot["frames_skipped"] == 1
+    assert snapshot["skipped_by_client"] == {"phone": 1}
+
+
+def test_clients_are_compared_separately():
+    dedup = FrameDeduplicator()
+    signature, _ = dedup.check("a", frame(100))
+    dedup.remember("a", signature, DETECTIONS)
+    assert dedup.check("b", frame(100))[1] is None
+
+
+def test_old_frames_are_processed_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(frame_dedup.time, "monotonic", lambda: now[0])
+    dedup = FrameDeduplicator(max_age=10.0)
+    signature, _ = dedup.check("phone", frame(100))
+    dedup.remember("phone", signature, DETECTIONS)
+
+    now[0] += 5
+    assert dedup.check("phone", frame(100))[1] == DETECTIONS
+    now[0] += 6
+    assert dedup.check("phone", frame(100))[1] is None
+
+
+def test_zero_threshold_disables_skipping():
+    dedup = FrameDeduplicator(threshold=0)
+    signature, _ = dedup.check("phone", frame(100))
+    dedup.remember("phone", signature, DETECTIONS)
+    assert dedup.check("phone", frame(100))[1] is None
+
+
+def test_least_recently_used_clients_are_evicted():
+    dedup = FrameDeduplicator(max_clients=2)
+    for client in ("a", "b", "c"):
+        signature, _ = dedup.check(client, frame(100))
+        dedup.remember(client, signature, DETECTIONS)
+    assert dedup.snapshot()["clients"] == 2
+    assert dedup.check("a", frame(100))[1] is None
+    assert dedup.check("c", frame(100))[1] == DETECTIONS
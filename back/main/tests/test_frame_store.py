@@ -0,0 +1,68 @@
+import os
+import threading
+
+import pytest
+
+from frame_store import FrameStore
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "wyniki")
+
+
+def test_ids_come_from_reserved_blocks(directory, monkeypatch):
+    monkeypatch.setattr(FrameStore, "ID_BLOCK", 4)
+    store = FrameStore(directory)
+    assert [store.next_frame_id() for _ in range(6)] == [1, 2, 3, 4, 5, 6]
+    assert store._meta("next_id") == 9  # Dwie pule po 4 numery
+
+
+def test_ids_are_unique_between_instances(directory, monkeypatch):
+    # Dwie instancje na tym samym katalogu - jak serwer i tracker w osobnych procesach
+    monkeypatch.setattr(FrameStore, "ID_BLOCK", 4)
+    first, second = FrameStore(directory), FrameStore(directory)
+    ids = [store.next_frame_id() for _ in range(5) for store in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+    # Nowa instancja po restarcie nie wydaje numerów z pul zarezerwowanych wcześniej
+    assert FrameStore(directory).next_frame_id() > max(ids)
+
+
+def test_ids_are_unique_between_threads(directory):
+    store = FrameStore(directory)
+    ids = []
+
+    def take():
+        ids.extend(store.next_frame_id() for _ in range(200))
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 800
+
+
+def test_existing_frames_are_imported_once(tmp_path):
+    directory = tmp_path / "wyniki"
+    directory.mkdir()
+    for frame_id in (3, 11):
+        (directory / f"frame_{frame_id}.jpg").write_bytes(b"jpeg")
+    (directory / "frame_x.jpg").write_bytes(b"jpeg")
+
+    store = FrameStore(str(directory))
+    assert store.frame_ids() == [3, 11]
+    assert store.next_frame_id() == 12
+    assert store.get(11)["size"] == 4
+
+
+def test_remove_many_deletes_files_and_index(directory):
+    store = FrameStore(directory)
+    paths = [store.save_bytes(store.next_frame_id(), b"jpeg") for _ in range(3)]
+    assert store.total_bytes() == 12
+
+    assert store.remove_many([1, 2, 99]) == 2
+    assert store.frame_ids() == [3]
+    assert store.total_bytes() == 4
+    assert [os.path.exists(path) for path in paths] == [False, False, True]
@@ -0,0 +1,128 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference_server import InferenceServer, InferenceTimeout, _Result, _worker_main
+
+
+class RecordingModel:
+    """
+    Model zwracający jedno wykrycie z numerem obrazu (piksel [0, 0, 0]) i zapisujący wielkość paczek.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, images, verbose=False, sleep=0, die=False, **kwargs):
+        if die:
+            os._exit(3)  # Symulacja awarii procesu z modelem
+        self.calls.append((len(images), kwargs))
+        time.sleep(sleep)
+        return [_Result(np.array([[0, 0, 1, 1, 0.9, image[0, 0, 0]]], dtype=np.float32)) for image in images]
+
+
+def make_model(model_path):
+    # Na poziomie modułu - proces potomny (spawn) musi móc ją zaimportować
+    return RecordingModel()
+
+
+def image(number):
+    return np.full((4, 4, 3), number, dtype=np.uint8)
+
+
+def run_worker(items, max_batch=4, model=None):
+    model = model or RecordingModel()
+    requests, results = queue.Queue(), queue.Queue()
+    for item in items:
+        requests.put(item)
+    requests.put(None)
+    worker = threading.Thread(target=_worker_main, args=(0, lambda path: model, "model.pt", None, None, requests,
+                                                         results, max_batch, 0.05, False))
+    worker.start()
+    worker.join(timeout=10)
+    assert not worker.is_alive()
+    collected = []
+    while not results.empty():
+        collected.append(results.get())
+    return model, collected
+
+
+def test_worker_batches_requests_with_the_same_parameters():
+    items = [(i, image(i), {"conf": 0.5}, None) for i in range(5)]
+    items += [(i, image(i), {"conf": 0.25}, None) for i in range(5, 7)]
+    model, collected = run_worker(items)
+
+    ready, answers = collected[0], collected[1:]
+    assert ready[0] is None and ready[2]["error"] is None
+    assert sorted(answer[0] for answer in answers) == list(range(7))
+    assert all(answer[1][0, 5] == answer[0] for answer in answers)  # Każde żądanie dostaje swój wynik
+    assert [size for size, _ in model.calls] == [4, 1, 2]
+    assert model.calls[-1][1] == {"conf": 0.25}
+
+
+def test_worker_skips_requests_past_their_deadline():
+    items = [(0, image(0), {}, time.time() - 1), (1, image(1), {}, time.time() + 60)]
+    model, collected = run_worker(items)
+    assert [answer[0] for answer in collected[1:]] == [1]
+    assert model.calls == [(1, {})]
+
+
+def test_worker_reports_model_load_error():
+    requests, results = queue.Queue(), queue.Queue()
+    requests.put((0, image(0), {}, None))
+    requests.put(None)
+
+    def broken(path):
+        raise OSError("missing weights")
+
+    _worker_main(0, broken, "model.pt", None, None, requests, results, 4, 0.0, False)
+    ready, answer = results.get(), results.get()
+    assert "missing weights" in ready[2]["error"]
+    assert answer[0] == 0 and answer[1] is None and "missing weights" in answer[2]
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = InferenceServer("model.pt", workers=1, model_factory=make_model, warmup=False, batch_window_ms=20)
+    server.warm_up(timeout=60)
+    yield server
+    server.stop()
+
+
+def test_predict_batch_returns_results_in_order(server):
+    results = server.predict_batch([image(i) for i in range(6)], timeout=30)
+    assert [int(result[0, 5]) for result in results] == list(range(6))
+    assert server.status()["loaded"] == 1
+
+
+def test_timed_out_batch_leaves_no_pending_requests(server):
+    with pytest.raises(InferenceTimeout):
+        server.predict_batch([image(1), image(2), image(3)], timeout=0.2, sleep=1)
+    assert server._pending == {}
+    time.sleep(1)  # Proces kończy zaczętą paczkę
+    assert int(server.predict(image(9), timeout=30)[0, 5]) == 9
+
+
+def test_dead_worker_is_restarted():
+    server = InferenceServer("model.pt", workers=1, model_factory=make_model, warmup=False, max_restarts=1)
+    try:
+        server.warm_up(timeout=60)
+        with pytest.raises(InferenceTimeout):
+            server.predict(image(1), timeout=1, die=True)
+        assert int(server.predict(image(2), timeout=60)[0, 5]) == 2
+
+        # Po wyczerpaniu limitu ponownych uruchomień proces jest zgłaszany jako błąd
+        with pytest.raises(InferenceTimeout):
+            server.predict(image(3), timeout=1, die=True)
+        deadline = time.monotonic() + 30
+        while not server.status()["errors"] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert server.status()["errors"] == ["Worker 0 exited (exit code 3)"]
+        with pytest.raises(RuntimeError):
+            server.predict(image(4), timeout=1)
+    finally:
+        server.stop()
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from lost_state import LostObjectsState
+from state_publisher import StatePublisher, journal_path_for, write_atomic
+
+
+def lost(name, frame):
+    return {"name": name, "last_seen_frame": frame}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "zgubione.txt")
+
+
+def test_journal_entries_are_applied_without_full_reload(path, monkeypatch):
+    publisher = StatePublisher(path, journal=True)
+    objects = {"cup_1": lost("cup", 1), "book_1": lost("book", 2)}
+    publisher.publish(objects)
+
+    state = LostObjectsState(path, json_path=None)
+    data, by_class, _ = state.snapshot()
+    assert data == objects
+    assert set(by_class) == {"cup", "book"}
+
+    def no_reload(signature):
+        raise AssertionError("full reload instead of applying the journal")
+
+    monkeypatch.setattr(state, "_reload", no_reload)
+    objects = {"cup_1": lost("cup", 5), "cell phone_1": lost("cell phone", 6)}
+    publisher.publish(objects, changed=["cup_1", "book_1", "cell phone_1"])
+
+    data, by_class, _ = state.snapshot()
+    assert data == objects
+    assert set(by_class) == {"cup", "cell phone"}
+    assert by_class["cup"] == {"cup_1": lost("cup", 5)}
+
+
+def test_snapshots_are_not_modified_in_place(path):
+    publisher = StatePublisher(path, journal=True)
+    publisher.publish({"cup_1": lost("cup", 1)})
+    state = LostObjectsState(path, json_path=None)
+    first, first_by_class, first_etag = state.snapshot()
+
+    publisher.publish({"cup_1": lost("cup", 2)}, changed=["cup_1"])
+    second, _, second_etag = state.snapshot()
+
+    assert first == {"cup_1": lost("cup", 1)}
+    assert first_by_class == {"cup": {"cup_1": lost("cup", 1)}}
+    assert second == {"cup_1": lost("cup", 2)}
+    assert first_etag != second_etag
+
+
+def test_compaction_triggers_full_reload(path):
+    publisher = StatePublisher(path, journal=True, compact_every=2)
+    state = LostObjectsState(path, json_path=None)
+    objects = {}
+    for frame in range(6):
+        objects = dict(objects, **{f"cup_{frame}": lost("cup", frame)})
+        publisher.publish(objects, changed=[f"cup_{frame}"])
+        assert state.snapshot()[0] == objects
+    assert publisher.stats["compactions"] >= 2
+
+
+def test_publishing_without_journal_removes_stale_journal(path):
+    StatePublisher(path, journal=True).publish({"cup_1": lost("cup", 1)})
+    assert os.path.exists(journal_path_for(path))
+
+    StatePublisher(path).publish({"book_1": lost("book", 2)})
+    assert not os.path.exists(journal_path_for(path))
+    assert LostObjectsState(path, json_path=None).snapshot()[0] == {"book_1": lost("book", 2)}
+
+
+def test_file_changed_without_journal_entry_is_reloaded(path):
+    StatePublisher(path, journal=True).publish({"cup_1": lost("cup", 1)})
+    state = LostObjectsState(path, json_path=None)
+    assert state.snapshot()[0] == {"cup_1": lost("cup", 1)}
+
+    # Plik podmieniony przez pisarza bez dziennika - dziennik stoi w miejscu
+    write_atomic(path, 'book_1: {"name": "book", "last_seen_frame": 2}\n')
+    assert state.snapshot()[0] == {"book_1": lost("book", 2)}
+
+
+def test_missing_file_gives_no_snapshot(path):
+    assert LostObjectsState(path, json_path=None).snapshot() is None
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+
+from preprocessing import Preprocessor, PreprocessingError, jpeg_orientation, pipeline_from_env
+
+
+def jpeg(width=320, height=240):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (0, 128, 255)
+    ok, data = cv2.imencode(".jpg", image)
+    assert ok
+    return data.tobytes()
+
+
+def with_orientation(data, orientation):
+    # Segment APP1 z EXIF (TIFF little-endian, jeden wpis Orientation) zaraz po SOI
+    tiff = (b"II*\x00" + (8).to_bytes(4, "little") + (1).to_bytes(2, "little")
+            + (0x0112).to_bytes(2, "little") + (3).to_bytes(2, "little") + (1).to_bytes(4, "little")
+            + orientation.to_bytes(2, "little") + b"\x00\x00" + (0).to_bytes(4, "little"))
+    segment = b"Exif\x00\x00" + tiff
+    return data[:2] + b"\xff\xe1" + (len(segment) + 2).to_bytes(2, "big") + segment + data[2:]
+
+
+def test_decode_keeps_unmodified_jpeg():
+    ctx = Preprocessor().run(jpeg())
+    assert ctx.image.shape == (240, 320, 3)
+    assert ctx.model_input is ctx.image
+    assert not ctx.modified
+    assert set(ctx.timings) == {"decode"}
+
+
+def test_reduced_decode_maps_boxes_back_to_source():
+    ctx = Preprocessor([{"stage": "decode", "reduce": 2}]).run(jpeg())
+    assert ctx.image.shape == (120, 160, 3)
+    assert ctx.modified
+    boxes = ctx.boxes_in_source(ctx.boxes_in_image([[10, 20, 30, 40, 0.9, 41]]))
+    assert boxes.tolist() == [[20, 40, 60, 80, pytest.approx(0.9), 41]]
+
+
+def test_letterbox_changes_only_model_input():
+    ctx = Preprocessor([{"stage": "decode"}, {"stage": "letterbox", "size": 640}]).run(jpeg())
+    assert ctx.image.shape == (240, 320, 3)
+    assert ctx.model_input.shape == (640, 640, 3)
+    assert ctx.input_offset == (0.0, 80.0)
+    # Pudełko w wejściu modelu (skala 2, margines 80 u góry) -> współrzędne obrazu
+    boxes = ctx.boxes_in_image([[20, 100, 60, 140, 0.5, 0]])
+    assert boxes[0, :4].tolist() == [10, 10, 30, 30]
+    assert not ctx.modified
+
+
+def test_resize_and_enhance():
+    ctx = Preprocessor([{"stage": "decode"}, {"stage": "resize", "max_side": 160},
+                        {"stage": "enhance", "method": "clahe"}]).run(jpeg())
+    assert ctx.image.shape == (120, 160, 3)
+    assert ctx.decode_scale == pytest.approx(2.0)
+    assert ctx.model_input is not ctx.image
+    assert ctx.modified
+
+
+def test_exif_orientation_marks_frame_modified():
+    data = with_orientation(jpeg(), 6)
+    assert jpeg_orientation(data) == 6
+    assert jpeg_orientation(jpeg()) is None
+    assert Preprocessor().run(data).modified
+    assert not Preprocessor().run(with_orientation(jpeg(), 1)).modified
+
+
+@pytest.mark.parametrize("stages", [
+    [{"stage": "resize"}],
+    [{"stage": "decode"}, {"stage": "sharpen"}],
+    [{"stage": "decode", "reduce": 3}],
+])
+def test_invalid_pipelines_are_rejected(stages):
+    with pytest.raises(PreprocessingError):
+        Preprocessor(stages).run(jpeg())
+
+
+def test_undecodable_data():
+    with pytest.raises(PreprocessingError):
+        Preprocessor().run(b"not an image")
+
+
+def test_pipeline_from_env(monkeypatch):
+    monkeypatch.setenv("TEST_PREPROCESS", '[{"stage": "decode", "reduce": 4}]')
+    assert pipeline_from_env("TEST_PREPROCESS").describe() == [{"stage": "decode", "reduce": 4}]
+    monkeypatch.delenv("TEST_PREPROCESS")
+    assert pipeline_from_env("TEST_PREPROCESS", [{"stage": "decode"}]).describe() == [{"stage": "decode"}]
@@ -0,0 +1,39 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from profiling import ProfileStore, Profiler, StackSampler
+
+
+def request(headers):
+    return SimpleNamespace(headers=headers)
+
+
+def test_runtime_changes_require_configured_token(tmp_path):
+    profiler = Profiler(ProfileStore(str(tmp_path)))
+    assert not profiler.authorized(request({}))
+    assert not profiler.authorized(request({"X-Admin-Token": ""}))
+    # Profil na życzenie bez tokenu nadal działa
+    assert profiler.requested(request({"X-Profile": "1"}))
+
+    profiler = Profiler(ProfileStore(str(tmp_path)), admin_token="s3cret")
+    assert profiler.authorized(request({"X-Admin-Token": "s3cret"}))
+    assert not profiler.authorized(request({"X-Admin-Token": "wrong"}))
+    assert not profiler.requested(request({"X-Profile": "1"}))
+
+
+def test_sampler_only_follows_own_pipeline_threads():
+    stop = threading.Event()
+    threads = [threading.Thread(target=stop.wait, name=name, daemon=True)
+               for name in ("video-1-decode", "video-12-decode", "video-2-writer_0")]
+    for thread in threads:
+        thread.start()
+    try:
+        sampler = StackSampler(name_prefixes=["video-1-"], interval=0.001).start()
+        time.sleep(0.05)
+        sampler.stop()
+    finally:
+        stop.set()
+
+    sampled = {stack[0][0] for stack in sampler.counts}
+    assert sampled == {"thread:video-1-decode"}
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from frame_store import FrameStore
+from retention import RetentionEngine, RetentionPolicy
+
+
+class FakeTracker(SimpleNamespace):
+    def drain_released(self):
+        released, self.released = self.released, []
+        return released
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FrameStore(str(tmp_path / "wyniki"))
+    for frame_id in range(20):
+        store.save_bytes(frame_id, b"jpeg")
+    return store
+
+
+def test_low_water_mark_limits_each_cycle(store):
+    engine = RetentionEngine(store, RetentionPolicy(keep_last=5), background=False)
+    tracker = FakeTracker(max_frame=19, frame_refs={3: 1}, released=[])
+
+    # Klatki poniżej 19 - 5 bez obiektów; klatka 3 jest wskazywana przez obiekt
+    assert engine.collect(tracker) == 13
+    assert engine.low_water == 14
+    assert store.frame_ids() == [3] + list(range(14, 20))
+
+    # Bez nowych klatek i zwolnień nic nie jest ponownie przeglądane
+    assert engine.collect(tracker) == 0
+
+    # Zwolniona klatka poniżej progu jest usuwana, powyżej - czeka na przegląd zakresu
+    tracker.frame_refs = {16: 1}
+    tracker.released = [3, 15]
+    assert engine.collect(tracker) == 1
+    assert store.frame_ids() == list(range(14, 20))
+
+    tracker.max_frame = 22
+    assert engine.collect(tracker) == 2  # 14 i 15; 16 wciąż wskazywana
+    assert engine.low_water == 17
+    assert store.frame_ids() == list(range(16, 20))
+    assert engine.state() == {"low_water": 17}
+
+
+def test_low_water_is_restored_from_state(store):
+    engine = RetentionEngine(store, RetentionPolicy(keep_last=5), background=False)
+    engine.load_state({"low_water": 10})
+    assert engine.collect(FakeTracker(max_frame=19, frame_refs={}, released=[])) == 4
+    assert store.frame_ids() == list(range(10)) + list(range(14, 20))
+
+
+def test_max_bytes_forces_oldest_frames(store):
+    engine = RetentionEngine(store, RetentionPolicy(keep_last=5, max_bytes=4 * 8), background=False)
+    tracker = FakeTracker(max_frame=19, frame_refs={frame_id: 1 for frame_id in range(20)}, released=[])
+
+    assert engine.collect(tracker) == 12
+    assert engine.stats["forced"] == 12
+    assert store.frame_ids() == list(range(12, 20))
+
+
+def test_checkpoint_keeps_frames_released_before_collect(store):
+    engine = RetentionEngine(store, RetentionPolicy(keep_last=5), background=False)
+    tracker = FakeTracker(max_frame=19, frame_refs={3: 1}, released=[])
+    engine.collect(tracker)
+
+    # Obiekt przestał wskazywać klatkę 3, checkpoint zapisano, proces zatrzymał się przed `collect`
+    tracker.frame_refs = {}
+    tracker.released = [3]
+    state = engine.state(tracker.released)
+    assert state == {"low_water": 3}
+
+    restored = RetentionEngine(store, RetentionPolicy(keep_last=5), background=False)
+    restored.load_state(state)
+    assert restored.collect(FakeTracker(max_frame=19, frame_refs={}, released=[])) == 1
+    assert store.frame_ids() == list(range(14, 20))
+    assert restored.low_water == 14
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from sort_tracker import ARCHIVED, CONFIRMED, LOST, BoxKalman, SortTracker, iou_matrix, linear_assignment
+
+
+def detection(x, y, color="#ff0000", name="car", size=10):
+    return {"name": name, "color": color, "bbox": {"xmin": x, "ymin": y, "xmax": x + size, "ymax": y + size}}
+
+
+def test_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float64)
+    iou = iou_matrix(boxes, np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float64))
+    assert iou[0, 0] == pytest.approx(1.0)
+    assert iou[0, 1] == pytest.approx(50 / 150)
+    assert iou[1].tolist() == [0.0, 0.0]
+
+
+@pytest.mark.parametrize("method", ["hungarian", "greedy"])
+def test_linear_assignment_rejects_expensive_pairs(method):
+    cost = np.array([[0.1, 5.0], [0.2, np.inf]])
+    assert linear_assignment(cost, max_cost=1.0, method=method) == [(0, 0)]
+    assert linear_assignment(np.empty((0, 2)), max_cost=1.0, method=method) == []
+
+
+def test_track_is_confirmed_after_min_hits():
+    tracker = SortTracker(delta_color_threshold=100, min_hits=2, use_kalman=False)
+    tracker.process_frame([detection(0, 0)], 1)
+    assert tracker.objects == {}
+
+    tracker.process_frame([detection(2, 0)], 2)
+    assert list(tracker.objects) == ["car_1"]
+    assert tracker.objects["car_1"]["state"] == CONFIRMED
+    assert tracker.objects["car_1"]["frame"] == 2
+
+
+def test_unmatched_tentative_track_is_dropped():
+    tracker = SortTracker(delta_color_threshold=100, min_hits=2, use_kalman=False)
+    tracker.process_frame([detection(0, 0)], 1)
+    tracker.process_frame([], 2)
+    assert tracker.active_tracks() == []
+    assert tracker.objects == {}
+
+
+def test_different_colors_start_separate_tracks():
+    tracker = SortTracker(delta_color_threshold=50, min_hits=1, use_kalman=False)
+    tracker.process_frame([detection(0, 0)], 1)
+    tracker.process_frame([detection(1, 0, color="#0000ff")], 2)
+    assert sorted(tracker.objects) == ["car_1", "car_2"]
+
+
+def test_lost_track_is_archived_and_forgotten():
+    tracker = SortTracker(delta_color_threshold=100, min_hits=1, max_lost=2, max_archived=1, use_kalman=False)
+    tracker.process_frame([detection(0, 0)], 1)
+    tracker.process_frame([], 2)
+    assert tracker.objects["car_1"]["state"] == LOST
+
+    # Zgubiony tor nadal może zostać skojarzony
+    tracker.process_frame([detection(1, 0)], 3)
+    assert tracker.objects["car_1"]["state"] == CONFIRMED
+
+    tracker.process_frame([], 6)
+    assert tracker.objects["car_1"]["state"] == ARCHIVED
+    assert list(tracker.archived) == ["car_1"]
+
+    # Drugi zarchiwizowany obiekt wypycha pierwszy z archiwum i ze stanu
+    tracker.process_frame([detection(50, 50)], 7)
+    tracker.process_frame([], 10)
+    assert list(tracker.archived) == ["car_2"]
+    assert "car_1" not in tracker.objects
+    assert tracker.stats["forgotten"] == 1
+
+
+def test_kalman_predicts_constant_velocity():
+    motion = BoxKalman(np.array([0, 0, 10, 10], dtype=np.float64))
+    for step in range(1, 20):
+        motion.predict()
+        motion.update(np.array([step * 4, 0, step * 4 + 10, 10], dtype=np.float64))
+    motion.predict(2)
+    assert motion.box == pytest.approx([84, 0, 94, 10], abs=1.0)
+    assert motion.velocity[0] == pytest.approx(4, abs=0.5)
+
+
+def test_snapshot_restore_keeps_tracks():
+    tracker = SortTracker(delta_color_threshold=100, min_hits=1, use_kalman=False)
+    tracker.process_frame([detection(0, 0), detection(50, 50, name="person")], 1)
+    tracker.process_frame([detection(1, 0)], 2)
+
+    restored = SortTracker(delta_color_threshold=100, min_hits=1, use_kalman=False)
+    restored.restore(tracker.snapshot())
+    assert sorted(track.name for track in restored.active_tracks()) == ["car_1", "person_1"]
+
+    restored.process_frame([detection(2, 0)], 3)
+    assert sorted(restored.objects) == ["car_1", "person_1"]
+    assert restored.objects["car_1"]["frame"] == 3
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("SORT_MIN_HITS", "4")
+    monkeypatch.setenv("SORT_KALMAN", "0")
+    monkeypatch.setenv("SORT_MATCHER", "greedy")
+    tracker = SortTracker.from_env(30)
+    assert (tracker.min_hits, tracker.use_kalman, tracker.matcher) == (4, False, "greedy")
+
+    monkeypatch.setenv("SORT_MATCHER", "auction")
+    with pytest.raises(ValueError):
+        SortTracker.from_env(30)
@@ -0,0 +1,140 @@
+from flask import Blueprint, jsonify, request, send_file
+import io
+import math
+import os
+from PIL import Image
+from derived_cache import get_derived_cache
+from frame_store import get_frame_store
+from lost_state import get_lost_state
+
+thumbnail_bp = Blueprint('thumbnail_bp', __name__)
+
+FRAMES_DIR = "wyniki"
+MAX_SIZE = 1920
+DEFAULT_QUALITY = 75
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600  # Miniatura klatki jest niezmienna jak sama klatka
+CROP_MAX_AGE = 60  # Wycinek obiektu zależy od bieżącego stanu trackera
+
+
+def int_arg(name, default, low, high):
+    value = request.args.get(name, type=int)
+    return default if value is None else max(low, min(high, value))
+
+
+def encode_jpeg(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def open_reduced(path, target_size):
+    """
+    Otwiera JPEG dekodując go w zmniejszonej skali (DCT) - najmniejszej, która daje co najmniej
+    `target_size(szerokość, wysokość)` pikseli. Zwraca (obraz RGB, rozmiar oryginału, skala względem oryginału).
+    """
+    with Image.open(path) as image:
+        original_size = image.size
+        width, height = target_size(*original_size)
+        image.draft("RGB", (max(1, width), max(1, height)))
+        reduced = image.convert("RGB")
+    return reduced, original_size, reduced.size[0] / original_size[0]
+
+
+def serve_derived(path, max_age, immutable=False):
+    response = send_file(os.path.abspath(path), mimetype="image/jpeg", conditional=True, max_age=max_age)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+    return response
+
+
+def frame_path(frame_number):
+    store = get_frame_store(FRAMES_DIR)
+    store.wait_for(frame_number)
+    record = store.get(frame_number)
+    if record is None or not os.path.exists(record["path"]):
+        return None
+    return record["path"]
+
+
+@thumbnail_bp.route('/get-thumbnail/<int:frame_number>', methods=['GET'])
+def get_thumbnail(frame_number):
+    """
+    Miniatura klatki mieszcząca się w w x h (domyślnie szerokość 320), jakość ?q= (30-95).
+    """
+    path = frame_path(frame_number)
+    if path is None:
+        return jsonify({"error": "Frame not found"}), 404
+
+    width = int_arg("w", 320, 16, MAX_SIZE)
+    height = int_arg("h", 0, 0, MAX_SIZE)
+    quality = int_arg("q", DEFAULT_QUALITY, 30, 95)
+    variant = f"thumb_w{width}_h{height}_q{quality}"
+
+    cache = get_derived_cache(FRAMES_DIR)
+    cached = cache.get(frame_number, variant)
+    if cached is None:
+        def box(original_width, original_height):
+            return width, height or math.ceil(original_height * width / original_width)
+
+        try:
+            image, original_size, _ = open_reduced(path, box)
+        except OSError:
+            return jsonify({"error": "Frame not found"}), 404
+        image.thumbnail(box(*original_size), Image.LANCZOS)
+        cached = cache.put(frame_number, variant, encode_jpeg(image, quality))
+
+    return serve_derived(cached, THUMBNAIL_MAX_AGE, immutable=True)
+
+
+@thumbnail_bp.route('/get-object-crop/<string:object_id>', methods=['GET'])
+def get_object_crop(object_id):
+    """
+    Wycinek wokół pudełka obiektu z zgubione.txt: dłuższy bok najwyżej ?size= (domyślnie 256),
+    margines ?pad= w procentach rozmiaru pudełka (domyślnie 15), jakość ?q=.
+    """
+    state = get_lost_state('./zgubione.txt').snapshot()
+    if state is None:
+        return jsonify({"error": "File not found"}), 500
+    item = state[0].get(object_id)
+    if item is None:
+        return jsonify({"error": "Item not found"}), 404
+
+    frame_number = item.get("frame")
+    path = frame_path(frame_number)
+    if path is None:
+        return jsonify({"error": "Frame not found"}), 404
+
+    size = int_arg("size", 256, 16, MAX_SIZE)
+    pad = int_arg("pad", 15, 0, 100)
+    quality = int_arg("q", DEFAULT_QUALITY, 30, 95)
+    bbox = item.get("bbox", {})
+    xmin, ymin, xmax, ymax = (int(bbox.get(key, 0)) for key in ("xmin", "ymin", "xmax", "ymax"))
+    # Wariant zależy od pudełka, a nie od nazwy obiektu - ten sam obszar klatki to ten sam plik
+    variant = f"crop_{xmin}_{ymin}_{xmax}_{ymax}_s{size}_p{pad}_q{quality}"
+
+    cache = get_derived_cache(FRAMES_DIR)
+    cached = cache.get(frame_number, variant)
+    if cached is None:
+        margin_x = (xmax - xmin) * pad / 100
+        margin_y = (ymax - ymin) * pad / 100
+        left, top = max(0, xmin - margin_x), max(0, ymin - margin_y)
+        right, bottom = xmax + margin_x, ymax + margin_y
+        if right <= left or bottom <= top:
+            return jsonify({"error": "Empty bounding box"}), 400
+
+        # Dekodujemy w najmniejszej skali, w której wycinek ma jeszcze `size` pikseli
+        factor = min(1.0, size / max(right - left, bottom - top))
+        try:
+            image, _, scale = open_reduced(path, lambda w, h: (math.ceil(w * factor), math.ceil(h * factor)))
+        except OSError:
+            return jsonify({"error": "Frame not found"}), 404
+        crop = image.crop((int(left * scale), int(top * scale),
+                           min(image.size[0], math.ceil(right * scale)), min(image.size[1], math.ceil(bottom * scale))))
+        crop.thumbnail((size, size), Image.LANCZOS)
+        cached = cache.put(frame_number, variant, encode_jpeg(crop, quality))
+
+    return serve_derived(cached, CROP_MAX_AGE)
+
+
+@thumbnail_bp.route('/derived-cache/stats', methods=['GET'])
+def derived_cache_stats():
+    return jsonify(get_derived_cache(FRAMES_DIR).snapshot())
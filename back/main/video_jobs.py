@@ -0,0 +1,186 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class JobQueueFull(Exception):
+    """Kolejka zadań jest pełna - klient powinien spróbować później (HTTP 429)."""
+
+
+class VideoJob:
+    """
+    Stan jednego zadania przetwarzania wideo.
+    """
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"  # queued / running / completed / failed / cancelled
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+        self.frames_done = 0
+        self.total_frames = None
+        self.fps = 0.0
+        self.stats = {}
+        self._last_progress = None  # (czas, frames_done) do liczenia bieżącego fps
+
+    def update_progress(self, stats):
+        """
+        Callback dla `VideoPipeline` - aktualizuje postęp i bieżący fps (średnia wykładnicza).
+        """
+        now = time.perf_counter()
+        frames_done = stats["frames_processed"]
+
+        if self._last_progress is not None:
+            last_time, last_frames = self._last_progress
+            if now > last_time and frames_done > last_frames:
+                current = (frames_done - last_frames) / (now - last_time)
+                self.fps = current if not self.fps else 0.7 * self.fps + 0.3 * current
+        elif stats.get("fps"):
+            self.fps = stats["fps"]
+
+        self._last_progress = (now, frames_done)
+        self.frames_done = frames_done
+        self.total_frames = stats.get("total_frames")
+        self.stats = stats
+
+    def eta(self):
+        if self.status != "running" or not self.total_frames or not self.fps:
+            return None
+        return max(0.0, (self.total_frames - self.frames_done) / self.fps)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "fps": round(self.fps, 2),
+            "eta_seconds": None if self.eta() is None else round(self.eta(), 1),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stats": self.stats,
+        }
+
+
+class JobManager:
+    """
+    Pula wątków roboczych przetwarzających zadania wideo z ograniczonej kolejki.
+    Zadania nie mają własnych modeli - dostają zasoby z `resources_factory` (w app.py rejestr
+    detektorów), więc korzystają z tych samych pul procesów inferencji co endpointy HTTP.
+    """
+
+    def __init__(self, runner, resources_factory, workers=1, max_queued=4, max_finished=100):
+        """
+        :param runner: Funkcja (job, zasoby) -> statystyki; wykonuje właściwe przetwarzanie.
+        :param resources_factory: Funkcja bez argumentów zwracająca zasoby przekazywane do `runner`
+            (np. `DetectorRegistry`); wołana leniwie przy pierwszym zadaniu wątku.
+        :param workers: Liczba wątków roboczych.
+        :param max_queued: Maksymalna liczba zadań czekających w kolejce (anulowane się nie liczą).
+        :param max_finished: Ile zakończonych zadań trzymamy do odczytu statusu.
+        """
+        self.runner = runner
+        self.resources_factory = resources_factory
+        self.workers = max(1, int(workers))
+        self.max_finished = max_finished
+        self.max_queued = max(1, int(max_queued))
+
+        # Kolejka bez limitu - limit dotyczy zadań wciąż czekających, a anulowane zadanie
+        # zostaje w kolejce, dopóki wątek go nie pobierze i nie pominie
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        # Wątki (i modele) startują dopiero przy pierwszym zadaniu
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"video-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, params):
+        job = VideoJob(params)
+        with self._lock:
+            self._ensure_workers()
+            if self._waiting() >= self.max_queued:
+                raise JobQueueFull(f"Job queue is full ({self.max_queued} pending)")
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._trim_finished()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _waiting(self):
+        # Wołane pod self._lock
+        return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    def queue_depth(self):
+        with self._lock:
+            return self._waiting()
+
+    def cancel(self, job_id):
+        """
+        Anuluje zadanie czekające lub przerywa działające. Zwraca zadanie albo None.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def _trim_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in ("completed", "failed", "cancelled")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        resources = None
+        while True:
+            job = self._queue.get()
+            try:
+                if job.cancel_event.is_set():
+                    continue
+
+                if resources is None:
+                    resources = self.resources_factory()
+
+                with self._lock:
+                    if job.status != "queued":  # Anulowane w trakcie tworzenia zasobów
+                        continue
+                    job.status = "running"
+                job.started_at = time.time()
+                stats = self.runner(job, resources)
+                job.stats = stats or job.stats
+                job.status = "cancelled" if job.cancel_event.is_set() else "completed"
+            except Exception as e:
+                logging.error(f"Zadanie {job.id} zakończone błędem: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                if job.finished_at is None:
+                    job.finished_at = time.time()
+                self._queue.task_done()
@@ -0,0 +1,206 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from metrics import timed
+
+_END = object()  # Znacznik końca strumienia klatek
+_pipeline_ids = itertools.count(1)
+
+
+def compute_frame_stride(source_fps, frame_stride=1, target_fps=None):
+    """
+    Zwraca co którą klatkę przetwarzamy.
+    :param source_fps: FPS źródła (z `cv2.CAP_PROP_FPS`, może być 0 gdy nieznany).
+    :param frame_stride: Stały krok - co N-ta klatka.
+    :param target_fps: Docelowy FPS; ma pierwszeństwo przed `frame_stride`, jeśli znamy FPS źródła.
+    """
+    if target_fps and source_fps and source_fps > target_fps:
+        return max(1, round(source_fps / target_fps))
+    return max(1, int(frame_stride or 1))
+
+
+class VideoPipeline:
+    """
+    Potokowe przetwarzanie wideo: wątek dekodujący wypełnia ograniczoną kolejkę,
+    klatki trafiają do modelu YOLO w paczkach, a zapis JPEG i logu wykryć
+    odbywa się w puli wątków zapisujących.
+    """
+
+    def __init__(self, model, describe_detections, detection_store, output_dir="wyniki",
+                 batch_size=4, queue_size=32, writer_threads=2, frame_stride=1, target_fps=None,
+                 ignored_classes=None, predict_kwargs=None, reset_store=False, frame_store=None,
+                 progress_callback=None, cancel_event=None):
+        """
+        :param model: Model z metodą `predict` przyjmującą listę klatek (np. ultralytics YOLO).
+        :param describe_detections: Funkcja (klatka BGR, wykrycia Nx6) -> lista słowników do logu.
+        :param detection_store: `DetectionStore`, do którego trafiają wykrycia.
+        :param batch_size: Liczba klatek w jednym wywołaniu modelu.
+        :param queue_size: Pojemność kolejki między dekoderem a modelem.
+        :param writer_threads: Liczba wątków zapisujących obrazy.
+        :param frame_stride: Co która klatka jest przetwarzana.
+        :param target_fps: Docelowa liczba klatek na sekundę (zamiast `frame_stride`).
+        :param ignored_classes: Klasy odrzucane po predykcji - dla modeli bez `classes=`; w app.py filtr klas
+            trafia do modelu przez `predict_kwargs`.
+        :param reset_store: Czy wyczyścić dziennik wykryć przed startem (dawny tryb "w").
+        :param frame_store: `FrameStore` nadający numery i indeksujący zapisane klatki
+            (bez niego klatki są numerowane indeksem w wideo).
+        :param progress_callback: Wywoływana ze statystykami po każdej paczce.
+        :param cancel_event: `threading.Event`, którego ustawienie przerywa przetwarzanie.
+        """
+        self.model = model
+        self.describe_detections = describe_detections
+        self.output_dir = output_dir
+        self.detection_store = detection_store
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.writer_threads = max(1, int(writer_threads))
+        self.frame_stride = frame_stride
+        self.target_fps = target_fps
+        self.ignored_classes = np.array(sorted(set(ignored_classes or [])), dtype=np.float32)
+        self.predict_kwargs = predict_kwargs or {}
+        self.reset_store = reset_store
+        self.frame_store = frame_store
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event or threading.Event()
+        # Wątki potoku mają nazwy "<thread_prefix>decode" itd. - profiler próbkuje tylko ten przebieg
+        self.thread_prefix = f"video-{next(_pipeline_ids)}-"
+
+        self.stats = {"frames_read": 0, "frames_processed": 0, "frames_with_detections": 0,
+                      "total_frames": None, "elapsed": 0.0, "fps": 0.0, "cancelled": False,
+                      "image_write_errors": 0, "log_write_errors": 0}
+
+    def _decode(self, cap, stride, frames, stop):
+        """
+        Wątek dekodujący. Klatki pomijane przez `stride` są tylko przesuwane (`grab`), bez dekodowania.
+        """
+        index = 0
+        try:
+            while not stop.is_set():
+                if index % stride == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames.put((index, frame))
+                elif not cap.grab():
+                    break
+                index += 1
+        except Exception as e:
+            logging.error(f"Błąd dekodowania wideo: {str(e)}")
+        finally:
+            self.stats["frames_read"] = index
+            frames.put(_END)
+
+    def _next_batch(self, frames):
+        batch = []
+        while len(batch) < self.batch_size:
+            item = frames.get()
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def run(self, cap):
+        """
+        Przetwarza całe wideo z otwartego `cv2.VideoCapture` i zwraca statystyki.
+        """
+        stride = compute_frame_stride(cap.get(cv2.CAP_PROP_FPS), self.frame_stride, self.target_fps)
+        frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if frame_total > 0:
+            self.stats["total_frames"] = (frame_total + stride - 1) // stride
+        frames = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        decoder = threading.Thread(target=self._decode, args=(cap, stride, frames, stop),
+                                   name=f"{self.thread_prefix}decode", daemon=True)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.reset_store:
+            self.detection_store.reset()
+        started = time.perf_counter()
+
+        # Dziennik wykryć pisze jeden wątek, żeby rekordy zachowały kolejność klatek; rekord klatki
+        # trafia do dziennika dopiero po zapisaniu jej JPEG, więc tracker nie wskaże klatki bez pliku
+        # Nazwy wątków z `thread_prefix` pozwalają profilerowi (profiling.py) próbkować cały potok
+        with ThreadPoolExecutor(max_workers=self.writer_threads,
+                                thread_name_prefix=f"{self.thread_prefix}writer") as image_writer, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.thread_prefix}log") as log_writer:
+            decoder.start()
+            try:
+                finished = False
+                while not finished:
+                    if self.cancel_event.is_set():
+                        self.stats["cancelled"] = True
+                        break
+                    batch, finished = self._next_batch(frames)
+                    if batch:
+                        self._process_batch(batch, image_writer, log_writer)
+                    self.stats["elapsed"] = time.perf_counter() - started
+                    self.stats["fps"] = self.stats["frames_processed"] / self.stats["elapsed"]
+                    if self.progress_callback:
+                        self.progress_callback(dict(self.stats))
+            finally:
+                stop.set()
+                # Odblokuj dekoder, jeśli czeka na miejsce w kolejce
+                while decoder.is_alive():
+                    try:
+                        frames.get_nowait()
+                    except queue.Empty:
+                        decoder.join(timeout=0.1)
+
+        self.stats["elapsed"] = time.perf_counter() - started
+        if self.stats["elapsed"] > 0:
+            self.stats["fps"] = self.stats["frames_processed"] / self.stats["elapsed"]
+        return self.stats
+
+    def _process_batch(self, batch, image_writer, log_writer):
+        images = [frame for _, frame in batch]
+        with timed("video_inference"):
+            results = self.model.predict(images, verbose=False, **self.predict_kwargs)
+
+        for (frame_index, frame), result in zip(batch, results):
+            self.stats["frames_processed"] += 1
+            detections = result.boxes.data.cpu().numpy()  # Wyniki jako numpy
+
+            if len(self.ignored_classes):
+                detections = detections[~np.isin(detections[:, 5], self.ignored_classes)]
+
+            if len(detections) == 0:
+                continue
+
+            self.stats["frames_with_detections"] += 1
+            frame_number = self.frame_store.next_frame_id() if self.frame_store else frame_index
+            detection_list = self.describe_detections(frame, detections)
+            image_written = image_writer.submit(self._write_image, frame_number, frame)
+            log_writer.submit(self._append_after_write, image_written, frame_number, detection_list)
+
+    def _write_image(self, frame_number, frame):
+        if self.frame_store:
+            return self.frame_store.save_image(frame_number, frame)
+        img_name = os.path.join(self.output_dir, f"frame_{frame_number}.jpg")
+        if not cv2.imwrite(img_name, frame):
+            raise IOError(f"Failed to write {img_name}")
+        return img_name
+
+    def _append_after_write(self, image_written, frame_number, detection_list):
+        """
+        Wątek dziennika: czeka na zapis JPEG klatki i dopiero wtedy dopisuje jej wykrycia.
+        Błędy zapisu są liczone w statystykach (zmienia je tylko ten jeden wątek).
+        """
+        try:
+            image_written.result()
+        except Exception as e:
+            self.stats["image_write_errors"] += 1
+            logging.error(f"Nie zapisano klatki {frame_number}, pomijam jej wykrycia: {e}")
+            return
+        try:
+            self.detection_store.append(frame_number, detection_list)
+        except Exception as e:
+            self.stats["log_write_errors"] += 1
+            logging.error(f"Nie zapisano wykryć klatki {frame_number}: {e}")
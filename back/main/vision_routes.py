@@ -1,13 +1,16 @@
 from flask import Blueprint, jsonify, request
 import json
 import os
-from computer_vision import analyze_image, read_file
+from computer_vision import analyze_image
+from lost_state import get_lost_state
+from analysis_cache import analysis_cache_key, get_analysis_cache
 
 vision_bp = Blueprint('vision_bp', __name__)
 
 @vision_bp.route('/analyze/<object_name>', methods=['GET'])
 def analyze_object(object_name):
-    data = read_file('./zgubione.txt')
+    state = get_lost_state('./zgubione.txt').snapshot()
+    data = state[0] if state else {}
     if object_name not in data:
         return jsonify({"error": "Object not found"}), 404
 
@@ -15,7 +18,20 @@ def analyze_object(object_name):
     frame_number = object_data.get("frame")
     image_path = f"./wyniki/frame_{frame_number}.jpg"
 
-    result = analyze_image(image_path, f"{object_name}: {json.dumps(object_data)}")
+    try:
+        with open(image_path, "rb") as image_file:
+            image_bytes = image_file.read()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    # Ta sama klatka i te same atrybuty obiektu -> wynik z cache zamiast ponownego zapytania do Gemini
+    key = analysis_cache_key(image_bytes, object_name, object_data)
+    result, _ = get_analysis_cache().get_or_compute(
+        key,
+        lambda: analyze_image(image_path, f"{object_name}: {json.dumps(object_data)}",
+                              include_description=False, image_bytes=image_bytes),
+        should_cache=lambda value: "error" not in value,
+    )
 
     if "error" in result:
         return jsonify(result), 500